@@ -1,22 +1,71 @@
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for, send_file
+from flask import Flask, render_template, request, jsonify, flash, redirect, url_for, send_file, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 import os
 import logging
 from datetime import datetime
 from urllib.parse import unquote
-import json
+from werkzeug.http import dump_options_header
+from werkzeug.utils import secure_filename
 import html
+import csv
+import io
 
 # Import our modules
-from models.database import db, Query, Download, init_db
+from models.database import (db, Query, Download, Case, PdfSource, WatchedCase, CaseChange, init_db, load_sqlite_pragmas,
+                             apply_case_data, record_pdf_source, store_result, stored_result)
+from models.write_behind import WriteBehindQueue
+from models.retention import RetentionJob
+from models.pdf_prefetch import PdfPrefetcher, order_pdf_urls
+from models.fulltext import FullTextIndex, FullTextIndexer
+from models.pdf_cleanup import PdfStoreCleanup
+from models.watchlist import WatchlistScheduler
+from models.portal_health import PortalHealthProber
 from scrapers.delhi_high_court_simple import DelhiHighCourtSimpleScraper as DelhiHighCourtScraper
 from utils.validators import validate_form_data, sanitize_input, get_case_types, get_year_range
 from utils.pdf_handler import PDFHandler
+from utils.http_cache import HTTPValidatorCache
+from utils.circuit_breaker import HostCircuitBreaker
+from utils.retry import RetryBudget, RetryPolicy
+from utils.pagination import keyset_paginate, approximate_row_count
+from utils.serialization import FastJSONProvider, set_backend, dumps
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from datetime import date, timedelta
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Gunicorn worker classes that run many requests per process on greenlets
+COOPERATIVE_WORKER_CLASSES = ('gevent',)
+
+def create_retention_job(app, fulltext_index=None):
+    """Build the retention job from the app's RETENTION_* settings"""
+    return RetentionJob(app,
+                        archive_folder=app.config['RETENTION_ARCHIVE_FOLDER'],
+                        download_folder=app.config['UPLOAD_FOLDER'],
+                        retention_days=app.config['RETENTION_DAYS'],
+                        batch_size=app.config['RETENTION_BATCH_SIZE'],
+                        interval=app.config['RETENTION_INTERVAL'],
+                        fulltext_index=fulltext_index)
+
+def create_fulltext_indexer(app, pdf_handler):
+    """Build the full-text indexer from the app's FULLTEXT_* settings"""
+    return FullTextIndexer(app, pdf_handler,
+                           FullTextIndex(app.config['FULLTEXT_INDEX_PATH']),
+                           workers=app.config['FULLTEXT_WORKERS'],
+                           batch_size=app.config['FULLTEXT_BATCH_SIZE'],
+                           interval=app.config['FULLTEXT_INTERVAL'])
+
+def create_pdf_cleanup(app, pdf_handler, write_behind=None, fulltext_index=None):
+    """Build the PDF store cleanup from the app's PDF_STORE_* / PDF_CLEANUP_* settings"""
+    return PdfStoreCleanup(app, pdf_handler, write_behind,
+                           max_bytes=app.config['PDF_STORE_MAX_BYTES'],
+                           max_age_days=app.config['PDF_STORE_MAX_AGE_DAYS'],
+                           batch_size=app.config['PDF_CLEANUP_BATCH_SIZE'],
+                           interval=app.config['PDF_CLEANUP_INTERVAL'],
+                           fulltext_index=fulltext_index)
+
 def create_app():
     """Create and configure the Flask application"""
     app = Flask(__name__)
@@ -25,11 +74,148 @@ def create_app():
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///court_data.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLITE_PRAGMAS'] = load_sqlite_pragmas()  # see SQLITE_PRAGMA_PROFILES
     app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', 'static/downloads')
     app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
+    app.config['HISTORY_MAX_PER_PAGE'] = int(os.environ.get('HISTORY_MAX_PER_PAGE', 100))
+    # PDF delivery: 'direct' (send_file with ETag/Range) or 'x-accel' (nginx
+    # serves UPLOAD_FOLDER from the internal PDF_ACCEL_PREFIX location)
+    app.config['PDF_SERVE_MODE'] = os.environ.get('PDF_SERVE_MODE', 'direct')
+    app.config['PDF_ACCEL_PREFIX'] = os.environ.get('PDF_ACCEL_PREFIX', '/protected-downloads/')
+    # First downloads are forwarded to the client while they are cached
+    # instead of after the whole file has been written
+    app.config['PDF_STREAM_DOWNLOADS'] = os.environ.get('PDF_STREAM_DOWNLOADS', 'true').lower() == 'true'
+    # Interrupted PDF downloads are retried with backoff and resumed with
+    # Range requests; files above PDF_PARALLEL_MIN_BYTES may be fetched as
+    # PDF_PARALLEL_CHUNKS concurrent ranges (1 disables)
+    app.config['PDF_DOWNLOAD_RETRIES'] = int(os.environ.get('PDF_DOWNLOAD_RETRIES', 3))
+    app.config['PDF_PARALLEL_CHUNKS'] = int(os.environ.get('PDF_PARALLEL_CHUNKS', 1))
+    app.config['PDF_PARALLEL_MIN_BYTES'] = int(os.environ.get('PDF_PARALLEL_MIN_BYTES', 8 * 1024 * 1024))
+    # Most pages /api/pdf/<digest>/text extracts per request
+    app.config['PDF_TEXT_MAX_PAGES'] = int(os.environ.get('PDF_TEXT_MAX_PAGES', 20))
+    # Width in pixels of first-page thumbnails on the results page
+    app.config['PDF_THUMBNAIL_WIDTH'] = int(os.environ.get('PDF_THUMBNAIL_WIDTH', 240))
+    # Prefetch every order PDF of a case into the store after a successful
+    # search, a few at a time and rate limited per portal host
+    app.config['PDF_PREFETCH_ENABLED'] = os.environ.get('PDF_PREFETCH_ENABLED', 'false').lower() == 'true'
+    app.config['PDF_PREFETCH_WORKERS'] = int(os.environ.get('PDF_PREFETCH_WORKERS', 4))
+    app.config['PDF_PREFETCH_HOST_RATE'] = float(os.environ.get('PDF_PREFETCH_HOST_RATE', 2.0))
+    # Stored PDFs are evicted least recently used first, from the pdf_blobs
+    # index: when unused for PDF_STORE_MAX_AGE_DAYS or while the store is
+    # over PDF_STORE_MAX_BYTES (0 disables either). Run it here on a timer,
+    # or from cron with cleanup_pdf_store.py.
+    app.config['PDF_CLEANUP_ENABLED'] = os.environ.get('PDF_CLEANUP_ENABLED', 'false').lower() == 'true'
+    app.config['PDF_STORE_MAX_BYTES'] = int(os.environ.get('PDF_STORE_MAX_BYTES', 0))
+    app.config['PDF_STORE_MAX_AGE_DAYS'] = int(os.environ.get('PDF_STORE_MAX_AGE_DAYS', 0))
+    app.config['PDF_CLEANUP_BATCH_SIZE'] = int(os.environ.get('PDF_CLEANUP_BATCH_SIZE', 200))
+    app.config['PDF_CLEANUP_INTERVAL'] = int(os.environ.get('PDF_CLEANUP_INTERVAL', 3600))
+    app.config['PORTAL_BASE_URL'] = os.environ.get('PORTAL_BASE_URL', 'https://dhcmisc.nic.in')
+    # Static portal pages (status page, NJDG, portal status) are kept with
+    # their ETag/Last-Modified and revalidated with conditional requests;
+    # within PORTAL_HTTP_CACHE_MAX_AGE seconds they are served locally.
+    # An empty path disables the cache.
+    app.config['PORTAL_HTTP_CACHE_PATH'] = os.environ.get(
+        'PORTAL_HTTP_CACHE_PATH', os.path.join(app.instance_path, 'portal_http_cache.db'))
+    app.config['PORTAL_HTTP_CACHE_MAX_AGE'] = int(os.environ.get('PORTAL_HTTP_CACHE_MAX_AGE', 300))
+    app.config['PORTAL_HTTP_CACHE_MAX_ENTRIES'] = int(os.environ.get('PORTAL_HTTP_CACHE_MAX_ENTRIES', 2000))
+    # Seconds a discovered search form (page, action, fields) is trusted
+    # before the candidate pages are probed again. Only form lookups
+    # (get_case_status_page / get_search_form) use it; searches post to the
+    # portal's fixed case search endpoints.
+    app.config['PORTAL_FORM_CACHE_TTL'] = int(os.environ.get('PORTAL_FORM_CACHE_TTL', 3600))
+    
+    # JSON backend for stored results and API responses: auto (orjson when
+    # installed), orjson or json
+    app.config['JSON_BACKEND'] = set_backend(os.environ.get('JSON_BACKEND', 'auto'))
+    app.json = FastJSONProvider(app)
+    
+    # Transparent compression of stored results: off, auto, zstd or zlib.
+    # Train a shared dictionary with recompress_responses.py --train.
+    app.config['RESPONSE_COMPRESSION'] = os.environ.get('RESPONSE_COMPRESSION', 'off')
+    app.config['RESPONSE_COMPRESSION_LEVEL'] = int(os.environ.get('RESPONSE_COMPRESSION_LEVEL', 6))
+    app.config['RESPONSE_COMPRESSION_MIN_BYTES'] = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', 256))
+    
+    # Worker model: 'sync' (one request per worker) or 'gevent' (cooperative,
+    # many in-flight portal requests per worker). Must match gunicorn.conf.py.
+    app.config['WORKER_CLASS'] = os.environ.get('WORKER_CLASS', 'sync')
+    app.config['WORKER_CONNECTIONS'] = int(os.environ.get('WORKER_CONNECTIONS', 100))
+    if app.config['WORKER_CLASS'] in COOPERATIVE_WORKER_CLASSES and ':memory:' not in app.config['SQLALCHEMY_DATABASE_URI']:
+        # Greenlets only hold a connection around commits, but a burst of
+        # them can still outrun the default pool of 5
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': 10,
+            'max_overflow': app.config['WORKER_CONNECTIONS'],
+            'pool_timeout': 30,
+        }
+    
+    # Audit writes nobody reads back (error queries, download records) are
+    # batched by a background writer instead of committed per request
+    app.config['WRITE_BEHIND_ENABLED'] = os.environ.get('WRITE_BEHIND_ENABLED', 'true').lower() == 'true'
+    app.config['WRITE_BEHIND_MAX_PENDING'] = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', 1000))
+    app.config['WRITE_BEHIND_BATCH_SIZE'] = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', 100))
+    
+    # Retention: queries (and their downloads and PDFs) older than
+    # RETENTION_DAYS move to monthly archives in RETENTION_ARCHIVE_FOLDER.
+    # Run it here on a timer, or from cron with archive_old_records.py.
+    app.config['RETENTION_ENABLED'] = os.environ.get('RETENTION_ENABLED', 'false').lower() == 'true'
+    app.config['RETENTION_DAYS'] = int(os.environ.get('RETENTION_DAYS', 365))
+    app.config['RETENTION_ARCHIVE_FOLDER'] = os.environ.get('RETENTION_ARCHIVE_FOLDER', 'archive')
+    app.config['RETENTION_BATCH_SIZE'] = int(os.environ.get('RETENTION_BATCH_SIZE', 200))
+    app.config['RETENTION_INTERVAL'] = int(os.environ.get('RETENTION_INTERVAL', 3600))
+    
+    # Full-text search: text of stored PDFs is extracted by FULLTEXT_WORKERS
+    # processes into a separate SQLite FTS5 file. Run it here on a timer, or
+    # from cron with build_fulltext_index.py.
+    app.config['FULLTEXT_ENABLED'] = os.environ.get('FULLTEXT_ENABLED', 'false').lower() == 'true'
+    app.config['FULLTEXT_INDEX_PATH'] = os.environ.get(
+        'FULLTEXT_INDEX_PATH', os.path.join(app.instance_path, 'fulltext_index.db'))
+    app.config['FULLTEXT_WORKERS'] = int(os.environ.get('FULLTEXT_WORKERS', 2))
+    app.config['FULLTEXT_BATCH_SIZE'] = int(os.environ.get('FULLTEXT_BATCH_SIZE', 20))
+    app.config['FULLTEXT_INTERVAL'] = int(os.environ.get('FULLTEXT_INTERVAL', 60))
+    app.config['FULLTEXT_MAX_RESULTS'] = int(os.environ.get('FULLTEXT_MAX_RESULTS', 50))
+    
+    # Watchlist: watched cases are re-searched in the background, at most
+    # WATCHLIST_RATE portal searches per second, every WATCHLIST_REFRESH_HOURS
+    # (more often as a hearing nears); changes are recorded per case
+    app.config['WATCHLIST_ENABLED'] = os.environ.get('WATCHLIST_ENABLED', 'false').lower() == 'true'
+    app.config['WATCHLIST_INTERVAL'] = int(os.environ.get('WATCHLIST_INTERVAL', 60))
+    app.config['WATCHLIST_BATCH_SIZE'] = int(os.environ.get('WATCHLIST_BATCH_SIZE', 10))
+    app.config['WATCHLIST_RATE'] = float(os.environ.get('WATCHLIST_RATE', 0.2))
+    app.config['WATCHLIST_REFRESH_HOURS'] = float(os.environ.get('WATCHLIST_REFRESH_HOURS', 24))
+    
+    # Portal health: every PORTAL_HEALTH_INTERVAL seconds each of
+    # PORTAL_HEALTH_URLS (default: the portal) is probed in the background;
+    # /api/portal-status is served from the rolling window. After
+    # PORTAL_BREAKER_THRESHOLD consecutive failures searches fail fast for
+    # PORTAL_BREAKER_RESET seconds.
+    app.config['PORTAL_HEALTH_ENABLED'] = os.environ.get('PORTAL_HEALTH_ENABLED', 'false').lower() == 'true'
+    # An empty list falls back to the portal too: /api/portal-status reports the first URL
+    app.config['PORTAL_HEALTH_URLS'] = [url.strip() for url in os.environ.get(
+        'PORTAL_HEALTH_URLS', '').split(',') if url.strip()] or [app.config['PORTAL_BASE_URL']]
+    app.config['PORTAL_HEALTH_INTERVAL'] = int(os.environ.get('PORTAL_HEALTH_INTERVAL', 30))
+    app.config['PORTAL_HEALTH_TIMEOUT'] = float(os.environ.get('PORTAL_HEALTH_TIMEOUT', 10))
+    app.config['PORTAL_HEALTH_WINDOW'] = int(os.environ.get('PORTAL_HEALTH_WINDOW', 40))
+    app.config['PORTAL_HEALTH_SLOW_SECONDS'] = float(os.environ.get('PORTAL_HEALTH_SLOW_SECONDS', 5))
+    app.config['PORTAL_BREAKER_THRESHOLD'] = int(os.environ.get('PORTAL_BREAKER_THRESHOLD', 3))
+    app.config['PORTAL_BREAKER_RESET'] = int(os.environ.get('PORTAL_BREAKER_RESET', 60))
+    
+    # Retries of transient portal failures: up to RETRY_MAX_ATTEMPTS tries
+    # with jittered exponential backoff from RETRY_BACKOFF seconds, all within
+    # RETRY_DEADLINE seconds per search. Retries across the scraper and PDF
+    # downloads are capped at RETRY_BUDGET_RATIO of recent requests.
+    app.config['RETRY_MAX_ATTEMPTS'] = int(os.environ.get('RETRY_MAX_ATTEMPTS', 3))
+    app.config['RETRY_BACKOFF'] = float(os.environ.get('RETRY_BACKOFF', 1.0))
+    app.config['RETRY_DEADLINE'] = float(os.environ.get('RETRY_DEADLINE', 60))
+    app.config['RETRY_BUDGET_RATIO'] = float(os.environ.get('RETRY_BUDGET_RATIO', 0.2))
     
     # Initialize extensions
     init_db(app)
+    write_behind = WriteBehindQueue(app,
+                                    max_pending=app.config['WRITE_BEHIND_MAX_PENDING'],
+                                    batch_size=app.config['WRITE_BEHIND_BATCH_SIZE'])
+    if app.config['WRITE_BEHIND_ENABLED']:
+        write_behind.start()
+    app.extensions['write_behind'] = write_behind
     
     # Add custom Jinja2 filters
     @app.template_filter('decode_html')
@@ -40,8 +226,63 @@ def create_app():
         return html.unescape(str(text))
     
     # Initialize scrapers and handlers
-    scraper = DelhiHighCourtScraper()
-    pdf_handler = PDFHandler(app.config['UPLOAD_FOLDER'])
+    http_cache = HTTPValidatorCache(app.config['PORTAL_HTTP_CACHE_PATH'] or None,
+                                    max_age=app.config['PORTAL_HTTP_CACHE_MAX_AGE'],
+                                    max_entries=app.config['PORTAL_HTTP_CACHE_MAX_ENTRIES'])
+    retry_budget = RetryBudget(ratio=app.config['RETRY_BUDGET_RATIO'])
+    scraper_retries = RetryPolicy(max_attempts=app.config['RETRY_MAX_ATTEMPTS'],
+                                  backoff=app.config['RETRY_BACKOFF'],
+                                  deadline=app.config['RETRY_DEADLINE'],
+                                  budget=retry_budget)
+    pdf_retries = RetryPolicy(max_attempts=app.config['PDF_DOWNLOAD_RETRIES'] + 1,
+                              backoff=app.config['RETRY_BACKOFF'],
+                              deadline=300,
+                              budget=retry_budget)
+    scraper = DelhiHighCourtScraper(app.config['PORTAL_BASE_URL'],
+                                    pool_maxsize=app.config['WORKER_CONNECTIONS'],
+                                    http_cache=http_cache,
+                                    form_cache_ttl=app.config['PORTAL_FORM_CACHE_TTL'],
+                                    retry_policy=scraper_retries)
+    pdf_handler = PDFHandler(app.config['UPLOAD_FOLDER'],
+                             max_retries=app.config['PDF_DOWNLOAD_RETRIES'],
+                             parallel_chunks=app.config['PDF_PARALLEL_CHUNKS'],
+                             parallel_min_bytes=app.config['PDF_PARALLEL_MIN_BYTES'],
+                             retry_policy=pdf_retries)
+    fulltext_indexer = create_fulltext_indexer(app, pdf_handler)
+    app.extensions['fulltext'] = fulltext_indexer
+    if app.config['FULLTEXT_ENABLED']:
+        fulltext_indexer.start()
+    pdf_cleanup = create_pdf_cleanup(app, pdf_handler, write_behind, fulltext_indexer.index)
+    app.extensions['pdf_cleanup'] = pdf_cleanup
+    if app.config['PDF_CLEANUP_ENABLED']:
+        pdf_cleanup.start()
+    if app.config['RETENTION_ENABLED']:
+        app.extensions['retention'] = create_retention_job(app, fulltext_indexer.index).start()
+    breaker = HostCircuitBreaker(failure_threshold=app.config['PORTAL_BREAKER_THRESHOLD'],
+                                 reset_timeout=app.config['PORTAL_BREAKER_RESET'])
+    watchlist = WatchlistScheduler(app, scraper,
+                                   batch_size=app.config['WATCHLIST_BATCH_SIZE'],
+                                   interval=app.config['WATCHLIST_INTERVAL'],
+                                   rate=app.config['WATCHLIST_RATE'],
+                                   refresh_hours=app.config['WATCHLIST_REFRESH_HOURS'],
+                                   breaker=breaker)
+    app.extensions['watchlist'] = watchlist
+    if app.config['WATCHLIST_ENABLED']:
+        watchlist.start()
+    prefetcher = PdfPrefetcher(pdf_handler, write_behind,
+                               max_workers=app.config['PDF_PREFETCH_WORKERS'],
+                               host_rate=app.config['PDF_PREFETCH_HOST_RATE'],
+                               on_access=pdf_cleanup.record_access)
+    app.extensions['pdf_prefetcher'] = prefetcher
+    portal_health = PortalHealthProber(app.config['PORTAL_HEALTH_URLS'], breaker,
+                                       limiters=[watchlist.limiter, prefetcher.limiter],
+                                       interval=app.config['PORTAL_HEALTH_INTERVAL'],
+                                       timeout=app.config['PORTAL_HEALTH_TIMEOUT'],
+                                       window=app.config['PORTAL_HEALTH_WINDOW'],
+                                       slow_seconds=app.config['PORTAL_HEALTH_SLOW_SECONDS'])
+    app.extensions['portal_health'] = portal_health
+    if app.config['PORTAL_HEALTH_ENABLED']:
+        portal_health.start()
     
     # Routes
     @app.route('/')
@@ -89,34 +330,68 @@ def create_app():
                 flash(error_message, 'error')
                 return redirect(url_for('index'))
             
-            # Create query record
+            # Create query record; it is written once, after the search, and
+            # only synchronously when the results page needs its id
             query = Query(
                 case_type=case_type,
                 case_number=case_number,
                 filing_year=filing_year,
+                query_timestamp=datetime.utcnow(),
                 status='pending'
             )
-            db.session.add(query)
-            db.session.commit()
             
-            # Search for case data
-            search_result = scraper.search_case(case_type, case_number, filing_year)
+            # Search for case data, unless the portal is known to be down
+            try:
+                if breaker.allow(scraper.base_url):
+                    search_result = scraper.search_case(case_type, case_number, filing_year)
+                else:
+                    search_result = {
+                        'status': 'error',
+                        'error_message': 'The court portal is not responding. Please try again in a few minutes.',
+                        'case_data': None
+                    }
+            except Exception as e:
+                query.status = 'error'
+                query.error_message = f'Unexpected error: {str(e)}'
+                write_behind.add(query)
+                raise
             
             if search_result['status'] == 'success':
-                # Update query with success status
+                # Save query with success status, linked to the normalized case
                 query.status = 'success'
-                query.set_response_data(search_result['case_data'])
-                db.session.commit()
+                for attempt in range(2):
+                    try:
+                        # Unchanged results leave the case and its orders
+                        # untouched, and the query points at the earlier
+                        # query holding the same result instead of a copy
+                        update = apply_case_data(search_result['case_data'])
+                        query.case = update.case
+                        query.content_hash = update.content_hash
+                        store_result(query, update, search_result['case_data'])
+                        db.session.add(query)
+                        db.session.commit()
+                        break
+                    except IntegrityError:
+                        # A concurrent search inserted the same case first
+                        db.session.rollback()
+                        if attempt:
+                            raise
+                
+                # Also for unchanged results: orders whose earlier prefetch
+                # failed are retried, stored ones are skipped by the prefetcher
+                if app.config['PDF_PREFETCH_ENABLED']:
+                    prefetcher.prefetch(search_result['case_data'].get('orders'))
                 
                 # Render results page
                 return render_template('results.html', 
                                     case_data=search_result['case_data'],
-                                    query=query)
+                                    query=query,
+                                    stored_pdfs=stored_order_pdfs(search_result['case_data']))
             else:
-                # Update query with error status
+                # Record query with error status in the background
                 query.status = 'error'
                 query.error_message = search_result['error_message']
-                db.session.commit()
+                write_behind.add(query)
                 
                 flash(f'Error fetching case data: {search_result["error_message"]}', 'error')
                 return redirect(url_for('index'))
@@ -126,33 +401,142 @@ def create_app():
             flash('An unexpected error occurred while fetching case data', 'error')
             return redirect(url_for('index'))
 
+    @app.route('/result/<int:query_id>')
+    def view_result(query_id):
+        """Show the stored result of an earlier successful search"""
+        query = db.session.get(Query, query_id)
+        case_data = stored_result(query) if query is not None and query.status == 'success' else None
+        if case_data is None:
+            flash('No stored result for that search', 'error')
+            return redirect(url_for('search_history'))
+        
+        return render_template('results.html',
+                            case_data=case_data,
+                            query=query,
+                            stored_pdfs=stored_order_pdfs(case_data))
+
+    @app.route('/result/<int:query_id>/orders.zip')
+    def download_orders_zip(query_id):
+        """Stream all order PDFs of a stored result as one ZIP"""
+        query = db.session.get(Query, query_id)
+        case_data = stored_result(query) if query is not None and query.status == 'success' else None
+        if case_data is None:
+            flash('No stored result for that search', 'error')
+            return redirect(url_for('search_history'))
+        
+        if not order_pdf_urls(case_data.get('orders')):
+            flash('This case has no order PDFs to download', 'error')
+            return redirect(url_for('view_result', query_id=query_id))
+        
+        filename = secure_filename(f"{case_data.get('case_id') or query_id}_orders.zip")
+        response = Response(stream_with_context(prefetcher.iter_zip(case_data.get('orders'))),
+                            mimetype='application/zip')
+        response.headers['Content-Disposition'] = dump_options_header('attachment', {'filename': filename})
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    def stored_order_pdfs(case_data):
+        """Digests of a case's order PDFs already in the store, by URL, for previews"""
+        try:
+            sources = prefetcher.cached_sources(order_pdf_urls(case_data.get('orders')))
+        except Exception as e:
+            logger.error(f"Error looking up stored order PDFs: {str(e)}")
+            return {}
+        return {url: source.digest for url, source in sources.items()}
+
+    def immutable(response):
+        """Cache headers for responses keyed by content digest, which never change"""
+        response.cache_control.public = True
+        response.cache_control.max_age = 365 * 24 * 3600
+        response.cache_control.immutable = True
+        return response
+
+    def send_pdf(local_path, filename, digest):
+        """
+        Send a stored PDF. Blobs are named by content digest, so the digest
+        is a strong ETag; Last-Modified, 304s and Range requests come from
+        send_file. In x-accel mode nginx streams the file instead.
+        """
+        if app.config['PDF_SERVE_MODE'] == 'x-accel':
+            relative_path = os.path.relpath(local_path, app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+            response = Response(status=200, mimetype='application/pdf')
+            response.headers['X-Accel-Redirect'] = app.config['PDF_ACCEL_PREFIX'].rstrip('/') + '/' + relative_path
+            response.headers['Content-Disposition'] = dump_options_header('attachment', {'filename': filename})
+            response.set_etag(digest)
+            return response
+        
+        return send_file(local_path,
+                         mimetype='application/pdf',
+                         as_attachment=True,
+                         download_name=filename,
+                         etag=digest,
+                         conditional=True)
+
+    def record_download(pdf_url, result, query_id, new_blob=False):
+        """Index a fetched PDF and record the download, in the background"""
+        if new_blob:
+            write_behind.submit(lambda session: record_pdf_source(
+                session, pdf_url, result['digest'], result['file_size'], result['filename']))
+        # Download rows need the originating query
+        if query_id is not None:
+            write_behind.add(Download(
+                query_id=query_id,
+                pdf_url=pdf_url,
+                local_path=result['local_path'],
+                filename=result['filename'],
+                file_size=result['file_size'],
+                digest=result['digest'],
+                status='success'
+            ))
+    
+    def stream_pdf(pdf_url, opened, query_id):
+        """
+        Forward an upstream PDF to the client as it arrives while it is
+        written to the store; it is indexed once the body is complete. If
+        the client disconnects, the partial file is discarded.
+        """
+        chunks = pdf_handler.stream_pdf(
+            opened, on_complete=lambda result: record_download(pdf_url, result, query_id, new_blob=True))
+        response = Response(chunks, mimetype='application/pdf')
+        response.headers['Content-Disposition'] = dump_options_header('attachment', {'filename': opened['filename']})
+        if opened['content_length'] is not None:
+            response.headers['Content-Length'] = str(opened['content_length'])
+        # Let nginx pass bytes through instead of buffering the whole body
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
     @app.route('/download/<path:url>')
     def download_pdf(url):
         """Download PDF file"""
         try:
             # Decode the URL
             pdf_url = unquote(url)
+            query_id = request.args.get('query_id', type=int)
             
-            # Download the PDF
-            download_result = pdf_handler.download_pdf(pdf_url)
+            # Serve from the content-addressed store when this URL was
+            # fetched before; only go to the portal for unknown URLs
+            source = db.session.get(PdfSource, pdf_url)
+            if source is not None and pdf_handler.has_blob(source.digest):
+                local_path = pdf_handler.blob_path(source.digest)
+                download_result = {'status': 'success', 'local_path': local_path,
+                                   'filename': source.filename, 'digest': source.digest,
+                                   'file_size': os.path.getsize(local_path)}
+                record_download(pdf_url, download_result, query_id)
+                pdf_cleanup.record_access(source.digest)
+            elif app.config['PDF_STREAM_DOWNLOADS']:
+                opened = pdf_handler.open_pdf(pdf_url)
+                if opened['status'] == 'success':
+                    return stream_pdf(pdf_url, opened, query_id)
+                download_result = opened
+            else:
+                download_result = pdf_handler.download_pdf(pdf_url)
+                if download_result['status'] == 'success':
+                    record_download(pdf_url, download_result, query_id, new_blob=True)
             
             if download_result['status'] == 'success':
-                # Create download record
-                download = Download(
-                    query_id=request.args.get('query_id', type=int),
-                    pdf_url=pdf_url,
-                    local_path=download_result['local_path'],
-                    filename=download_result['filename'],
-                    file_size=download_result['file_size'],
-                    status='success'
-                )
-                db.session.add(download)
-                db.session.commit()
-                
                 # Send the file
-                return send_file(download_result['local_path'], 
-                               as_attachment=True,
-                               download_name=download_result['filename'])
+                return send_pdf(download_result['local_path'], download_result['filename'],
+                                download_result['digest'])
             else:
                 flash(f'Error downloading PDF: {download_result["error_message"]}', 'error')
                 return redirect(request.referrer or url_for('index'))
@@ -166,13 +550,17 @@ def create_app():
     def search_history():
         """Display search history"""
         try:
-            page = request.args.get('page', 1, type=int)
             per_page = 20
             
-            queries = Query.query.order_by(Query.query_timestamp.desc()).paginate(
-                page=page, per_page=per_page, error_out=False)
+            try:
+                queries = keyset_paginate(Query.query, Query.query_timestamp, Query.id,
+                                          per_page, request.args.get('cursor'))
+            except ValueError:
+                flash('That history page link is no longer valid', 'warning')
+                return redirect(url_for('search_history'))
             
-            return render_template('search_history.html', queries=queries)
+            return render_template('search_history.html', queries=queries,
+                                   total_searches=approximate_row_count(db.session, Query.id))
         except Exception as e:
             logger.error(f"Error in search_history route: {str(e)}")
             flash('An error occurred while loading search history', 'error')
@@ -195,28 +583,50 @@ def create_app():
 
     @app.route('/api/search-history')
     def api_search_history():
-        """API endpoint to get search history"""
+        """
+        API endpoint to get search history
+        Page mode (default): ?page=N&per_page=M
+        Cursor mode: ?mode=cursor or ?cursor=<next_cursor|prev_cursor>, with
+        optional include_total=approx for a cheap row-count estimate
+        """
         try:
-            page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 10, type=int)
+            max_per_page = app.config['HISTORY_MAX_PER_PAGE']
+            if per_page < 1 or per_page > max_per_page:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'per_page must be between 1 and {max_per_page}; '
+                               f'use /api/search-history/export for bulk downloads'
+                }), 400
+            
+            if request.args.get('mode') == 'cursor' or 'cursor' in request.args:
+                try:
+                    history_page = keyset_paginate(Query.query, Query.query_timestamp, Query.id,
+                                                   per_page, request.args.get('cursor'))
+                except ValueError:
+                    return jsonify({
+                        'status': 'error',
+                        'message': 'Invalid cursor'
+                    }), 400
+                
+                payload = {
+                    'status': 'success',
+                    'history': [query.to_summary_dict() for query in history_page.items],
+                    'next_cursor': history_page.next_cursor,
+                    'prev_cursor': history_page.prev_cursor,
+                    'per_page': per_page
+                }
+                if request.args.get('include_total') == 'approx':
+                    payload['approx_total'] = approximate_row_count(db.session, Query.id)
+                return jsonify(payload)
             
+            page = request.args.get('page', 1, type=int)
             queries = Query.query.order_by(Query.query_timestamp.desc()).paginate(
                 page=page, per_page=per_page, error_out=False)
             
-            history = []
-            for query in queries.items:
-                history.append({
-                    'id': query.id,
-                    'case_type': query.case_type,
-                    'case_number': query.case_number,
-                    'filing_year': query.filing_year,
-                    'status': query.status,
-                    'timestamp': query.query_timestamp.isoformat() if query.query_timestamp else None
-                })
-            
             return jsonify({
                 'status': 'success',
-                'history': history,
+                'history': [query.to_summary_dict() for query in queries.items],
                 'total': queries.total,
                 'pages': queries.pages,
                 'current_page': queries.page
@@ -228,11 +638,345 @@ def create_app():
                 'message': 'Failed to fetch search history'
             }), 500
 
+    @app.route('/api/search-history/export')
+    def api_export_search_history():
+        """
+        Stream the full search history as NDJSON (default) or CSV.
+        Rows are read through a server-side cursor in batches and written
+        out one at a time, so memory use does not depend on table size.
+        """
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({
+                'status': 'error',
+                'message': 'format must be ndjson or csv'
+            }), 400
+        
+        columns = [Query.id, Query.case_type, Query.case_number, Query.filing_year,
+                   Query.status, Query.query_timestamp, Query.error_message]
+        field_names = ['id', 'case_type', 'case_number', 'filing_year',
+                       'status', 'timestamp', 'error_message']
+        statement = select(*columns).order_by(Query.id).execution_options(yield_per=1000)
+        
+        def rows():
+            for row in db.session.execute(statement):
+                record = dict(zip(field_names, row))
+                if record['timestamp'] is not None:
+                    record['timestamp'] = record['timestamp'].isoformat()
+                yield record
+        
+        def generate_ndjson():
+            for record in rows():
+                yield dumps(record) + '\n'
+        
+        def generate_csv():
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=field_names)
+            writer.writeheader()
+            for record in rows():
+                writer.writerow(record)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        
+        if export_format == 'csv':
+            body, mimetype = generate_csv(), 'text/csv'
+        else:
+            body, mimetype = generate_ndjson(), 'application/x-ndjson'
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return Response(stream_with_context(body), mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename=search_history_{timestamp}.{export_format}'
+        })
+
+    @app.route('/api/cases/hearings')
+    def api_case_hearings():
+        """API endpoint listing stored cases with their next hearing on a date (default: tomorrow)"""
+        try:
+            hearing_date = request.args.get('date')
+            try:
+                on = date.fromisoformat(hearing_date) if hearing_date else date.today() + timedelta(days=1)
+            except ValueError:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'date must be YYYY-MM-DD'
+                }), 400
+            
+            limit = min(max(request.args.get('limit', 50, type=int), 1), app.config['HISTORY_MAX_PER_PAGE'])
+            cases = Case.query.filter(Case.next_hearing_on == on).order_by(Case.id).limit(limit).all()
+            
+            return jsonify({
+                'status': 'success',
+                'date': on.isoformat(),
+                'cases': [case.to_dict() for case in cases]
+            })
+        except Exception as e:
+            logger.error(f"Error in api_case_hearings: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'message': 'Failed to fetch hearings'
+            }), 500
+
+    @app.route('/api/pdf/<digest>/metadata')
+    def api_pdf_metadata(digest):
+        """API endpoint for cheap metadata of a stored PDF (no page parsing)"""
+        try:
+            metadata = pdf_handler.get_blob_metadata(digest)
+        except FileNotFoundError:
+            return jsonify({
+                'status': 'error',
+                'message': 'Unknown PDF'
+            }), 404
+        except Exception as e:
+            logger.error(f"Error in api_pdf_metadata: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'message': 'Failed to read PDF metadata'
+            }), 500
+        
+        return immutable(jsonify({'status': 'success', 'digest': digest, 'metadata': metadata}))
+
+    @app.route('/api/pdf/<digest>/preview')
+    def api_pdf_preview(digest):
+        """API endpoint for the first-page preview of a stored PDF"""
+        try:
+            preview = pdf_handler.get_blob_preview(digest)
+        except FileNotFoundError:
+            return jsonify({
+                'status': 'error',
+                'message': 'Unknown PDF'
+            }), 404
+        except Exception as e:
+            logger.error(f"Error in api_pdf_preview: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'message': 'Failed to build PDF preview'
+            }), 500
+        
+        preview = dict(preview, thumbnail_url=url_for('pdf_thumbnail', digest=digest,
+                                                      width=app.config['PDF_THUMBNAIL_WIDTH']))
+        return immutable(jsonify({'status': 'success', 'digest': digest, 'preview': preview}))
+
+    @app.route('/api/pdf/<digest>/thumbnail-<int:width>.png')
+    def pdf_thumbnail(digest, width):
+        """First-page thumbnail of a stored PDF; the width is in the URL, as the response is immutable"""
+        if width != app.config['PDF_THUMBNAIL_WIDTH']:
+            # Links from before PDF_THUMBNAIL_WIDTH changed; only that width is rendered
+            return redirect(url_for('pdf_thumbnail', digest=digest, width=app.config['PDF_THUMBNAIL_WIDTH']))
+        try:
+            path = pdf_handler.get_blob_thumbnail(digest, width)
+        except FileNotFoundError:
+            return jsonify({
+                'status': 'error',
+                'message': 'Unknown PDF'
+            }), 404
+        except Exception as e:
+            logger.error(f"Error in pdf_thumbnail: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'message': 'Failed to render PDF thumbnail'
+            }), 500
+        
+        return immutable(send_file(path, mimetype='image/png', etag=f'{digest}-thumb-{width}', conditional=True))
+
+    @app.route('/api/pdf/<digest>/text')
+    def api_pdf_text(digest):
+        """API endpoint for the text of a window of pages of a stored PDF"""
+        start = request.args.get('start', 0, type=int)
+        limit = request.args.get('limit', 1, type=int)
+        if start < 0 or not 1 <= limit <= app.config['PDF_TEXT_MAX_PAGES']:
+            return jsonify({
+                'status': 'error',
+                'message': f"start must be >= 0 and limit between 1 and {app.config['PDF_TEXT_MAX_PAGES']}"
+            }), 400
+        
+        try:
+            pages = [{'page': number + 1, 'text': text}
+                     for number, text in pdf_handler.iter_blob_text(digest, start, start + limit)]
+        except FileNotFoundError:
+            return jsonify({
+                'status': 'error',
+                'message': 'Unknown PDF'
+            }), 404
+        except Exception as e:
+            logger.error(f"Error in api_pdf_text: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'message': 'Failed to extract PDF text'
+            }), 500
+        
+        return jsonify({'status': 'success', 'digest': digest, 'pages': pages})
+
+    @app.route('/api/search/fulltext')
+    def api_search_fulltext():
+        """API endpoint for ranked full-text search over indexed PDFs"""
+        text = request.args.get('q', '').strip()
+        limit = request.args.get('limit', 20, type=int)
+        offset = request.args.get('offset', 0, type=int)
+        if not text or offset < 0 or not 1 <= limit <= app.config['FULLTEXT_MAX_RESULTS']:
+            return jsonify({
+                'status': 'error',
+                'message': f"q is required, offset must be >= 0 and limit between 1 and {app.config['FULLTEXT_MAX_RESULTS']}"
+            }), 400
+        
+        try:
+            hits = fulltext_indexer.index.search(text, limit=limit, offset=offset)
+            sources = {}
+            digests = {hit['digest'] for hit in hits}
+            if digests:
+                for source in PdfSource.query.filter(PdfSource.digest.in_(digests)).order_by(PdfSource.fetched_at.desc()):
+                    sources.setdefault(source.digest, source)
+            
+            results = []
+            for hit in hits:
+                # A blob deleted while the search ran is already gone from disk
+                if not pdf_handler.has_blob(hit['digest']):
+                    continue
+                source = sources.get(hit['digest'])
+                hit['url'] = source.url if source else None
+                hit['filename'] = source.filename if source else None
+                results.append(hit)
+        except Exception as e:
+            logger.error(f"Error in api_search_fulltext: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'message': 'Full-text search failed'
+            }), 500
+        
+        return jsonify({
+            'status': 'success',
+            'query': text,
+            'results': results,
+            'offset': offset,
+            'limit': limit
+        })
+
+    def add_watched_case(case_type, case_number, filing_year, label=None):
+        """
+        Put a case on the watchlist (or reactivate it); it is refreshed on
+        the scheduler's next tick
+        Returns: (entry, created, error message)
+        """
+        case_type = sanitize_input(case_type or '')
+        case_number = sanitize_input(case_number or '')
+        try:
+            filing_year = int(filing_year)
+        except (ValueError, TypeError):
+            return None, False, 'Invalid filing year'
+        is_valid, error_message = validate_form_data(case_type, case_number, filing_year)
+        if not is_valid:
+            return None, False, error_message
+        
+        watch = WatchedCase.query.filter_by(case_type=case_type, case_number=case_number,
+                                            filing_year=filing_year).first()
+        created = watch is None
+        if created:
+            watch = WatchedCase(case_type=case_type, case_number=case_number, filing_year=filing_year,
+                                next_refresh_at=datetime.utcnow())
+            db.session.add(watch)
+        elif not watch.active:
+            watch.active = True
+            watch.next_refresh_at = datetime.utcnow()
+        if label:
+            watch.label = sanitize_input(label)[:200]
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Added concurrently by another request
+            db.session.rollback()
+            watch = WatchedCase.query.filter_by(case_type=case_type, case_number=case_number,
+                                                filing_year=filing_year).first()
+            created = False
+        return watch, created, None
+
+    @app.route('/watchlist/add', methods=['POST'])
+    def watch_case():
+        """Add the case shown on the results page to the watchlist"""
+        try:
+            watch, created, error_message = add_watched_case(request.form.get('case_type'),
+                                                             request.form.get('case_number'),
+                                                             request.form.get('filing_year'))
+            if error_message:
+                flash(error_message, 'error')
+            elif created:
+                flash('Case added to the watchlist; it will be checked for updates automatically', 'success')
+            else:
+                flash('This case is already on the watchlist', 'info')
+        except Exception as e:
+            logger.error(f"Error in watch_case route: {str(e)}")
+            flash('An error occurred while adding the case to the watchlist', 'error')
+        return redirect(request.referrer or url_for('index'))
+
+    @app.route('/api/watchlist', methods=['GET', 'POST'])
+    def api_watchlist():
+        """API endpoint to list watched cases, or add one (JSON or form body)"""
+        try:
+            if request.method == 'POST':
+                data = request.get_json(silent=True) or request.form
+                watch, created, error_message = add_watched_case(data.get('case_type'), data.get('case_number'),
+                                                                 data.get('filing_year'), data.get('label'))
+                if error_message:
+                    return jsonify({
+                        'status': 'error',
+                        'message': error_message
+                    }), 400
+                return jsonify({'status': 'success', 'watch': watch.to_dict()}), 201 if created else 200
+            
+            watches = (WatchedCase.query.filter_by(active=True)
+                       .order_by(WatchedCase.next_refresh_at, WatchedCase.id).all())
+            return jsonify({'status': 'success', 'watchlist': [watch.to_dict() for watch in watches]})
+        except Exception as e:
+            logger.error(f"Error in api_watchlist: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'message': 'Failed to access the watchlist'
+            }), 500
+
+    @app.route('/api/watchlist/<int:watch_id>', methods=['DELETE'])
+    def api_unwatch(watch_id):
+        """API endpoint to stop watching a case; its change history is kept"""
+        watch = db.session.get(WatchedCase, watch_id)
+        if watch is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Unknown watchlist entry'
+            }), 404
+        watch.active = False
+        db.session.commit()
+        return jsonify({'status': 'success', 'watch': watch.to_dict()})
+
+    @app.route('/api/watchlist/<int:watch_id>/changes')
+    def api_watch_changes(watch_id):
+        """API endpoint for the changes spotted on a watched case, newest first"""
+        watch = db.session.get(WatchedCase, watch_id)
+        if watch is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Unknown watchlist entry'
+            }), 404
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        changes = []
+        if watch.case_id is not None:
+            # Changes to the case, whether a refresh or someone's search found them
+            changes = (CaseChange.query.filter_by(case_id=watch.case_id)
+                       .order_by(CaseChange.detected_at.desc(), CaseChange.id.desc())
+                       .limit(limit).all())
+        return jsonify({
+            'status': 'success',
+            'watch': watch.to_dict(),
+            'changes': [change.to_dict() for change in changes]
+        })
+
     @app.route('/api/portal-status')
     def api_portal_status():
         """API endpoint to check portal status"""
         try:
-            status = scraper.get_portal_status()
+            if app.config['PORTAL_HEALTH_ENABLED']:
+                # Latest probe and rolling window, from memory
+                status = portal_health.status(app.config['PORTAL_HEALTH_URLS'][0])
+            else:
+                status = scraper.get_portal_status()
             return jsonify({
                 'status': 'success',
                 'portal_status': status
@@ -244,6 +988,20 @@ def create_app():
                 'message': 'Failed to check portal status'
             }), 500
 
+    @app.route('/api/health')
+    def api_health():
+        """Liveness check for container healthchecks; never calls the portal"""
+        try:
+            db.session.execute(select(1))
+        except Exception as e:
+            logger.error(f"Error in api_health: {str(e)}")
+            return jsonify({'status': 'error', 'message': 'Database unavailable'}), 503
+        return jsonify({
+            'status': 'success',
+            'portal': portal_health.status() if app.config['PORTAL_HEALTH_ENABLED'] else None,
+            'retries': {'scraper': scraper_retries.stats, 'pdf': pdf_retries.stats}
+        })
+
     @app.errorhandler(404)
     def not_found_error(error):
         return render_template('404.html'), 404
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Archive old search history for Court Data Fetcher
+
+Moves queries older than RETENTION_DAYS (with their download records) into
+monthly gzip NDJSON files in RETENTION_ARCHIVE_FOLDER, deletes their PDFs,
+and drops download rows whose file is already gone. Safe to run from cron
+while the app is serving; concurrent runs skip.
+
+Usage:
+    python archive_old_records.py --days 365
+"""
+
+import argparse
+import os
+import sys
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, help='override RETENTION_DAYS')
+    parser.add_argument('--max-batches', type=int, default=1000,
+                        help='stop after this many batches (default 1000)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('WRITE_BEHIND_ENABLED', 'false')
+    os.environ['RETENTION_ENABLED'] = 'false'  # run once here, not on the timer
+    from app import create_app, create_retention_job
+
+    app = create_app()
+    if args.days is not None:
+        app.config['RETENTION_DAYS'] = args.days
+    job = create_retention_job(app, app.extensions['fulltext'].index)
+    job.max_batches = args.max_batches
+
+    result = job.run_once()
+    if result is None:
+        print("ℹ️  Another retention run is in progress, skipping")
+        sys.exit(0)
+    print(f"🗄️  Archived {result['queries_archived']:,} queries and {result['downloads_archived']:,} "
+          f"downloads to {app.config['RETENTION_ARCHIVE_FOLDER']}, deleted {result['files_deleted']:,} files")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark: peak Python memory while streaming /api/search-history/export
+
+Loads tables of increasing size and consumes the export response chunk by
+chunk (as a client would), recording tracemalloc peaks. A streaming export
+should show the same peak regardless of row count.
+
+Usage:
+    python benchmarks/bench_history_export.py --rows 100000 1000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bench_history_indexes import build_legacy_table
+
+
+def measure(rows, export_format):
+    work_dir = tempfile.mkdtemp(prefix='cdf-export-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(work_dir, 'court_data.db')}"
+    os.environ['UPLOAD_FOLDER'] = os.path.join(work_dir, 'downloads')
+
+    from app import create_app
+    from models.database import db
+
+    app = create_app()
+    with app.app_context():
+        build_legacy_table(rows)
+        db.session.remove()
+
+    client = app.test_client()
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(f'/api/search-history/export?format={export_format}', buffered=False)
+    total_bytes = 0
+    for chunk in response.response:
+        total_bytes += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return total_bytes, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'exported':>10} {'elapsed':>9} {'peak memory':>12}")
+    for rows in args.rows:
+        total_bytes, elapsed, peak = measure(rows, args.format)
+        print(f"{rows:>10,} {total_bytes / 2**20:>8.1f}MB {elapsed:>8.1f}s {peak / 2**20:>10.2f}MB")
+
+
+if __name__ == '__main__':
+    main()
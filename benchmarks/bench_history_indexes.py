@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: search history latency on a large queries table, before and after
+the indexes declared in models/database.py
+
+Builds a legacy (index-free) court_data.db with N rows, times the queries the
+history pages run, applies upgrade_schema() the way init_db does for existing
+databases, and times them again.
+
+Usage:
+    python benchmarks/bench_history_indexes.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+
+from models.database import db, Query, Download, upgrade_schema
+from utils.pagination import keyset_paginate, encode_cursor
+
+CASE_TYPES = ['WP(C)', 'CRL.A.', 'LPA', 'FAO', 'RFA', 'CM', 'ARB.P.']
+
+
+def create_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def build_legacy_table(rows, batch=50000):
+    """Create tables without secondary indexes and bulk-load rows"""
+    db.create_all()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.drop(bind=db.engine, checkfirst=True)
+
+    start = datetime(2015, 1, 1)
+    rng = random.Random(42)
+    with db.engine.begin() as conn:
+        for offset in range(0, rows, batch):
+            values = []
+            for i in range(offset, min(offset + batch, rows)):
+                values.append({
+                    'case_type': rng.choice(CASE_TYPES),
+                    'case_number': str(rng.randint(1, 20000)),
+                    'filing_year': rng.randint(1990, 2024),
+                    # Timestamps deliberately out of id order, as with clock skew
+                    'query_timestamp': start + timedelta(seconds=i * 60 + rng.randint(0, 600)),
+                    'status': 'success' if i % 7 else 'error',
+                })
+            conn.execute(Query.__table__.insert(), values)
+        conn.execute(Download.__table__.insert(), [
+            {'query_id': rng.randint(1, rows), 'pdf_url': f'https://example.nic.in/orders/{i}.pdf',
+             'local_path': f'/tmp/{i}.pdf', 'filename': f'{i}.pdf', 'status': 'success'}
+            for i in range(min(rows // 10, 100000))
+        ])
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def workload():
+    """The statements the app issues per page view / lookup"""
+    # Cursor positioned about 500 pages (10,000 rows) into the history
+    deep_cursor = encode_cursor(datetime(2015, 1, 1) + timedelta(minutes=10000), 2 ** 62)
+    deeper_cursor = encode_cursor(datetime(2015, 1, 1) + timedelta(minutes=900000), 2 ** 62)
+    return {
+        'index(): recent 5': lambda: Query.query.order_by(Query.query_timestamp.desc()).limit(5).all(),
+        'history page 1': lambda: Query.query.order_by(Query.query_timestamp.desc()).limit(20).all(),
+        'history page 500': lambda: Query.query.order_by(Query.query_timestamp.desc())
+                                        .offset(500 * 20).limit(20).all(),
+        'history page 45000': lambda: Query.query.order_by(Query.query_timestamp.desc())
+                                          .offset(45000 * 20).limit(20).all(),
+        'keyset ~page 500': lambda: keyset_paginate(Query.query, Query.query_timestamp, Query.id,
+                                                    20, deep_cursor).items,
+        'keyset ~page 45000': lambda: keyset_paginate(Query.query, Query.query_timestamp, Query.id,
+                                                      20, deeper_cursor).items,
+        'case lookup': lambda: Query.query.filter_by(case_type='WP(C)', case_number='623',
+                                                     filing_year=2024).all(),
+        'downloads by query': lambda: db.session.query(Download).filter_by(query_id=12345).all(),
+        'downloads by url': lambda: db.session.query(Download).filter_by(
+            pdf_url='https://example.nic.in/orders/777.pdf').all(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='cdf-bench-'), 'court_data.db')
+    app = create_app(db_path)
+
+    with app.app_context():
+        started = time.perf_counter()
+        build_legacy_table(args.rows)
+        print(f"Loaded {args.rows:,} queries in {time.perf_counter() - started:.1f}s ({db_path})")
+
+        before = {name: timed(fn, args.repeat) for name, fn in workload().items()}
+
+        started = time.perf_counter()
+        upgrade_schema()
+        db.session.execute(text('ANALYZE'))
+        print(f"upgrade_schema() built indexes in {time.perf_counter() - started:.1f}s")
+
+        after = {name: timed(fn, args.repeat) for name, fn in workload().items()}
+
+    print(f"\n{'query':<22} {'no index (ms)':>14} {'indexed (ms)':>13} {'speedup':>8}")
+    for name in before:
+        speedup = before[name] / after[name] if after[name] else float('inf')
+        print(f"{name:<22} {before[name]:>14.2f} {after[name]:>13.2f} {speedup:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: time to first byte for uncached PDF downloads, buffered vs tee-streamed
+
+Serves a large fake judgment from a local "portal" that trickles it out in
+chunks, then times /download/<url> with PDF_STREAM_DOWNLOADS off (write the
+whole file, then send_file) and on (forward chunks while caching).
+
+Usage:
+    python benchmarks/bench_pdf_streaming.py --size-mb 8 --chunk-delay 0.01
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+CHUNK = 64 * 1024
+
+
+def start_portal(size, chunk_delay):
+    body = b'%PDF-1.4\n' + os.urandom(size)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/pdf')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            for start in range(0, len(body), CHUNK):
+                self.wfile.write(body[start:start + CHUNK])
+                time.sleep(chunk_delay)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_app(stream):
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    app = create_app()
+    app.config['PDF_STREAM_DOWNLOADS'] = stream
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(app_port, pdf_url):
+    import requests
+    started = time.perf_counter()
+    with requests.get(f'http://127.0.0.1:{app_port}/download/{pdf_url}', stream=True) as response:
+        chunks = response.iter_content(CHUNK)
+        next(chunks)
+        first_byte = time.perf_counter() - started
+        for _ in chunks:
+            pass
+    return first_byte * 1000, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=8)
+    parser.add_argument('--chunk-delay', type=float, default=0.01,
+                        help='seconds the portal waits between 64KB chunks')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='cdf-stream-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(work_dir, 'court_data.db')}"
+    os.environ['UPLOAD_FOLDER'] = os.path.join(work_dir, 'downloads')
+
+    portal = start_portal(int(args.size_mb * 1024 * 1024), args.chunk_delay)
+    print(f"{args.size_mb:g} MB judgment, {args.chunk_delay * 1000:g}ms between 64KB chunks\n")
+    print(f"{'mode':<10} {'first byte ms':>14} {'total ms':>10}")
+    for index, stream in enumerate((False, True)):
+        server = start_app(stream)
+        # A distinct URL per mode so both are cache misses
+        pdf_url = f'http://127.0.0.1:{portal.server_port}/orders/judgment-{index}.pdf'
+        first_byte, total = measure(server.server_port, pdf_url)
+        print(f"{'stream' if stream else 'buffered':<10} {first_byte:>14.1f} {total:>10.1f}")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: JSON backends (stdlib json vs orjson) and deferred response_data
+
+Measures encode/decode of a typical case payload, the history API page,
+result-page rendering and listing queries with response_data deferred vs
+eagerly loaded.
+
+Usage:
+    python benchmarks/bench_serialization.py --rows 2000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def sample_case(i):
+    orders = [{
+        'title': f'Order dated {day:02d}/01/2024',
+        'date': f'{day:02d}/01/2024',
+        'type': 'Judgment' if day % 5 == 0 else 'Order',
+        'pdf_url': f'https://dhcmisc.nic.in/orders/{i}_{day}.pdf',
+        'description': 'Listed before the Hon\'ble Court; arguments heard in part. ' * 3,
+    } for day in range(1, 29)]
+    return {
+        'case_id': f'WP(C)-{i}/2024', 'case_type': 'WP(C)', 'case_number': str(i), 'filing_year': '2024',
+        'petitioners': [f'Petitioner {i}', 'Co-Petitioner'], 'respondents': ['State of Delhi', 'Union of India'],
+        'filing_date': '15/01/2024', 'next_hearing_date': '20/02/2024', 'case_status': 'PENDING',
+        'court': 'Delhi High Court', 'bench': 'Division Bench', 'judge': "Hon'ble Justice Sample",
+        'orders': orders, 'last_updated': '2024-01-20T10:00:00', 'njdg_link': '', 'cnr_number': '',
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='cdf-json-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(work_dir, 'court_data.db')}"
+    os.environ['UPLOAD_FOLDER'] = os.path.join(work_dir, 'downloads')
+    os.environ['WRITE_BEHIND_ENABLED'] = 'false'
+
+    from sqlalchemy.orm import undefer
+    from app import create_app
+    from models.database import db, Query
+    from utils import serialization
+
+    app = create_app()
+    with app.app_context():
+        for i in range(args.rows):
+            query = Query(case_type='WP(C)', case_number=str(i), filing_year=2024, status='success')
+            query.set_response_data(sample_case(i))
+            db.session.add(query)
+        db.session.commit()
+        result_id = Query.query.first().id
+
+    client = app.test_client()
+    payload = sample_case(1)
+    encoded = serialization.dumps(payload)
+    print(f"Payload: {len(encoded):,} bytes of JSON, {args.rows:,} stored results\n")
+
+    backends = ['json'] + (['orjson'] if serialization.orjson is not None else [])
+    results = {}
+    for backend in backends:
+        serialization.set_backend(backend)
+        results[backend] = {
+            'encode payload x100': timed(lambda: [serialization.dumps(payload) for _ in range(100)], args.repeat),
+            'decode payload x100': timed(lambda: [serialization.loads(encoded) for _ in range(100)], args.repeat),
+            'history API page (100)': timed(lambda: client.get('/api/search-history?per_page=100'), args.repeat),
+            f'export {args.rows} rows NDJSON': timed(lambda: client.get('/api/search-history/export').get_data(), 3),
+            'render result page': timed(lambda: client.get(f'/result/{result_id}'), args.repeat),
+        }
+
+    print(f"{'operation':<26}" + ''.join(f"{backend + ' (ms)':>14}" for backend in backends))
+    for name in results['json']:
+        print(f"{name:<26}" + ''.join(f"{results[backend][name]:>14.2f}" for backend in backends))
+
+    with app.app_context():
+        eager = timed(lambda: (Query.query.options(undefer(Query.response_data))
+                               .order_by(Query.id.desc()).limit(100).all(), db.session.expunge_all()),
+                      args.repeat)
+        lazy = timed(lambda: (Query.query.order_by(Query.id.desc()).limit(100).all(),
+                              db.session.expunge_all()), args.repeat)
+    print(f"\nList 100 queries: response_data loaded {eager:.2f}ms, deferred {lazy:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SQLite write contention across worker processes, per PRAGMA profile
+
+Each writer process mimics fetch_case (insert a pending Query and commit,
+then update it with the result and commit again) while reader processes
+load history pages, all against one shared database file, like four
+gunicorn workers on the default sqlite:///court_data.db.
+
+Usage:
+    python benchmarks/bench_sqlite_contention.py --writers 4 --readers 2 --seconds 10
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+PAYLOAD = {'case_id': 'WP(C)-623/2024', 'petitioners': ['A'] * 20, 'orders': [{'title': 'x' * 200}] * 10}
+
+
+def make_app(db_path, profile):
+    from flask import Flask
+    from models.database import init_db, SQLITE_PRAGMA_PROFILES
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    pragmas = dict(SQLITE_PRAGMA_PROFILES[profile])
+    # Without a busy timeout pysqlite waits 5s by default; give both
+    # profiles the same budget so only the journal/sync settings differ
+    pragmas.setdefault('busy_timeout', 5000)
+    app.config['SQLITE_PRAGMAS'] = pragmas
+    init_db(app)
+    return app
+
+
+def writer(db_path, profile, seconds, results):
+    from models.database import db, Query
+    app = make_app(db_path, profile)
+    done = errors = 0
+    latencies = []
+    deadline = time.time() + seconds
+    with app.app_context():
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                query = Query(case_type='WP(C)', case_number='623', filing_year=2024, status='pending')
+                db.session.add(query)
+                db.session.commit()
+                query.status = 'success'
+                query.set_response_data(PAYLOAD)
+                db.session.commit()
+                done += 1
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                db.session.rollback()
+                errors += 1
+    results.put(('writer', done, errors, latencies))
+
+
+def reader(db_path, profile, seconds, results):
+    from models.database import db, Query
+    app = make_app(db_path, profile)
+    done = errors = 0
+    latencies = []
+    deadline = time.time() + seconds
+    with app.app_context():
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                Query.query.order_by(Query.query_timestamp.desc()).limit(20).all()
+                db.session.commit()
+                done += 1
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                db.session.rollback()
+                errors += 1
+    results.put(('reader', done, errors, latencies))
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+def run(profile, writers, readers, seconds):
+    db_path = os.path.join(tempfile.mkdtemp(prefix='cdf-contention-'), 'court_data.db')
+    make_app(db_path, profile)  # create schema up front
+
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=writer, args=(db_path, profile, seconds, results))
+             for _ in range(writers)]
+    procs += [multiprocessing.Process(target=reader, args=(db_path, profile, seconds, results))
+              for _ in range(readers)]
+    for proc in procs:
+        proc.start()
+    collected = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    summary = {}
+    for role in ('writer', 'reader'):
+        rows = [row for row in collected if row[0] == role]
+        latencies = [value for row in rows for value in row[3]]
+        summary[role] = {
+            'ops': sum(row[1] for row in rows) / seconds,
+            'errors': sum(row[2] for row in rows),
+            'p50': percentile(latencies, 0.50),
+            'p99': percentile(latencies, 0.99),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writer + {args.readers} reader processes, {args.seconds:.0f}s per profile\n")
+    print(f"{'profile':<8} {'role':<7} {'ops/s':>8} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for profile in ('legacy', 'wal'):
+        summary = run(profile, args.writers, args.readers, args.seconds)
+        for role, stats in summary.items():
+            print(f"{profile:<8} {role:<7} {stats['ops']:>8.0f} {stats['errors']:>7} "
+                  f"{stats['p50']:>8.2f} {stats['p99']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
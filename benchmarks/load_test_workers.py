@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Load test: concurrent in-flight case searches per gunicorn worker
+
+Starts a fake court portal that answers every request after a fixed delay,
+runs the app under a single gunicorn worker pointed at it, fires a burst of
+concurrent searches and reports how many reached the portal at once.
+
+Usage:
+    python benchmarks/load_test_workers.py                  # sync vs gevent
+    python benchmarks/load_test_workers.py --worker-class gevent --requests 200
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEARCH_PAGE = b"<html><body><form action='case_history.php'></form></body></html>"
+RESULT_PAGE = (b"<html><body><b>WP(C)-623/2024</b>"
+               b"Date of Filing : 01/02/2024<br>Status : PENDING<br></body></html>")
+
+
+class FakePortal(ThreadingHTTPServer):
+    """Threaded portal stub that tracks peak concurrent requests"""
+
+    daemon_threads = True
+
+    def __init__(self, address, delay):
+        super().__init__(address, FakePortalHandler)
+        self.delay = delay
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.in_flight = 0
+            self.peak_in_flight = 0
+
+
+class FakePortalHandler(BaseHTTPRequestHandler):
+    def _respond(self, body):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def do_GET(self):
+        self._respond(SEARCH_PAGE)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._respond(RESULT_PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return True
+        except requests.RequestException:
+            time.sleep(0.2)
+    return False
+
+
+def run_mode(worker_class, portal, portal_url, num_requests, connections):
+    """Run one burst against a single-worker gunicorn and return its stats"""
+    port = free_port()
+    db_dir = tempfile.mkdtemp(prefix='cdf-load-')
+    env = dict(os.environ,
+               WORKER_CLASS=worker_class,
+               WORKER_CONNECTIONS=str(connections),
+               GUNICORN_WORKERS='1',
+               GUNICORN_BIND=f'127.0.0.1:{port}',
+               GUNICORN_TIMEOUT='600',
+               PORTAL_BASE_URL=portal_url,
+               DATABASE_URL=f"sqlite:///{os.path.join(db_dir, 'load.db')}",
+               UPLOAD_FOLDER=os.path.join(db_dir, 'downloads'))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:create_app()'],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    try:
+        base = f'http://127.0.0.1:{port}'
+        if not wait_for_server(base + '/api/case-types'):
+            raise RuntimeError(f'gunicorn ({worker_class}) did not start')
+        portal.reset()
+
+        def search(i):
+            return requests.post(base + '/fetch-case', data={
+                'case_type': 'WP(C)',
+                'case_number': str(600 + i),
+                'filing_year': '2024',
+            }, allow_redirects=False, timeout=600).status_code
+
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=num_requests) as pool:
+            statuses = list(pool.map(search, range(num_requests)))
+        elapsed = time.time() - started
+
+        return {
+            'worker_class': worker_class,
+            'requests': num_requests,
+            'ok': sum(1 for status in statuses if status == 200),
+            'elapsed': elapsed,
+            'peak_in_flight': portal.peak_in_flight,
+            'throughput': num_requests / elapsed,
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--worker-class', choices=['sync', 'gevent'], action='append',
+                        help='worker class to test (repeatable, default: both)')
+    parser.add_argument('--requests', type=int, default=50, help='concurrent searches per run')
+    parser.add_argument('--delay', type=float, default=1.0, help='portal latency per request (s)')
+    parser.add_argument('--connections', type=int, default=100, help='gevent worker_connections')
+    args = parser.parse_args()
+
+    portal = FakePortal(('127.0.0.1', free_port()), args.delay)
+    threading.Thread(target=portal.serve_forever, daemon=True).start()
+    portal_url = f'http://127.0.0.1:{portal.server_address[1]}'
+
+    print(f"Fake portal at {portal_url} ({args.delay:.1f}s per request, 2 requests per search)")
+    print(f"{'worker':<8} {'requests':>8} {'ok':>5} {'elapsed':>9} {'req/s':>7} {'peak in-flight':>15}")
+    for worker_class in args.worker_class or ['sync', 'gevent']:
+        result = run_mode(worker_class, portal, portal_url, args.requests, args.connections)
+        print(f"{result['worker_class']:<8} {result['requests']:>8} {result['ok']:>5} "
+              f"{result['elapsed']:>8.1f}s {result['throughput']:>7.1f} {result['peak_in_flight']:>15}")
+
+    portal.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Build the full-text index of stored PDFs for Court Data Fetcher
+
+Extracts the text of every PDF added to the store since the last run into
+FULLTEXT_INDEX_PATH, using FULLTEXT_WORKERS processes. Runs are incremental
+and resumable; safe to run from cron while the app is serving (concurrent
+runs skip).
+
+Usage:
+    python build_fulltext_index.py --workers 4
+"""
+
+import argparse
+import os
+import sys
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, help='override FULLTEXT_WORKERS')
+    parser.add_argument('--max-batches', type=int, help='stop after this many batches')
+    args = parser.parse_args()
+
+    os.environ.setdefault('WRITE_BEHIND_ENABLED', 'false')
+    os.environ['FULLTEXT_ENABLED'] = 'false'  # run once here, not on the timer
+    from app import create_app
+
+    app = create_app()
+    indexer = app.extensions['fulltext']
+    if args.workers is not None:
+        indexer.workers = args.workers
+
+    result = indexer.run_once(max_batches=args.max_batches)
+    if result is None:
+        print("ℹ️  Another indexing run is in progress, skipping")
+        sys.exit(0)
+    stats = indexer.index.stats()
+    print(f"🔎 Indexed {result['indexed']:,} PDFs ({result['failed']:,} failed); "
+          f"{stats['indexed']:,} PDFs in {app.config['FULLTEXT_INDEX_PATH']}")
+
+if __name__ == '__main__':
+    main()
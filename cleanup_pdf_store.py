@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Evict PDFs from the Court Data Fetcher PDF store
+
+Deletes stored PDFs least recently used first, using the pdf_blobs index
+rather than scanning the download folder: those unused for
+PDF_STORE_MAX_AGE_DAYS, then more until the store fits in
+PDF_STORE_MAX_BYTES. Download rows of evicted PDFs are marked 'evicted'.
+Safe to run from cron while the app is serving; concurrent runs skip.
+
+Usage:
+    python cleanup_pdf_store.py --max-bytes 21474836480 --max-age-days 180
+"""
+
+import argparse
+import os
+import sys
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-bytes', type=int, help='override PDF_STORE_MAX_BYTES')
+    parser.add_argument('--max-age-days', type=int, help='override PDF_STORE_MAX_AGE_DAYS')
+    parser.add_argument('--max-batches', type=int, default=1000,
+                        help='stop after this many batches (default 1000)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('WRITE_BEHIND_ENABLED', 'false')
+    os.environ['PDF_CLEANUP_ENABLED'] = 'false'  # run once here, not on the timer
+    from app import create_app
+
+    app = create_app()
+    cleanup = app.extensions['pdf_cleanup']
+    if args.max_bytes is not None:
+        cleanup.max_bytes = args.max_bytes
+    if args.max_age_days is not None:
+        cleanup.max_age_days = args.max_age_days
+    cleanup.max_batches = args.max_batches
+
+    result = cleanup.run_once()
+    if result is None:
+        print("ℹ️  Another cleanup run is in progress, skipping")
+        sys.exit(0)
+    with app.app_context():
+        size = cleanup.store_size()
+    print(f"🧹 Evicted {result['files_evicted']:,} PDFs ({result['bytes_freed']:,} bytes), "
+          f"removed {result['partials_removed']:,} partial files; store now {size:,} bytes")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+"""
+Gunicorn configuration for Court Data Fetcher
+
+Almost all request time is spent waiting on the court portal, so the
+cooperative gevent worker lets one process keep many searches in flight.
+Set WORKER_CLASS=sync to fall back to one blocked request per worker.
+"""
+
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+worker_class = os.environ.get('WORKER_CLASS', 'gevent')
+# Maximum simultaneous requests per gevent worker (ignored by sync workers)
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Never preload: the gevent worker must monkey-patch sockets, threading and
+# subprocess before the app (requests, SQLAlchemy, pytesseract) is imported.
+preload_app = False
+
+# Make create_app see the same worker model gunicorn is running
+os.environ.setdefault('WORKER_CLASS', worker_class)
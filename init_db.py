@@ -38,7 +38,7 @@ def init_database():
             try:
                 # Try to query the tables
                 query_count = Query.query.count()
-                download_count = Download.query.count()
+                download_count = db.session.query(Download).count()
                 
                 print(f"📊 Queries table: {query_count} records")
                 print(f"📊 Downloads table: {download_count} records")
@@ -150,6 +150,15 @@ def main():
         else:
             print("❌ Failed to create sample data!")
     
+    # Link searches stored before the normalized case tables existed
+    if '--backfill-cases' in sys.argv:
+        print("\n🔗 Backfilling case tables from stored searches...")
+        app = create_app()
+        init_db(app)
+        with app.app_context():
+            from models.database import backfill_cases
+            print(f"✅ Linked {backfill_cases()} searches to cases")
+    
     print("\n🎉 Database setup complete!")
     print("\nNext steps:")
     print("1. Run 'python app.py' to start the application")
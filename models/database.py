@@ -1,21 +1,102 @@
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-import json
+from sqlalchemy import event, inspect, text, or_
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import deferred, undefer
+from contextlib import contextmanager
+from datetime import datetime, date
+from typing import Any, Dict, List, NamedTuple, Optional
+from dateutil import parser as date_parser
+from utils.serialization import dumps, loads
+from utils import compression
+from utils.change_detection import DIFF_FIELDS, content_hash, diff_case
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: schema upgrades are not serialized across processes
+    fcntl = None
 
 db = SQLAlchemy()
 
+# PRAGMA profiles applied to every new SQLite connection. 'wal' lets readers
+# proceed while one writer commits and makes commits cheap (synchronous=NORMAL
+# is durable in WAL mode except on power loss); 'legacy' keeps SQLite's
+# rollback-journal defaults.
+SQLITE_PRAGMA_PROFILES = {
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        # Wait for a competing writer instead of failing with "database is
+        # locked". The wait blocks the whole process (including every
+        # greenlet of a gevent worker), so keep it short.
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # negative = KiB, i.e. 64MB per connection
+    },
+    'legacy': {},
+}
+
+def load_sqlite_pragmas(environ=os.environ):
+    """
+    Build the PRAGMA settings from SQLITE_PRAGMA_PROFILE (default 'wal')
+    plus per-setting overrides such as SQLITE_BUSY_TIMEOUT=10000
+    """
+    profile = environ.get('SQLITE_PRAGMA_PROFILE', 'wal').lower()
+    if profile not in SQLITE_PRAGMA_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PRAGMA_PROFILE '{profile}'")
+    
+    pragmas = dict(SQLITE_PRAGMA_PROFILES[profile])
+    for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size'):
+        value = environ.get(f'SQLITE_{name.upper()}')
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run the given PRAGMAs on every connection the engine opens"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+    
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
 class Query(db.Model):
     """Model for storing case search queries and responses"""
     __tablename__ = 'queries'
+    __table_args__ = (
+        # History pages and the home page sort by timestamp on every view
+        db.Index('ix_queries_query_timestamp', 'query_timestamp'),
+        # Repeat-search and cache lookups by case identity
+        db.Index('ix_queries_case', 'case_type', 'case_number', 'filing_year'),
+        # Payload-less repeat searches borrow the result of an earlier one
+        db.Index('ix_queries_case_hash', 'case_id', 'content_hash'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     case_type = db.Column(db.String(100), nullable=False)
     case_number = db.Column(db.String(100), nullable=False)
     filing_year = db.Column(db.Integer, nullable=False)
     query_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    response_data = db.Column(db.Text)  # JSON string
+    # JSON string, or a compressed copy in response_blob when RESPONSE_COMPRESSION
+    # is on; both deferred so listings never load them, decoded by case_data
+    response_data = deferred(db.Column(db.Text))
+    response_blob = deferred(db.Column(db.LargeBinary))
     status = db.Column(db.String(50), default='pending')  # pending, success, error
     error_message = db.Column(db.Text)
+    case_id = db.Column(db.Integer, db.ForeignKey('cases.id'), index=True)
+    # see utils.change_detection.content_hash; a search whose result matched
+    # the stored case keeps no payload of its own, only payload_query_id:
+    # the query holding the identical result (see store_result)
+    content_hash = db.Column(db.String(64))
+    payload_query_id = db.Column(db.Integer, db.ForeignKey('queries.id'), index=True)
     
     # Relationship with downloads
     downloads = db.relationship('Download', backref='query', lazy=True, cascade='all, delete-orphan')
@@ -31,27 +112,240 @@ class Query(db.Model):
             'case_number': self.case_number,
             'filing_year': self.filing_year,
             'query_timestamp': self.query_timestamp.isoformat() if self.query_timestamp else None,
-            'response_data': json.loads(self.response_data) if self.response_data else None,
+            'response_data': self.case_data,
             'status': self.status,
             'error_message': self.error_message
         }
     
+    def to_summary_dict(self):
+        """Convert query to the lightweight dictionary used by history listings"""
+        return {
+            'id': self.id,
+            'case_type': self.case_type,
+            'case_number': self.case_number,
+            'filing_year': self.filing_year,
+            'status': self.status,
+            'timestamp': self.query_timestamp.isoformat() if self.query_timestamp else None
+        }
+    
+    @property
+    def case_data(self):
+        """Decoded response data, parsed on first access and cached on the instance"""
+        raw = self.response_blob or self.response_data
+        if not raw:
+            return None
+        cached = getattr(self, '_case_data_cache', None)
+        if cached is None or cached[0] is not raw:
+            text_data = decompress_response(raw) if compression.is_compressed(raw) else raw
+            cached = (raw, loads(text_data))
+            self._case_data_cache = cached
+        return cached[1]
+    
+    @property
+    def has_response_data(self) -> bool:
+        return bool(self.response_blob or self.response_data)
+    
     def set_response_data(self, data):
-        """Set response data as JSON string"""
-        self.response_data = json.dumps(data, default=str)
+        """Set response data as JSON, compressed when RESPONSE_COMPRESSION is enabled"""
+        text_data = dumps(data)
+        blob = compress_response(text_data)
+        if blob is not None:
+            self.response_data, self.response_blob = None, blob
+        else:
+            self.response_data, self.response_blob = text_data, None
+
+class Case(db.Model):
+    """Model for a court case, deduplicated across searches by CNR number or case identity"""
+    __tablename__ = 'cases'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    case_key = db.Column(db.String(200), nullable=False, unique=True)  # CNR number, else TYPE/NUMBER/YEAR
+    cnr_number = db.Column(db.String(50), index=True)
+    case_type = db.Column(db.String(100))
+    case_number = db.Column(db.String(100))
+    filing_year = db.Column(db.Integer)
+    filing_date = db.Column(db.String(50))  # as shown on the portal
+    filed_on = db.Column(db.Date)
+    next_hearing_date = db.Column(db.String(50))  # as shown on the portal
+    next_hearing_on = db.Column(db.Date, index=True)
+    case_status = db.Column(db.String(100), index=True)
+    court = db.Column(db.String(100))
+    bench = db.Column(db.String(200))
+    judge = db.Column(db.String(200))
+    filing_advocate = db.Column(db.String(200))
+    njdg_link = db.Column(db.String(500))
+    content_hash = db.Column(db.String(64))  # of the last stored result; unchanged results are not rewritten
+    first_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    parties = db.relationship('Party', backref='case', lazy=True, cascade='all, delete-orphan',
+                              order_by='Party.position')
+    orders = db.relationship('CaseOrder', backref='case', lazy=True, cascade='all, delete-orphan',
+                             order_by='CaseOrder.position')
+    hearings = db.relationship('Hearing', backref='case', lazy=True, cascade='all, delete-orphan',
+                               order_by='Hearing.hearing_on')
+    queries = db.relationship('Query', backref='case', lazy='dynamic')
+    
+    def __repr__(self):
+        return f'<Case {self.case_key}>'
+    
+    def to_dict(self):
+        """Convert case to dictionary"""
+        return {
+            'id': self.id,
+            'case_key': self.case_key,
+            'cnr_number': self.cnr_number,
+            'case_type': self.case_type,
+            'case_number': self.case_number,
+            'filing_year': self.filing_year,
+            'filing_date': self.filing_date,
+            'next_hearing_date': self.next_hearing_date,
+            'case_status': self.case_status,
+            'court': self.court,
+            'bench': self.bench,
+            'judge': self.judge,
+            'petitioners': [party.name for party in self.parties if party.role == 'petitioner'],
+            'respondents': [party.name for party in self.parties if party.role == 'respondent'],
+            'orders': [order.to_dict() for order in self.orders],
+            'last_updated_at': self.last_updated_at.isoformat() if self.last_updated_at else None
+        }
+
+class Party(db.Model):
+    """Model for a petitioner or respondent of a case"""
+    __tablename__ = 'parties'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    case_id = db.Column(db.Integer, db.ForeignKey('cases.id'), nullable=False, index=True)
+    role = db.Column(db.String(20), nullable=False)  # petitioner, respondent
+    name = db.Column(db.String(500), nullable=False, index=True)
+    position = db.Column(db.Integer, default=0)
+
+class CaseOrder(db.Model):
+    """Model for an order or judgment listed for a case"""
+    __tablename__ = 'orders'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    case_id = db.Column(db.Integer, db.ForeignKey('cases.id'), nullable=False, index=True)
+    title = db.Column(db.String(500))
+    order_type = db.Column(db.String(50))  # Order, Judgment
+    order_date = db.Column(db.String(50))  # as shown on the portal
+    ordered_on = db.Column(db.Date, index=True)
+    pdf_url = db.Column(db.String(500), index=True)
+    description = db.Column(db.Text)
+    position = db.Column(db.Integer, default=0)
+    
+    def to_dict(self):
+        """Convert order to the dictionary shape produced by the scraper"""
+        return {
+            'title': self.title,
+            'type': self.order_type,
+            'date': self.order_date,
+            'pdf_url': self.pdf_url,
+            'description': self.description
+        }
+
+class Hearing(db.Model):
+    """Model for a hearing date seen for a case; accumulates across searches"""
+    __tablename__ = 'hearings'
+    __table_args__ = (
+        db.UniqueConstraint('case_id', 'hearing_date', name='uq_hearings_case_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    case_id = db.Column(db.Integer, db.ForeignKey('cases.id'), nullable=False, index=True)
+    hearing_date = db.Column(db.String(50), nullable=False)  # as shown on the portal
+    hearing_on = db.Column(db.Date, index=True)
+    first_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class WatchedCase(db.Model):
+    """Model for a case on the watchlist, refreshed in the background"""
+    __tablename__ = 'watched_cases'
+    __table_args__ = (
+        db.UniqueConstraint('case_type', 'case_number', 'filing_year', name='uq_watched_case'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    case_type = db.Column(db.String(100), nullable=False)
+    case_number = db.Column(db.String(100), nullable=False)
+    filing_year = db.Column(db.Integer, nullable=False)
+    label = db.Column(db.String(200))
+    case_id = db.Column(db.Integer, db.ForeignKey('cases.id'), index=True)
+    active = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    next_refresh_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    last_refreshed_at = db.Column(db.DateTime)
+    last_status = db.Column(db.String(20))  # success, error
+    last_error = db.Column(db.Text)
+    consecutive_failures = db.Column(db.Integer, default=0, nullable=False)
+    
+    case = db.relationship('Case')
+    
+    def to_dict(self):
+        """Convert watchlist entry to dictionary"""
+        return {
+            'id': self.id,
+            'case_type': self.case_type,
+            'case_number': self.case_number,
+            'filing_year': self.filing_year,
+            'label': self.label,
+            'active': self.active,
+            'case_status': self.case.case_status if self.case else None,
+            'next_hearing_date': self.case.next_hearing_date if self.case else None,
+            'next_refresh_at': self.next_refresh_at.isoformat() if self.next_refresh_at else None,
+            'last_refreshed_at': self.last_refreshed_at.isoformat() if self.last_refreshed_at else None,
+            'last_status': self.last_status,
+            'last_error': self.last_error
+        }
+
+class CaseChange(db.Model):
+    """Model for a change to a case spotted by a search or a watchlist refresh"""
+    __tablename__ = 'case_changes'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    case_id = db.Column(db.Integer, db.ForeignKey('cases.id'), nullable=False, index=True)
+    watch_id = db.Column(db.Integer, db.ForeignKey('watched_cases.id'), index=True)  # refresh that found it
+    source = db.Column(db.String(20))  # search, watchlist
+    field = db.Column(db.String(50), nullable=False)  # a Case column, or 'order' for a new order
+    old_value = db.Column(db.Text)
+    new_value = db.Column(db.Text)
+    detected_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        """Convert change to dictionary"""
+        return {
+            'id': self.id,
+            'case_id': self.case_id,
+            'watch_id': self.watch_id,
+            'source': self.source,
+            'field': self.field,
+            'old_value': self.old_value,
+            'new_value': self.new_value,
+            'detected_at': self.detected_at.isoformat() if self.detected_at else None
+        }
+
+class CompressionDictionary(db.Model):
+    """Model for shared dictionaries trained on stored responses; immutable once written"""
+    __tablename__ = 'compression_dictionaries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    algorithm = db.Column(db.String(10), nullable=False)  # zstd, zlib
+    data = db.Column(db.LargeBinary, nullable=False)
+    sample_count = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Download(db.Model):
     """Model for storing downloaded PDF files"""
     __tablename__ = 'downloads'
     
     id = db.Column(db.Integer, primary_key=True)
-    query_id = db.Column(db.Integer, db.ForeignKey('queries.id'), nullable=False)
-    pdf_url = db.Column(db.String(500), nullable=False)
+    query_id = db.Column(db.Integer, db.ForeignKey('queries.id'), nullable=False, index=True)
+    pdf_url = db.Column(db.String(500), nullable=False, index=True)
     local_path = db.Column(db.String(500), nullable=False)
     filename = db.Column(db.String(200), nullable=False)
+    digest = db.Column(db.String(64), index=True)  # SHA-256 of the stored blob
     download_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     file_size = db.Column(db.Integer)  # in bytes
-    status = db.Column(db.String(50), default='pending')  # pending, success, error
+    status = db.Column(db.String(50), default='pending')  # pending, success, error, evicted
     
     def __repr__(self):
         return f'<Download {self.filename}>'
@@ -66,13 +360,398 @@ class Download(db.Model):
             'filename': self.filename,
             'download_timestamp': self.download_timestamp.isoformat() if self.download_timestamp else None,
             'file_size': self.file_size,
+            'digest': self.digest,
             'status': self.status
         }
 
+class PdfBlob(db.Model):
+    """Model for a PDF stored once in the content-addressed store"""
+    __tablename__ = 'pdf_blobs'
+    
+    digest = db.Column(db.String(64), primary_key=True)  # SHA-256, also the file name
+    file_size = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    last_accessed_at = db.Column(db.DateTime, index=True)  # LRU order for PdfStoreCleanup
+    
+    sources = db.relationship('PdfSource', backref='blob', lazy=True)
+
+class PdfSource(db.Model):
+    """Model for the URL -> digest index of the PDF store"""
+    __tablename__ = 'pdf_sources'
+    
+    url = db.Column(db.String(500), primary_key=True)
+    digest = db.Column(db.String(64), db.ForeignKey('pdf_blobs.digest'), nullable=False, index=True)
+    filename = db.Column(db.String(200), nullable=False)
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+def record_pdf_source(session, url: str, digest: str, file_size: int, filename: str):
+    """Index a downloaded URL against its blob, creating the blob row if new"""
+    now = datetime.utcnow()
+    blob = session.get(PdfBlob, digest)
+    if blob is None:
+        session.add(PdfBlob(digest=digest, file_size=file_size, created_at=now, last_accessed_at=now))
+    else:
+        blob.last_accessed_at = now
+    session.merge(PdfSource(url=url, digest=digest, filename=filename, fetched_at=now))
+
+def touch_pdf_blob(session, digest: str, when: Optional[datetime] = None):
+    """Move a blob to the recently used end of the eviction order"""
+    session.query(PdfBlob).filter(PdfBlob.digest == digest).update(
+        {PdfBlob.last_accessed_at: when or datetime.utcnow()}, synchronize_session=False)
+
+# Dictionaries never change once stored, so their bytes are cached for good;
+# which one is active for new writes is re-checked every few minutes
+_dictionary_cache: Dict[int, bytes] = {}
+_active_dictionary_cache: Dict[str, Any] = {}
+ACTIVE_DICTIONARY_TTL = 300
+
+def get_compression_dictionary(dict_id: int) -> Optional[bytes]:
+    """Return the bytes of a stored compression dictionary"""
+    if dict_id not in _dictionary_cache:
+        dictionary = db.session.get(CompressionDictionary, dict_id)
+        if dictionary is None:
+            return None
+        _dictionary_cache[dict_id] = dictionary.data
+    return _dictionary_cache[dict_id]
+
+def get_active_dictionary(algorithm: str):
+    """
+    Returns: (dictionary id, bytes) of the newest dictionary for algorithm,
+    or (0, None) when none has been trained
+    """
+    cached = _active_dictionary_cache.get(algorithm)
+    if cached and time.monotonic() - cached[0] < ACTIVE_DICTIONARY_TTL:
+        return cached[1]
+    
+    dictionary = (CompressionDictionary.query.filter_by(algorithm=algorithm)
+                  .order_by(CompressionDictionary.id.desc()).first())
+    active = (dictionary.id, dictionary.data) if dictionary else (0, None)
+    if dictionary:
+        _dictionary_cache[dictionary.id] = dictionary.data
+    _active_dictionary_cache[algorithm] = (time.monotonic(), active)
+    return active
+
+def compress_response(text_data: str) -> Optional[bytes]:
+    """
+    Compress a response payload per RESPONSE_COMPRESSION. Returns None when
+    compression is off, the payload is small, or compressing does not help.
+    """
+    if not has_app_context():
+        return None
+    algorithm = compression.resolve_algorithm(current_app.config.get('RESPONSE_COMPRESSION'))
+    if algorithm is None or len(text_data) < current_app.config.get('RESPONSE_COMPRESSION_MIN_BYTES', 256):
+        return None
+    
+    dict_id, dictionary = get_active_dictionary(algorithm)
+    blob = compression.compress(text_data, algorithm, current_app.config.get('RESPONSE_COMPRESSION_LEVEL', 6),
+                                dictionary=dictionary, dict_id=dict_id)
+    return blob if len(blob) < len(text_data.encode('utf-8')) else None
+
+def decompress_response(blob: bytes) -> str:
+    """Decompress a response_blob, loading the dictionary it was written with"""
+    _, dict_id = compression.read_header(blob)
+    dictionary = get_compression_dictionary(dict_id) if dict_id else None
+    return compression.decompress(blob, dictionary)
+
+def train_compression_dictionary(algorithm: str, sample_size: int = 2000,
+                                 dictionary_size: int = 64 * 1024) -> Optional[CompressionDictionary]:
+    """
+    Train and store a shared dictionary from a spread of stored responses.
+    New writes and recompress_responses() use it from then on.
+    """
+    max_id = db.session.query(db.func.max(Query.id)).scalar() or 0
+    stride = max(1, max_id // sample_size)
+    samples = []
+    rows = (Query.query.options(undefer(Query.response_data), undefer(Query.response_blob))
+            .filter(Query.id % stride == 0, Query.status == 'success')
+            .limit(sample_size))
+    for query in rows:
+        raw = query.response_blob or query.response_data
+        if raw:
+            text_data = decompress_response(raw) if compression.is_compressed(raw) else raw
+            samples.append(text_data.encode('utf-8'))
+    
+    data = compression.train_dictionary(samples, algorithm, dictionary_size)
+    if data is None:
+        return None
+    dictionary = CompressionDictionary(algorithm=algorithm, data=data, sample_count=len(samples))
+    db.session.add(dictionary)
+    db.session.commit()
+    _active_dictionary_cache.pop(algorithm, None)
+    return dictionary
+
+def recompress_responses(batch_size: int = 500, recompress_all: bool = False) -> Dict[str, int]:
+    """
+    Rewrite stored responses with the current RESPONSE_COMPRESSION settings,
+    one committed batch at a time so the database is never locked for long.
+    By default only uncompressed rows are touched; recompress_all also
+    rewrites blobs made with older dictionaries.
+    Returns: counters of rows scanned and rewritten and bytes before/after
+    """
+    stats = {'scanned': 0, 'rewritten': 0, 'bytes_before': 0, 'bytes_after': 0}
+    last_id = 0
+    while True:
+        criteria = [Query.id > last_id]
+        if recompress_all:
+            criteria.append(or_(Query.response_data.isnot(None), Query.response_blob.isnot(None)))
+        else:
+            criteria.append(Query.response_data.isnot(None))
+        queries = (Query.query.options(undefer(Query.response_data), undefer(Query.response_blob))
+                   .filter(*criteria).order_by(Query.id).limit(batch_size).all())
+        if not queries:
+            return stats
+        
+        for query in queries:
+            stats['scanned'] += 1
+            before = len(query.response_blob or b'') + len((query.response_data or '').encode('utf-8'))
+            data = query.case_data
+            query.set_response_data(data)
+            after = len(query.response_blob or b'') + len((query.response_data or '').encode('utf-8'))
+            stats['bytes_before'] += before
+            stats['bytes_after'] += after
+            if after != before:
+                stats['rewritten'] += 1
+        last_id = queries[-1].id
+        db.session.commit()
+        db.session.expunge_all()
+
+def parse_portal_date(value: Any) -> Optional[date]:
+    """Parse a portal date string (DD/MM/YYYY, DD-MM-YYYY or ISO) into a date"""
+    if not value:
+        return None
+    try:
+        return date_parser.parse(str(value), dayfirst=True).date()
+    except (ValueError, OverflowError):
+        return None
+
+def make_case_key(case_data: Dict[str, Any]) -> Optional[str]:
+    """Deduplication key for a scraped case: CNR number, else TYPE/NUMBER/YEAR"""
+    cnr_number = (case_data.get('cnr_number') or '').strip()
+    if cnr_number:
+        return cnr_number.upper()
+    parts = [str(case_data.get(field) or '').replace(' ', '').upper()
+             for field in ('case_type', 'case_number', 'filing_year')]
+    if not all(parts):
+        return None
+    return '/'.join(parts)
+
+class CaseUpdate(NamedTuple):
+    """Outcome of apply_case_data"""
+    case: Optional[Case]
+    content_hash: str
+    changed: bool  # False when the result matched the stored case and nothing was written
+    changes: List[CaseChange]
+
+def snapshot_case(case: Case) -> Dict[str, Any]:
+    """The fields of a stored case that new results are diffed against"""
+    snapshot = {field: getattr(case, field) for field in DIFF_FIELDS}
+    snapshot['orders'] = [order.to_dict() for order in case.orders]
+    return snapshot
+
+def apply_case_data(case_data: Dict[str, Any], source: str = 'search', watch_id: Optional[int] = None,
+                    record_changes: bool = True) -> CaseUpdate:
+    """
+    Store a scraped case unless it is unchanged. The result is hashed
+    (ignoring fields such as last_updated that differ on every scrape) and
+    compared with the hash kept on the Case; when they match nothing is
+    written. Otherwise the case is upserted and, if it was known before,
+    each changed field and new order is added as a CaseChange.
+    Adds to the current session without committing.
+    """
+    digest = content_hash(case_data)
+    case_key = make_case_key(case_data)
+    if case_key is None:
+        return CaseUpdate(None, digest, True, [])
+    
+    case = Case.query.filter_by(case_key=case_key).first()
+    if case is not None and case.content_hash == digest:
+        return CaseUpdate(case, digest, False, [])
+    
+    before = snapshot_case(case) if case is not None and record_changes else None
+    case = upsert_case(case_data)
+    
+    changes = []
+    if before is not None:
+        db.session.flush()
+        now = datetime.utcnow()
+        changes = [CaseChange(case_id=case.id, watch_id=watch_id, source=source, field=field,
+                              old_value=old_value, new_value=new_value, detected_at=now)
+                   for field, old_value, new_value in diff_case(before, case_data)]
+        db.session.add_all(changes)
+    return CaseUpdate(case, digest, True, changes)
+
+def store_result(query: Query, update: CaseUpdate, case_data: Dict[str, Any]):
+    """
+    Give a successful query its result. When it matched the stored case,
+    the query points at the newest earlier query holding the same result
+    instead of storing another copy; otherwise it stores the payload.
+    """
+    if not update.changed and update.case is not None and update.case.id is not None:
+        # query may not be in the session yet; nothing needs flushing for this lookup
+        with db.session.no_autoflush:
+            source = (db.session.query(Query.id, Query.payload_query_id)
+                      .filter(Query.case_id == update.case.id, Query.content_hash == update.content_hash,
+                              or_(Query.payload_query_id.isnot(None),
+                                  Query.response_data.isnot(None), Query.response_blob.isnot(None)))
+                      .order_by(Query.id.desc()).first())
+        if source is not None:
+            query.payload_query_id = source.payload_query_id or source.id
+            return
+    query.set_response_data(case_data)
+
+def stored_result(query: Query) -> Optional[Dict[str, Any]]:
+    """Case data of a successful query, its own or that of the query it points at"""
+    if query.has_response_data:
+        return query.case_data
+    if query.payload_query_id is None:
+        return None
+    source = (Query.query.options(undefer(Query.response_data), undefer(Query.response_blob))
+              .filter(Query.id == query.payload_query_id).first())
+    return source.case_data if source is not None else None
+
+def upsert_case(case_data: Dict[str, Any]) -> Optional[Case]:
+    """
+    Create or update the normalized Case (with parties, orders and hearings)
+    for the dictionary returned by extract_case_details_from_html.
+    Adds to the current session without committing.
+    """
+    case_key = make_case_key(case_data)
+    if case_key is None:
+        return None
+    
+    case = Case.query.filter_by(case_key=case_key).first()
+    if case is None:
+        case = Case(case_key=case_key)
+        db.session.add(case)
+    
+    try:
+        filing_year = int(case_data.get('filing_year'))
+    except (TypeError, ValueError):
+        filing_year = None
+    
+    case.cnr_number = case_data.get('cnr_number') or case.cnr_number
+    case.case_type = case_data.get('case_type') or case.case_type
+    case.case_number = case_data.get('case_number') or case.case_number
+    case.filing_year = filing_year or case.filing_year
+    case.filing_date = case_data.get('filing_date') or None
+    case.filed_on = parse_portal_date(case.filing_date)
+    case.next_hearing_date = case_data.get('next_hearing_date') or None
+    case.next_hearing_on = parse_portal_date(case.next_hearing_date)
+    case.case_status = case_data.get('case_status') or None
+    case.court = case_data.get('court') or None
+    case.bench = case_data.get('bench') or None
+    case.judge = case_data.get('judge') or None
+    case.filing_advocate = case_data.get('filing_advocate') or None
+    case.njdg_link = case_data.get('njdg_link') or None
+    case.content_hash = content_hash(case_data)
+    case.last_updated_at = datetime.utcnow()
+    
+    # Parties and orders mirror the latest result; hearings accumulate
+    parties = [('petitioner', name) for name in case_data.get('petitioners') or []]
+    parties += [('respondent', name) for name in case_data.get('respondents') or []]
+    case.parties = [Party(role=role, name=str(name), position=position)
+                    for position, (role, name) in enumerate(parties)]
+    case.orders = [CaseOrder(title=order.get('title'),
+                             order_type=order.get('type'),
+                             order_date=order.get('date'),
+                             ordered_on=parse_portal_date(order.get('date')),
+                             pdf_url=order.get('pdf_url'),
+                             description=order.get('description'),
+                             position=position)
+                   for position, order in enumerate(case_data.get('orders') or [])]
+    
+    if case.next_hearing_date and case.next_hearing_date not in {h.hearing_date for h in case.hearings}:
+        case.hearings.append(Hearing(hearing_date=case.next_hearing_date,
+                                     hearing_on=case.next_hearing_on))
+    return case
+
+def backfill_cases(batch_size: int = 500) -> int:
+    """
+    Populate the normalized case tables from successful queries stored
+    before they existed. Resumable: only queries without a case are read.
+    Returns: number of queries linked
+    """
+    linked = 0
+    last_id = 0
+    while True:
+        queries = (Query.query.options(undefer(Query.response_data), undefer(Query.response_blob))
+                   .filter(Query.id > last_id, Query.case_id.is_(None), Query.status == 'success',
+                           or_(Query.response_data.isnot(None), Query.response_blob.isnot(None)))
+                   .order_by(Query.id).limit(batch_size).all())
+        if not queries:
+            return linked
+        for query in queries:
+            try:
+                case = upsert_case(query.case_data)
+            except (ValueError, TypeError, AttributeError):
+                case = None
+            if case is not None:
+                query.case = case
+                linked += 1
+            db.session.flush()
+        last_id = queries[-1].id
+        db.session.commit()
+
+def _already_applied(error: Exception) -> bool:
+    """A schema change another process made first"""
+    message = str(error).lower()
+    return 'duplicate column' in message or 'already exists' in message
+
+def upgrade_schema():
+    """
+    Bring an existing database up to date with the models.
+    create_all() skips tables that already exist, so columns and indexes
+    added to a model later are missing from older court_data.db files;
+    add them here. Changes another process made in the meantime are skipped.
+    """
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        # Columns added to a model later (all nullable) are appended in place
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                try:
+                    with db.engine.begin() as connection:
+                        connection.execute(text(
+                            f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                except (OperationalError, ProgrammingError) as e:
+                    if not _already_applied(e):
+                        raise
+        
+        for index in table.indexes:
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+            except (OperationalError, ProgrammingError) as e:
+                if not _already_applied(e):
+                    raise
+
+@contextmanager
+def schema_lock(app):
+    """
+    Serialize schema creation and upgrades across the processes of one host
+    (every gunicorn worker runs init_db at boot); the others wait, then find
+    nothing left to do
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(app.instance_path, exist_ok=True)
+    with open(os.path.join(app.instance_path, '.schema.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
 def init_db(app):
     """Initialize database with Flask app"""
     db.init_app(app)
     
     with app.app_context():
-        db.create_all()
-        print("Database tables created successfully!") 
\ No newline at end of file
+        pragmas = app.config.get('SQLITE_PRAGMAS')
+        if pragmas is None:
+            pragmas = load_sqlite_pragmas()
+        apply_sqlite_pragmas(db.engine, pragmas)
+        
+        with schema_lock(app):
+            db.create_all()
+            upgrade_schema()
+        print("Database tables created successfully!")
@@ -0,0 +1,271 @@
+import html
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, or_
+
+from models.database import PdfBlob
+from utils.pdf_metadata import extract_all_text
+from utils.sqlite_pool import SQLiteConnectionPool
+
+try:
+    import fcntl
+except ImportError:  # Windows: runs are not serialized across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS pdf_text USING fts5("
+    "body, digest UNINDEXED, page UNINDEXED, tokenize='porter unicode61')",
+    "CREATE TABLE IF NOT EXISTS indexed_blobs ("
+    "digest TEXT PRIMARY KEY, pages INTEGER, status TEXT NOT NULL, error TEXT, indexed_at TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS index_state (key TEXT PRIMARY KEY, value TEXT)",
+)
+
+# Snippet highlight markers; control characters so document text can be
+# HTML-escaped safely before they become <mark> tags
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+def to_match_expression(text: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query matching all words, quoting each so
+    user input can never be parsed as FTS syntax
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words)
+
+class FullTextIndex:
+    """
+    Page-level full-text index of stored PDFs in its own SQLite (FTS5) file,
+    so indexing never competes with the live database for its write lock.
+    Connections are pooled per process; the file is created on first use.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pool = SQLiteConnectionPool(path, SCHEMA)
+
+    def connect(self):
+        """A pooled connection, as a context manager"""
+        return self.pool.connection()
+
+    def indexed(self, digests: Iterable[str]) -> set:
+        """Which of digests have already been processed (indexed or failed)"""
+        digests = list(digests)
+        if not digests:
+            return set()
+        placeholders = ','.join('?' * len(digests))
+        with self.connect() as connection:
+            rows = connection.execute(
+                f'SELECT digest FROM indexed_blobs WHERE digest IN ({placeholders})', digests).fetchall()
+        return {row[0] for row in rows}
+
+    def add_document(self, digest: str, pages: List[str]):
+        """Replace the indexed pages of a blob, in one transaction"""
+        with self.connect() as connection, connection:
+            connection.execute('DELETE FROM pdf_text WHERE digest = ?', (digest,))
+            connection.executemany(
+                'INSERT INTO pdf_text (body, digest, page) VALUES (?, ?, ?)',
+                [(text, digest, number) for number, text in enumerate(pages, start=1) if text.strip()])
+            connection.execute(
+                'INSERT OR REPLACE INTO indexed_blobs (digest, pages, status, error, indexed_at) '
+                'VALUES (?, ?, ?, NULL, ?)', (digest, len(pages), 'indexed', datetime.utcnow().isoformat()))
+
+    def mark_failed(self, digest: str, error: str):
+        with self.connect() as connection, connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO indexed_blobs (digest, pages, status, error, indexed_at) '
+                'VALUES (?, NULL, ?, ?, ?)', (digest, 'failed', error[:500], datetime.utcnow().isoformat()))
+
+    def remove(self, digests: Iterable[str]):
+        """Drop blobs from the index (e.g. once they are deleted from the store)"""
+        digests = list(digests)
+        if not digests:
+            return
+        placeholders = ','.join('?' * len(digests))
+        with self.connect() as connection, connection:
+            connection.execute(f'DELETE FROM pdf_text WHERE digest IN ({placeholders})', digests)
+            connection.execute(f'DELETE FROM indexed_blobs WHERE digest IN ({placeholders})', digests)
+
+    def get_state(self, key: str) -> Optional[str]:
+        with self.connect() as connection:
+            row = connection.execute('SELECT value FROM index_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str):
+        with self.connect() as connection, connection:
+            connection.execute('INSERT OR REPLACE INTO index_state (key, value) VALUES (?, ?)', (key, value))
+
+    def search(self, text: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Pages matching every word of text, best (BM25) first
+        Returns: list of dicts with digest, page, score and an HTML snippet
+        """
+        expression = to_match_expression(text)
+        if expression is None:
+            return []
+        with self.connect() as connection:
+            rows = connection.execute(
+                'SELECT digest, page, snippet(pdf_text, 0, ?, ?, ?, 16), rank FROM pdf_text '
+                'WHERE pdf_text MATCH ? ORDER BY rank LIMIT ? OFFSET ?',
+                (_MARK_START, _MARK_END, '…', expression, limit, offset)).fetchall()
+        return [{
+            'digest': digest,
+            'page': page,
+            'score': round(-rank, 4),
+            'snippet': html.escape(snippet).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'),
+        } for digest, page, snippet, rank in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self.connect() as connection:
+            rows = dict(connection.execute('SELECT status, COUNT(*) FROM indexed_blobs GROUP BY status').fetchall())
+        return {'indexed': rows.get('indexed', 0), 'failed': rows.get('failed', 0)}
+
+class FullTextIndexer:
+    """
+    Background pipeline feeding FullTextIndex. It walks pdf_blobs in
+    (created_at, digest) order from a watermark saved in the index, so each
+    run only looks at blobs added since the last one, and extracts text in
+    a process pool (PyPDF2 is CPU-bound). Every blob is committed on its
+    own and recorded in indexed_blobs, so an interrupted run resumes where
+    it stopped without redoing work. A lock file next to the index keeps
+    several gunicorn workers from indexing at once.
+
+    Blob rows are committed by the write-behind queue, so one can land with
+    a created_at slightly older than a row already seen; the watermark only
+    moves over rows older than `settle` seconds to keep them from being
+    stepped over.
+    """
+
+    WATERMARK = 'watermark'
+
+    def __init__(self, app, pdf_handler, index: FullTextIndex, workers: int = 2,
+                 batch_size: int = 20, interval: float = 60, settle: float = 30,
+                 extract_timeout: float = 120):
+        self.app = app
+        self.pdf_handler = pdf_handler
+        self.index = index
+        self.workers = workers
+        self.batch_size = batch_size
+        self.interval = interval
+        self.settle = timedelta(seconds=settle)
+        self.extract_timeout = extract_timeout
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {'runs': 0, 'indexed': 0, 'failed': 0, 'last_run': None}
+
+    def start(self):
+        """Index new blobs every `interval` seconds in a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='fulltext-indexer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 30):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Full-text indexing run failed: {str(e)}")
+
+    def run_once(self, now: Optional[datetime] = None,
+                 max_batches: Optional[int] = None) -> Optional[Dict[str, int]]:
+        """
+        Index blobs added since the last run
+        Returns: counters for this run, or None if another process holds the lock
+        """
+        lock = self._acquire_lock()
+        if lock is False:
+            return None
+
+        cutoff = (now or datetime.utcnow()) - self.settle
+        result = {'indexed': 0, 'failed': 0}
+        pool = None
+        try:
+            with self.app.app_context():
+                batches = 0
+                while max_batches is None or batches < max_batches:
+                    blobs = self._next_batch(cutoff)
+                    if not blobs:
+                        break
+                    todo = [blob.digest for blob in blobs if self.pdf_handler.has_blob(blob.digest)]
+                    todo = [digest for digest in todo if digest not in self.index.indexed(todo)]
+                    if todo and self.workers > 0 and pool is None:
+                        # spawn: forking a process that runs threads (or gevent) is unsafe
+                        pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                   mp_context=multiprocessing.get_context('spawn'))
+                    self._index_batch(todo, pool, result)
+
+                    last = blobs[-1]
+                    self.index.set_state(self.WATERMARK, f"{last.created_at.isoformat()}|{last.digest}")
+                    batches += 1
+                    if self._stop.is_set():
+                        break
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+            if lock:
+                lock.close()
+
+        self.stats['runs'] += 1
+        self.stats['last_run'] = datetime.utcnow().isoformat()
+        self.stats['indexed'] += result['indexed']
+        self.stats['failed'] += result['failed']
+        if any(result.values()):
+            logger.info(f"Full-text index: added {result['indexed']} PDFs, {result['failed']} failed")
+        return result
+
+    def _acquire_lock(self):
+        """Returns: open lock file, None when locking is unavailable, False when held elsewhere"""
+        if fcntl is None:
+            return None
+        os.makedirs(os.path.dirname(os.path.abspath(self.index.path)), exist_ok=True)
+        lock = open(f"{self.index.path}.lock", 'w')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        return lock
+
+    def _next_batch(self, cutoff: datetime) -> List[PdfBlob]:
+        query = PdfBlob.query.filter(PdfBlob.created_at <= cutoff)
+        watermark = self.index.get_state(self.WATERMARK)
+        if watermark:
+            created_at, digest = watermark.split('|')
+            created_at = datetime.fromisoformat(created_at)
+            query = query.filter(or_(PdfBlob.created_at > created_at,
+                                     and_(PdfBlob.created_at == created_at, PdfBlob.digest > digest)))
+        return query.order_by(PdfBlob.created_at, PdfBlob.digest).limit(self.batch_size).all()
+
+    def _index_batch(self, digests: List[str], pool, result: Dict[str, int]):
+        paths = {digest: self.pdf_handler.blob_path(digest) for digest in digests}
+        if pool is not None:
+            futures = {digest: pool.submit(extract_all_text, path) for digest, path in paths.items()}
+            outcomes = {digest: (lambda future=future: future.result(timeout=self.extract_timeout))
+                        for digest, future in futures.items()}
+        else:
+            outcomes = {digest: (lambda path=path: extract_all_text(path)) for digest, path in paths.items()}
+
+        for digest, outcome in outcomes.items():
+            try:
+                self.index.add_document(digest, outcome())
+                result['indexed'] += 1
+            except Exception as e:
+                self.index.mark_failed(digest, str(e))
+                result['failed'] += 1
+                logger.warning(f"Full-text indexing of {digest} failed: {str(e)}")
@@ -0,0 +1,194 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+
+from models.database import db, Download, PdfBlob, PdfSource, touch_pdf_blob
+
+try:
+    import fcntl
+except ImportError:  # Windows: runs are not serialized across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class PdfStoreCleanup:
+    """
+    Evicts PDFs from the content-addressed store using the pdf_blobs index
+    instead of walking the download folder. Blobs are taken least recently
+    used first (pdf_blobs.last_accessed_at), either because they have not
+    been used for `max_age_days` or until the store fits in `max_bytes`.
+
+    Each batch deletes the blob and URL index rows and marks the downloads
+    that pointed at them as 'evicted' in one short transaction, and only
+    then removes the files: a crash leaves at worst an unindexed file, never
+    an index entry for a missing one. Runs in every worker are serialized
+    with a lock file in the download folder.
+
+    Serving a stored PDF calls record_access(), which bumps
+    last_accessed_at through the write-behind queue at most once per
+    `touch_interval` per blob, so hot PDFs cost no extra writes.
+    """
+
+    def __init__(self, app, pdf_handler, write_behind=None, max_bytes: int = 0,
+                 max_age_days: int = 0, batch_size: int = 200, interval: float = 3600,
+                 max_batches: int = 50, pause: float = 0.1, partial_max_age_days: int = 7,
+                 touch_interval: float = 3600, fulltext_index=None):
+        self.app = app
+        self.pdf_handler = pdf_handler
+        self.write_behind = write_behind
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_batches = max_batches
+        self.pause = pause
+        self.partial_max_age_days = partial_max_age_days
+        self.touch_interval = touch_interval
+        self.fulltext_index = fulltext_index
+        self._touched: Dict[str, float] = {}
+        self._touch_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {'runs': 0, 'files_evicted': 0, 'bytes_freed': 0,
+                      'partials_removed': 0, 'last_run': None}
+
+    def start(self):
+        """Run the cleanup every `interval` seconds in a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='pdf-cleanup', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 30):
+        """Stop the background thread after the current batch"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"PDF store cleanup failed: {str(e)}")
+
+    def record_access(self, digest: str):
+        """Note that a stored PDF was served, for the LRU order"""
+        if self.write_behind is None:
+            return
+        now = time.monotonic()
+        with self._touch_lock:
+            if now - self._touched.get(digest, -self.touch_interval) < self.touch_interval:
+                return
+            if len(self._touched) >= 10000:
+                self._touched.clear()
+            self._touched[digest] = now
+        when = datetime.utcnow()
+        self.write_behind.submit(lambda session: touch_pdf_blob(session, digest, when))
+
+    def run_once(self, now: Optional[datetime] = None) -> Optional[Dict[str, int]]:
+        """
+        Evict up to `max_batches` batches of blobs that are too old or over budget
+        Returns: counters for this run, or None if another process holds the lock
+        """
+        lock = self._acquire_lock()
+        if lock is False:
+            return None
+
+        try:
+            result = {'files_evicted': 0, 'bytes_freed': 0, 'partials_removed': 0}
+            with self.app.app_context():
+                self._backfill_access_times()
+                batches = 0
+                if self.max_age_days > 0:
+                    cutoff = (now or datetime.utcnow()) - timedelta(days=self.max_age_days)
+                    while batches < self.max_batches and not self._stop.is_set():
+                        blobs = self._least_recently_used(PdfBlob.last_accessed_at < cutoff)
+                        if not blobs:
+                            break
+                        self._evict(blobs, result)
+                        batches += 1
+                        time.sleep(self.pause)
+
+                if self.max_bytes > 0:
+                    excess = self.store_size() - self.max_bytes
+                    while excess > 0 and batches < self.max_batches and not self._stop.is_set():
+                        blobs = self._least_recently_used()
+                        if not blobs:
+                            break
+                        victims = []
+                        for blob in blobs:
+                            victims.append(blob)
+                            excess -= blob.file_size or 0
+                            if excess <= 0:
+                                break
+                        self._evict(victims, result)
+                        batches += 1
+                        time.sleep(self.pause)
+
+            result['partials_removed'] = self.pdf_handler.cleanup_partial_files(self.partial_max_age_days)
+
+            self.stats['runs'] += 1
+            self.stats['last_run'] = datetime.utcnow().isoformat()
+            for key, value in result.items():
+                self.stats[key] += value
+            if any(result.values()):
+                logger.info(f"PDF store cleanup: evicted {result['files_evicted']} files "
+                            f"({result['bytes_freed']} bytes), removed {result['partials_removed']} partial files")
+            return result
+        finally:
+            if lock:
+                lock.close()
+
+    def store_size(self) -> int:
+        """Total bytes of indexed blobs (needs an app context)"""
+        return db.session.query(func.coalesce(func.sum(PdfBlob.file_size), 0)).scalar()
+
+    def _acquire_lock(self):
+        """Returns: open lock file, None when locking is unavailable, False when held elsewhere"""
+        if fcntl is None:
+            return None
+        os.makedirs(self.pdf_handler.download_folder, exist_ok=True)
+        lock = open(os.path.join(self.pdf_handler.download_folder, '.cleanup.lock'), 'w')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        return lock
+
+    def _backfill_access_times(self):
+        """Blobs stored before access tracking count as used when created"""
+        updated = (db.session.query(PdfBlob).filter(PdfBlob.last_accessed_at.is_(None))
+                   .update({PdfBlob.last_accessed_at: PdfBlob.created_at}, synchronize_session=False))
+        if updated:
+            db.session.commit()
+
+    def _least_recently_used(self, *criteria) -> List[PdfBlob]:
+        return (PdfBlob.query.filter(*criteria)
+                .order_by(PdfBlob.last_accessed_at, PdfBlob.digest).limit(self.batch_size).all())
+
+    def _evict(self, blobs: List[PdfBlob], result: Dict[str, int]):
+        sizes = {blob.digest: blob.file_size or 0 for blob in blobs}
+        digests = list(sizes)
+        db.session.query(Download).filter(Download.digest.in_(digests)).update(
+            {Download.status: 'evicted'}, synchronize_session=False)
+        db.session.query(PdfSource).filter(PdfSource.digest.in_(digests)).delete(synchronize_session=False)
+        db.session.query(PdfBlob).filter(PdfBlob.digest.in_(digests)).delete(synchronize_session=False)
+        db.session.commit()
+        db.session.expunge_all()
+
+        for digest in digests:
+            if self.pdf_handler.delete_blob(digest):
+                result['files_evicted'] += 1
+                result['bytes_freed'] += sizes[digest]
+        with self._touch_lock:
+            for digest in digests:
+                self._touched.pop(digest, None)
+        if self.fulltext_index is not None:
+            self.fulltext_index.remove(digests)
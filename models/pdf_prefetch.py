@@ -0,0 +1,177 @@
+import io
+import logging
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from werkzeug.utils import secure_filename
+
+from models.database import PdfSource, record_pdf_source
+from utils.rate_limiter import HostRateLimiter
+
+logger = logging.getLogger(__name__)
+
+def order_pdf_urls(orders: Iterable[Dict[str, Any]]) -> List[str]:
+    """Distinct PDF URLs of a case's orders, in listing order"""
+    urls = []
+    for order in orders or []:
+        url = (order.get('pdf_url') or '').strip()
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+class _ZipStream(io.RawIOBase):
+    """Write-only sink zipfile writes into; the bytes are drained chunk by chunk"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+class PdfPrefetcher:
+    """
+    Fetches a case's order PDFs into the PDF store ahead of the first click,
+    and streams them as a ZIP.
+
+    Prefetching runs on a small bounded pool with a per-host rate limit so a
+    case with dozens of orders does not hammer the portal; URLs already in
+    the store or already in flight are skipped, and once `max_pending` URLs
+    are queued further ones are dropped (they are still fetched on click).
+    """
+
+    def __init__(self, pdf_handler, write_behind, max_workers: int = 4,
+                 host_rate: float = 2.0, max_pending: int = 200,
+                 on_access: Optional[Callable[[str], None]] = None):
+        self.pdf_handler = pdf_handler
+        self.write_behind = write_behind
+        self.on_access = on_access  # called with the digest of each stored PDF served
+        self.limiter = HostRateLimiter(rate=host_rate, burst=max_workers)
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pdf-prefetch')
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self.stats = {'queued': 0, 'fetched': 0, 'failed': 0, 'skipped': 0}
+
+    def cached_sources(self, urls: List[str]) -> Dict[str, PdfSource]:
+        """URL index entries whose blob is still on disk (needs an app context)"""
+        if not urls:
+            return {}
+        sources = PdfSource.query.filter(PdfSource.url.in_(urls)).all()
+        return {source.url: source for source in sources if self.pdf_handler.has_blob(source.digest)}
+
+    def prefetch(self, orders: Iterable[Dict[str, Any]]) -> int:
+        """
+        Queue every uncached order PDF of a case for download
+        Returns: number of URLs queued
+        """
+        urls = order_pdf_urls(orders)
+        cached = self.cached_sources(urls)
+        queued = 0
+        with self._lock:
+            for url in urls:
+                if url in cached or url in self._inflight:
+                    continue
+                if len(self._inflight) >= self.max_pending:
+                    self.stats['skipped'] += 1
+                    continue
+                self._inflight.add(url)
+                self._executor.submit(self._fetch, url)
+                queued += 1
+            self.stats['queued'] += queued
+        return queued
+
+    def _fetch(self, url: str):
+        try:
+            self.limiter.acquire(url)
+            result = self.pdf_handler.download_pdf(url)
+            if result['status'] == 'success':
+                self._record(url, result)
+                self.stats['fetched'] += 1
+            else:
+                self.stats['failed'] += 1
+                logger.warning(f"Prefetch of {url} failed: {result['error_message']}")
+        except Exception as e:
+            self.stats['failed'] += 1
+            logger.error(f"Prefetch of {url} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._inflight.discard(url)
+
+    def _record(self, url: str, result: Dict[str, Any]):
+        self.write_behind.submit(lambda session: record_pdf_source(
+            session, url, result['digest'], result['file_size'], result['filename']))
+
+    def iter_zip(self, orders: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+        """
+        Yield a ZIP of a case's order PDFs as it is built. Stored PDFs are
+        read from disk; the rest are fetched (rate limited) and cached on the
+        way through. Only one chunk is held in memory at a time. Orders that
+        could not be fetched are listed in MISSING.txt at the end.
+        """
+        orders = [order for order in orders or [] if (order.get('pdf_url') or '').strip()]
+        cached = self.cached_sources(order_pdf_urls(orders))
+
+        sink = _ZipStream()
+        missing = []
+        seen = set()
+        # PDFs are already compressed; storing them keeps the CPU cost nil
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for position, order in enumerate(orders, start=1):
+                url = order['pdf_url'].strip()
+                if url in seen:
+                    continue
+                seen.add(url)
+
+                if url in cached:
+                    filename = cached[url].filename
+                    if self.on_access is not None:
+                        self.on_access(cached[url].digest)
+                    chunks = self._read_blob(cached[url].digest)
+                else:
+                    self.limiter.acquire(url)
+                    opened = self.pdf_handler.open_pdf(url)
+                    if opened['status'] != 'success':
+                        missing.append(f"{url}: {opened['error_message']}")
+                        continue
+                    filename = opened['filename']
+                    chunks = self.pdf_handler.stream_pdf(
+                        opened, on_complete=lambda result, url=url: self._record(url, result))
+
+                name = secure_filename(f"{position:02d} {order.get('date') or ''} {filename}") or f'{position:02d}.pdf'
+                try:
+                    with archive.open(name, 'w') as entry:
+                        for chunk in chunks:
+                            entry.write(chunk)
+                            data = sink.drain()
+                            if data:
+                                yield data
+                except Exception as e:
+                    # The entry is already partly sent; note it and move on
+                    logger.error(f"ZIP entry for {url} failed: {str(e)}")
+                    missing.append(f"{url}: {str(e)}")
+
+            if missing:
+                archive.writestr('MISSING.txt', '\n'.join(missing) + '\n')
+        yield sink.drain()
+
+    def _read_blob(self, digest: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        with open(self.pdf_handler.blob_path(digest), 'rb') as blob:
+            while True:
+                chunk = blob.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
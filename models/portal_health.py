@@ -0,0 +1,143 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+
+from utils.circuit_breaker import HostCircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of values, or None when there are none"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(fraction * len(ordered))) - 1]
+
+class HostHealth:
+    """Rolling window of the last `window` probes of one URL"""
+
+    def __init__(self, url: str, window: int = 40):
+        self.url = url
+        self.samples = deque(maxlen=window)  # (checked at, status code or None, seconds or None, error)
+        self._lock = threading.Lock()
+
+    def record(self, status_code: Optional[int], elapsed: Optional[float], error: Optional[str] = None):
+        with self._lock:
+            self.samples.append((datetime.utcnow(), status_code, elapsed, error))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self.samples)
+        if not samples:
+            return {'url': self.url, 'accessible': None, 'samples': 0, 'last_checked': None}
+        checked_at, status_code, elapsed, error = samples[-1]
+        latencies = [sample[2] for sample in samples if sample[3] is None]
+        snapshot = {
+            'url': self.url,
+            'accessible': error is None and status_code == 200,
+            'status_code': status_code,
+            'response_time': elapsed,
+            'p50': percentile(latencies, 0.5),
+            'p95': percentile(latencies, 0.95),
+            'error_rate': round(sum(1 for sample in samples if sample[3] is not None) / len(samples), 3),
+            'samples': len(samples),
+            'last_checked': checked_at.isoformat(),
+        }
+        if error is not None:
+            snapshot['error'] = error
+        return snapshot
+
+class PortalHealthProber:
+    """
+    Probes each portal URL every `interval` seconds in the background and
+    keeps a rolling window per URL (latency p50/p95, error rate), so
+    /api/portal-status answers from memory instead of calling the portal.
+
+    Each probe also feeds the shared circuit breaker, so searches fail fast
+    while a portal is down, and scales the given rate limiters to half rate
+    for a host that is degraded: error rate above `degraded_error_rate` or
+    p95 above `slow_seconds`. A probe only waits for the response headers;
+    5xx answers and network errors count as errors.
+    """
+
+    def __init__(self, urls: Iterable[str], breaker: HostCircuitBreaker, limiters: Iterable = (),
+                 interval: float = 30, timeout: float = 10, window: int = 40,
+                 slow_seconds: float = 5, degraded_error_rate: float = 0.2):
+        self.hosts = {url: HostHealth(url, window) for url in urls}
+        self.breaker = breaker
+        self.limiters = list(limiters)
+        self.interval = interval
+        self.timeout = timeout
+        self.slow_seconds = slow_seconds
+        self.degraded_error_rate = degraded_error_rate
+        self.session = requests.Session()
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {'runs': 0, 'probes': 0, 'errors': 0, 'last_run': None}
+
+    def start(self):
+        """Probe every `interval` seconds in a background thread, starting now"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='portal-health', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 30):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Portal health probe failed: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def run_once(self) -> Dict[str, Dict[str, Any]]:
+        """Probe every URL once; returns the snapshot of each"""
+        for url, health in self.hosts.items():
+            self.probe(url, health)
+        self.stats['runs'] += 1
+        self.stats['last_run'] = datetime.utcnow().isoformat()
+        return self.status()
+
+    def probe(self, url: str, health: HostHealth):
+        started = time.monotonic()
+        try:
+            # stream=True: the headers are enough, the body is not downloaded
+            with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                elapsed = response.elapsed.total_seconds()
+                error = f'HTTP {response.status_code}' if response.status_code >= 500 else None
+                status_code = response.status_code
+        except requests.RequestException as e:
+            status_code, elapsed, error = None, time.monotonic() - started, str(e)
+
+        health.record(status_code, elapsed, error)
+        self.stats['probes'] += 1
+        if error is None:
+            self.breaker.record_success(url)
+        else:
+            self.stats['errors'] += 1
+            self.breaker.record_failure(url)
+            logger.warning(f"Portal probe of {url} failed: {error}")
+
+        snapshot = health.snapshot()
+        degraded = (snapshot['error_rate'] > self.degraded_error_rate
+                    or (snapshot['p95'] or 0) > self.slow_seconds)
+        for limiter in self.limiters:
+            limiter.set_rate_factor(url, 0.5 if degraded else 1)
+
+    def status(self, url: Optional[str] = None) -> Dict[str, Any]:
+        """Latest window of one URL, or of all of them keyed by URL"""
+        if url is not None:
+            health = self.hosts.get(url) or HostHealth(url)
+            return dict(health.snapshot(), circuit=self.breaker.snapshot(url))
+        return {url: self.status(url) for url in self.hosts}
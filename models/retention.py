@@ -0,0 +1,280 @@
+import gzip
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import undefer
+
+from models.database import db, Query, Download, PdfBlob, PdfSource
+from utils.pdf_preview import sidecar_paths
+from utils.serialization import dumps_bytes, loads
+
+try:
+    import fcntl
+except ImportError:  # Windows: runs are not serialized across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class RetentionJob:
+    """
+    Moves queries older than `retention_days` (with their downloads) out of
+    the live database into monthly gzip-compressed NDJSON archives, e.g.
+    archive/queries-2024-01.ndjson.gz, and deletes their PDFs.
+
+    Work is done in small batches, each its own short transaction, so the
+    live database is never locked for long. Every batch is appended to the
+    archive and fsynced before its rows are deleted, and files are removed
+    only after the delete commits: a crash can at worst archive a row twice
+    (same id) or leave an unreferenced PDF for PdfStoreCleanup to evict,
+    never lose a record. Download rows whose file has already gone are
+    archived to downloads-YYYY-MM.ndjson.gz and removed as well, checking
+    a bounded slice of the table per run. Deleted blobs are dropped from
+    `fulltext_index` when one is given.
+
+    Runs in every worker are serialized with a lock file in the archive
+    folder, so only one process archives at a time.
+    """
+
+    def __init__(self, app, archive_folder: str, download_folder: str,
+                 retention_days: int = 365, batch_size: int = 200,
+                 interval: float = 3600, max_batches: int = 50, pause: float = 0.1,
+                 fulltext_index=None):
+        self.app = app
+        self.archive_folder = archive_folder
+        self.download_folder = os.path.realpath(download_folder)
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_batches = max_batches
+        self.pause = pause
+        self.fulltext_index = fulltext_index
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {'runs': 0, 'queries_archived': 0, 'downloads_archived': 0,
+                      'files_deleted': 0, 'last_run': None}
+
+        os.makedirs(archive_folder, exist_ok=True)
+
+    def start(self):
+        """Run the job every `interval` seconds in a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='retention', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 30):
+        """Stop the background thread after the current batch"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Retention run failed: {str(e)}")
+
+    def run_once(self, now: Optional[datetime] = None) -> Optional[Dict[str, int]]:
+        """
+        Archive up to `max_batches` batches of expired rows
+        Returns: counters for this run, or None if another process holds the lock
+        """
+        lock = self._acquire_lock()
+        if lock is False:
+            return None
+
+        try:
+            cutoff = (now or datetime.utcnow()) - timedelta(days=self.retention_days)
+            result = {'queries_archived': 0, 'downloads_archived': 0, 'files_deleted': 0}
+            with self.app.app_context():
+                for _ in range(self.max_batches):
+                    if not self._archive_query_batch(cutoff, result) or self._stop.is_set():
+                        break
+                    time.sleep(self.pause)
+                self._archive_missing_downloads(result)
+
+            self.stats['runs'] += 1
+            self.stats['last_run'] = datetime.utcnow().isoformat()
+            for key, value in result.items():
+                self.stats[key] += value
+            if any(result.values()):
+                logger.info(f"Retention: archived {result['queries_archived']} queries, "
+                            f"{result['downloads_archived']} downloads, deleted {result['files_deleted']} files")
+            return result
+        finally:
+            if lock:
+                lock.close()
+
+    def _acquire_lock(self):
+        """Returns: open lock file, None when locking is unavailable, False when held elsewhere"""
+        if fcntl is None:
+            return None
+        lock = open(os.path.join(self.archive_folder, '.retention.lock'), 'w')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        return lock
+
+    def _archive_query_batch(self, cutoff: datetime, result: Dict[str, int]) -> bool:
+        """Archive and delete the oldest expired queries; returns False when none are left"""
+        queries = (Query.query.options(undefer(Query.response_data), undefer(Query.response_blob))
+                   .filter(Query.query_timestamp < cutoff)
+                   .order_by(Query.query_timestamp, Query.id).limit(self.batch_size).all())
+        if not queries:
+            return False
+
+        query_ids = [query.id for query in queries]
+        downloads = db.session.query(Download).filter(Download.query_id.in_(query_ids)).all()
+        downloads_by_query = defaultdict(list)
+        for download in downloads:
+            downloads_by_query[download.query_id].append(download)
+
+        by_month = defaultdict(list)
+        for query in queries:
+            record = query.to_dict()
+            record['case_id'] = query.case_id
+            record['content_hash'] = query.content_hash
+            record['payload_query_id'] = query.payload_query_id  # whose payload a repeat showed
+            record['downloads'] = [download.to_dict() for download in downloads_by_query[query.id]]
+            by_month[query.query_timestamp.strftime('%Y-%m')].append(record)
+        self._append('queries', by_month)
+
+        self._hand_off_payloads(queries, query_ids)
+        paths = {download.local_path for download in downloads}
+        db.session.query(Download).filter(Download.query_id.in_(query_ids)).delete(synchronize_session=False)
+        db.session.query(Query).filter(Query.id.in_(query_ids)).delete(synchronize_session=False)
+        paths -= self._still_referenced(paths)
+        # Blobs about to be deleted leave the URL index too, so the next
+        # click fetches them again instead of finding a dangling entry
+        digests = [download.digest for download in downloads if download.digest and download.local_path in paths]
+        if digests:
+            db.session.query(PdfSource).filter(PdfSource.digest.in_(digests)).delete(synchronize_session=False)
+            db.session.query(PdfBlob).filter(PdfBlob.digest.in_(digests)).delete(synchronize_session=False)
+        db.session.commit()
+        db.session.expunge_all()
+
+        result['queries_archived'] += len(queries)
+        result['downloads_archived'] += len(downloads)
+        result['files_deleted'] += self._delete_files(paths)
+        if digests and self.fulltext_index is not None:
+            self.fulltext_index.remove(digests)
+        return True
+
+    def _hand_off_payloads(self, queries: List[Query], query_ids: List[int]):
+        """
+        Live repeat searches that point at a query being archived get its
+        payload: the newest takes a copy and the others point at it
+        """
+        dependents = (Query.query.filter(Query.payload_query_id.in_(query_ids), Query.id.notin_(query_ids))
+                      .order_by(Query.id.desc()).all())
+        if not dependents:
+            return
+        sources = {query.id: query for query in queries}
+        heirs = {}
+        for dependent in dependents:
+            heir = heirs.setdefault(dependent.payload_query_id, dependent)
+            if heir is dependent:
+                source = sources[dependent.payload_query_id]
+                dependent.response_data, dependent.response_blob = source.response_data, source.response_blob
+                dependent.payload_query_id = None
+            else:
+                dependent.payload_query_id = heir.id
+        db.session.flush()
+
+    def _archive_missing_downloads(self, result: Dict[str, int]):
+        """
+        Archive and delete download rows whose file no longer exists. Each
+        run checks at most `max_batches` batches, resuming after the last
+        row the previous run checked and starting over once it reaches the end.
+        """
+        last_id = self._read_cursor()
+        for _ in range(self.max_batches):
+            if self._stop.is_set():
+                break
+            downloads = (db.session.query(Download)
+                         .filter(Download.id > last_id, Download.status == 'success')
+                         .order_by(Download.id).limit(self.batch_size).all())
+            if not downloads:
+                last_id = 0
+                break
+            last_id = downloads[-1].id
+
+            missing = [download for download in downloads if not os.path.exists(download.local_path)]
+            if missing:
+                by_month = defaultdict(list)
+                for download in missing:
+                    timestamp = download.download_timestamp or datetime.utcnow()
+                    by_month[timestamp.strftime('%Y-%m')].append(download.to_dict())
+                self._append('downloads', by_month)
+
+                db.session.query(Download).filter(
+                    Download.id.in_([download.id for download in missing])).delete(synchronize_session=False)
+                db.session.commit()
+                result['downloads_archived'] += len(missing)
+            db.session.expunge_all()
+        self._write_cursor(last_id)
+
+    def _read_cursor(self) -> int:
+        """Last download id checked for a missing file, kept across runs and processes"""
+        try:
+            with open(os.path.join(self.archive_folder, '.missing_downloads_cursor')) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_cursor(self, last_id: int):
+        with open(os.path.join(self.archive_folder, '.missing_downloads_cursor'), 'w') as f:
+            f.write(str(last_id))
+
+    def _append(self, kind: str, records_by_month: Dict[str, List[dict]]):
+        """Append records to monthly archives and fsync them before any delete"""
+        for month, records in records_by_month.items():
+            path = os.path.join(self.archive_folder, f'{kind}-{month}.ndjson.gz')
+            # Each append is its own gzip member; gzip readers concatenate them
+            with open(path, 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+                    archive.write(b''.join(dumps_bytes(record) + b'\n' for record in records))
+                raw.flush()
+                os.fsync(raw.fileno())
+
+    def _still_referenced(self, paths: Iterable[str]) -> set:
+        """Paths other download rows still point at, which must not be deleted"""
+        paths = list(paths)
+        if not paths:
+            return set()
+        rows = db.session.query(Download.local_path).filter(Download.local_path.in_(paths)).all()
+        return {row[0] for row in rows}
+
+    def _delete_files(self, paths: Iterable[str]) -> int:
+        deleted = 0
+        for path in paths:
+            # Only ever delete inside the download folder
+            real_path = os.path.realpath(path)
+            if not real_path.startswith(self.download_folder + os.sep):
+                continue
+            try:
+                os.remove(real_path)
+                deleted += 1
+                for sidecar in sidecar_paths(real_path):
+                    if os.path.exists(sidecar):
+                        os.remove(sidecar)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Retention could not delete {path}: {str(e)}")
+        return deleted
+
+def read_archive(path: str) -> Iterable[dict]:
+    """Yield the records of an archive file, newest copy of each id last"""
+    with gzip.open(path, 'rb') as archive:
+        for line in archive:
+            if line.strip():
+                yield loads(line)
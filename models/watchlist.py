@@ -0,0 +1,185 @@
+import logging
+import random
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case as sql_case
+from sqlalchemy.exc import IntegrityError
+
+from models.database import db, Case, WatchedCase, apply_case_data
+from utils.rate_limiter import HostRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Refresh cadence by days until the next hearing: the sooner, the more often
+REFRESH_TIERS = (
+    (1, timedelta(hours=1)),
+    (3, timedelta(hours=3)),
+    (14, timedelta(hours=12)),
+)
+# Statuses of finished cases, which only need an occasional look
+CLOSED_STATUSES = ('disposed', 'dismissed', 'decided', 'closed', 'withdrawn')
+
+def refresh_interval(case: Optional[Case], today: date, base: timedelta) -> timedelta:
+    """How long until a watched case is due again, before jitter"""
+    if case is None:
+        return base
+    status = (case.case_status or '').lower()
+    if any(word in status for word in CLOSED_STATUSES):
+        return base * 7
+    if case.next_hearing_on is not None and case.next_hearing_on >= today:
+        days = (case.next_hearing_on - today).days
+        for limit, interval in REFRESH_TIERS:
+            if days <= limit:
+                return min(interval, base)
+    return base
+
+class WatchlistScheduler:
+    """
+    Refreshes watched cases through the scraper in the background, so
+    users do not have to re-search them to spot a new hearing date, status
+    or order.
+
+    Every `interval` seconds the due entries are taken, cases with the
+    nearest upcoming hearing first, at most `batch_size` per tick and at
+    most `rate` portal searches per second. After a refresh the next one is
+    scheduled by REFRESH_TIERS with +/- `jitter` so entries added together
+    drift apart; failures back off exponentially up to the base interval.
+    Each scraped result is diffed against the stored Case before it is
+    updated (see apply_case_data): unchanged results write nothing, and
+    differences are recorded as CaseChange rows.
+
+    Every worker may run a scheduler: an entry is claimed by moving its
+    next_refresh_at forward with a conditional UPDATE, so only one process
+    refreshes it.
+    """
+
+    def __init__(self, app, scraper, batch_size: int = 10, interval: float = 60,
+                 rate: float = 0.2, refresh_hours: float = 24, jitter: float = 0.1,
+                 failure_backoff: float = 900, lease: float = 600, breaker=None):
+        self.app = app
+        self.scraper = scraper
+        self.batch_size = batch_size
+        self.interval = interval
+        self.limiter = HostRateLimiter(rate=rate, burst=1)
+        self.base_interval = timedelta(hours=refresh_hours)
+        self.jitter = jitter
+        self.failure_backoff = timedelta(seconds=failure_backoff)
+        self.lease = timedelta(seconds=lease)
+        self.breaker = breaker  # HostCircuitBreaker; due cases wait while the portal is down
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {'runs': 0, 'refreshed': 0, 'failed': 0, 'changes': 0, 'last_run': None}
+
+    def start(self):
+        """Refresh due cases every `interval` seconds in a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='watchlist', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 30):
+        """Stop the background thread after the current refresh"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Watchlist run failed: {str(e)}")
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Refresh up to `batch_size` due cases
+        Returns: counters for this run
+        """
+        now = now or datetime.utcnow()
+        result = {'refreshed': 0, 'failed': 0, 'changes': 0}
+        if self.breaker is not None and not self.breaker.allow(self.scraper.base_url):
+            # Leave due cases as they are rather than count failures against them
+            logger.info("Watchlist: portal circuit is open, skipping this run")
+            return result
+        with self.app.app_context():
+            # Commits expire loaded rows, so keep what the claims compare against
+            due = [(watch.id, watch.next_refresh_at) for watch in self._due(now)]
+            for watch_id, due_at in due:
+                if self._stop.is_set():
+                    break
+                if not self._claim(watch_id, due_at, now):
+                    continue
+                watch = db.session.get(WatchedCase, watch_id)
+                if watch is None:  # removed since it was listed
+                    continue
+                if self.breaker is not None and not self.breaker.allow(self.scraper.base_url):
+                    break  # the claim lapses after `lease` and the case is retried
+                self.limiter.acquire(self.scraper.base_url)
+                self._refresh(watch, now, result)
+
+        self.stats['runs'] += 1
+        self.stats['last_run'] = datetime.utcnow().isoformat()
+        for key, value in result.items():
+            self.stats[key] += value
+        if any(result.values()):
+            logger.info(f"Watchlist: refreshed {result['refreshed']} cases, {result['failed']} failed, "
+                        f"{result['changes']} changes")
+        return result
+
+    def _due(self, now: datetime) -> List[WatchedCase]:
+        upcoming = sql_case((Case.next_hearing_on >= now.date(), Case.next_hearing_on), else_=None)
+        return (WatchedCase.query.outerjoin(Case, WatchedCase.case_id == Case.id)
+                .filter(WatchedCase.active.is_(True), WatchedCase.next_refresh_at <= now)
+                .order_by(upcoming.is_(None), upcoming, WatchedCase.next_refresh_at, WatchedCase.id)
+                .limit(self.batch_size).all())
+
+    def _claim(self, watch_id: int, due_at: datetime, now: datetime) -> bool:
+        """Take an entry for this process; False if another one got there first"""
+        claimed = (db.session.query(WatchedCase)
+                   .filter(WatchedCase.id == watch_id, WatchedCase.next_refresh_at == due_at)
+                   .update({WatchedCase.next_refresh_at: now + self.lease}, synchronize_session=False))
+        db.session.commit()
+        return claimed == 1
+
+    def _refresh(self, watch: WatchedCase, now: datetime, result: Dict[str, int]):
+        try:
+            search_result = self.scraper.search_case(watch.case_type, watch.case_number, watch.filing_year)
+        except Exception as e:
+            search_result = {'status': 'error', 'error_message': f'Unexpected error: {str(e)}'}
+
+        if search_result['status'] == 'success':
+            try:
+                result['changes'] += self._apply(watch, search_result['case_data'], now)
+                result['refreshed'] += 1
+                return
+            except IntegrityError:
+                # A concurrent search inserted the same case first; retry next time
+                db.session.rollback()
+                search_result = {'status': 'error', 'error_message': 'Case was being updated concurrently'}
+
+        watch = db.session.get(WatchedCase, watch.id)
+        watch.consecutive_failures += 1
+        watch.last_status = 'error'
+        watch.last_error = search_result['error_message']
+        backoff = min(self.failure_backoff * 2 ** (watch.consecutive_failures - 1), self.base_interval)
+        watch.next_refresh_at = now + self._jittered(backoff)
+        db.session.commit()
+        result['failed'] += 1
+
+    def _apply(self, watch: WatchedCase, case_data: Dict[str, Any], now: datetime) -> int:
+        """Store and reschedule a successful refresh; returns the number of changes"""
+        # A case nobody searched before is only a baseline on its first refresh
+        update = apply_case_data(case_data, source='watchlist', watch_id=watch.id)
+        watch.case = update.case
+        watch.last_refreshed_at = now
+        watch.last_status = 'success'
+        watch.last_error = None
+        watch.consecutive_failures = 0
+        watch.next_refresh_at = now + self._jittered(refresh_interval(update.case, now.date(), self.base_interval))
+        db.session.commit()
+        return len(update.changes)
+
+    def _jittered(self, interval: timedelta) -> timedelta:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
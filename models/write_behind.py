@@ -0,0 +1,134 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from models.database import db
+
+logger = logging.getLogger(__name__)
+
+class _FlushMarker:
+    """Queue entry that is acknowledged once everything before it is committed"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+class WriteBehindQueue:
+    """
+    Background writer that batches audit inserts/updates into grouped
+    transactions, off the request path.
+
+    Operations are callables taking the SQLAlchemy session (or model
+    instances to insert). The queue is bounded: when the writer falls
+    behind, enqueue waits up to `enqueue_timeout` and then performs the
+    write synchronously in the caller, so producers slow down instead of
+    growing memory without limit. Everything queued is committed before
+    the process exits (stop() is registered with atexit).
+    """
+
+    def __init__(self, app, max_pending: int = 1000, batch_size: int = 100,
+                 flush_interval: float = 0.5, enqueue_timeout: float = 1.0):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._stopping = False
+        self._lock = threading.Lock()
+        self.stats = {'written': 0, 'failed': 0, 'batches': 0, 'sync_fallbacks': 0}
+
+    def start(self):
+        """Start the background writer thread"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+        return self
+
+    def add(self, instance):
+        """Queue a new model instance for insert"""
+        self.submit(lambda session: session.add(instance))
+
+    def submit(self, operation: Callable[[Any], None]):
+        """Queue operation(session) to run in the next grouped transaction"""
+        if self._thread is None or self._stopping:
+            self._write([operation])
+            return
+        try:
+            self._queue.put(operation, timeout=self.enqueue_timeout)
+        except queue.Full:
+            # Backpressure: the writer is saturated, so pay for this write here
+            self.stats['sync_fallbacks'] += 1
+            logger.warning("Write-behind queue full, writing synchronously")
+            self._write([operation])
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until everything queued before this call is committed"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def stop(self, timeout: float = 30):
+        """Flush pending writes and stop the writer"""
+        if self._thread is None or self._stopping:
+            return
+        self.flush(timeout)
+        self._stopping = True
+        self._thread.join(timeout)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch: List[Any] = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and time.monotonic() < deadline:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            operations = [item for item in batch if not isinstance(item, _FlushMarker)]
+            if operations:
+                self._write(operations)
+            for item in batch:
+                if isinstance(item, _FlushMarker):
+                    item.done.set()
+
+    def _write(self, operations: List[Callable[[Any], None]]):
+        """Apply operations in one transaction, isolating failures per operation"""
+        with self.app.app_context():
+            try:
+                for operation in operations:
+                    operation(db.session)
+                db.session.commit()
+                self.stats['written'] += len(operations)
+                self.stats['batches'] += 1
+                return
+            except Exception as e:
+                db.session.rollback()
+                if len(operations) == 1:
+                    self.stats['failed'] += 1
+                    logger.error(f"Write-behind operation failed: {e}")
+                    return
+                logger.warning(f"Write-behind batch failed ({e}), retrying operations one by one")
+
+        for operation in operations:
+            self._write([operation])
+
+    def get_stats(self) -> Dict[str, int]:
+        """Return counters plus the current queue depth"""
+        return dict(self.stats, pending=self.pending)
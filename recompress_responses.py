@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Recompress stored search results for Court Data Fetcher
+
+Rewrites queries.response_data with the RESPONSE_COMPRESSION settings
+(optionally training a shared dictionary first) and reports the database
+size before and after.
+
+Usage:
+    RESPONSE_COMPRESSION=auto python recompress_responses.py --train --vacuum
+"""
+
+import argparse
+import os
+import sys
+
+from sqlalchemy import text
+
+def database_size(db):
+    """
+    Returns: (file bytes, free bytes) of the SQLite database, or (None, None)
+    for other backends
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return None, None
+    page_size = db.session.execute(text('PRAGMA page_size')).scalar()
+    page_count = db.session.execute(text('PRAGMA page_count')).scalar()
+    freelist = db.session.execute(text('PRAGMA freelist_count')).scalar()
+    return page_count * page_size, freelist * page_size
+
+def payload_size(db):
+    """Returns: total bytes held in response_data and response_blob"""
+    return db.session.execute(text(
+        'SELECT COALESCE(SUM(LENGTH(CAST(response_data AS BLOB))), 0) + '
+        'COALESCE(SUM(LENGTH(response_blob)), 0) FROM queries')).scalar()
+
+def format_size(size):
+    return 'n/a' if size is None else f"{size / (1024 * 1024):.2f} MB"
+
+def report(label, db):
+    file_size, free = database_size(db)
+    print(f"{label:<8} database {format_size(file_size)} (free {format_size(free)}), "
+          f"payloads {format_size(payload_size(db))}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--train', action='store_true',
+                        help='train a shared dictionary from stored results first')
+    parser.add_argument('--sample-size', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--all', action='store_true',
+                        help='also rewrite rows that are already compressed')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='VACUUM afterwards so the file actually shrinks')
+    args = parser.parse_args()
+
+    os.environ.setdefault('WRITE_BEHIND_ENABLED', 'false')
+    from app import create_app
+    from models.database import db, train_compression_dictionary, recompress_responses
+    from utils.compression import resolve_algorithm
+
+    app = create_app()
+    with app.app_context():
+        algorithm = resolve_algorithm(app.config['RESPONSE_COMPRESSION'])
+        if algorithm is None:
+            print("❌ RESPONSE_COMPRESSION is off; set it to auto, zstd or zlib")
+            sys.exit(1)
+
+        report('Before', db)
+
+        if args.train:
+            dictionary = train_compression_dictionary(algorithm, args.sample_size)
+            if dictionary is None:
+                print("⚠️  Not enough stored results to train a dictionary")
+            else:
+                print(f"📚 Trained {algorithm} dictionary #{dictionary.id} "
+                      f"({len(dictionary.data):,} bytes from {dictionary.sample_count} results)")
+
+        stats = recompress_responses(args.batch_size, recompress_all=args.all)
+        print(f"🗜️  Rewrote {stats['rewritten']:,} of {stats['scanned']:,} results with {algorithm}: "
+              f"{format_size(stats['bytes_before'])} -> {format_size(stats['bytes_after'])}")
+
+        if args.vacuum and db.engine.dialect.name == 'sqlite':
+            db.session.commit()
+            with db.engine.connect() as connection:
+                connection.execution_options(isolation_level='AUTOCOMMIT').execute(text('VACUUM'))
+
+        report('After', db)
+
+if __name__ == '__main__':
+    main()
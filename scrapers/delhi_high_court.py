@@ -23,6 +23,8 @@ from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 import tempfile
 
+from utils.form_discovery import CANDIDATE_PATHS, FormDiscoveryCache, probe_concurrently, probe_status_page
+
 # Configure Tesseract path for Windows
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 import os
@@ -52,6 +54,8 @@ class DelhiHighCourtScraper:
         self.session = requests.Session()
         self.use_selenium = use_selenium
         self.driver = None
+        # Where the search form was found, so searches skip the candidate walk
+        self.form_cache = FormDiscoveryCache()
         self.setup_session()
         
     def setup_session(self):
@@ -247,43 +251,51 @@ class DelhiHighCourtScraper:
             logging.error(f"Error finding search form: {e}")
             return None
     
+    def _probe_status_page(self, url: str, session: Optional[requests.Session] = None) -> Optional[tuple]:
+        """probe_status_page() in the given session (default: the scraper's own)"""
+        session = session or self.session
+        return probe_status_page(url, lambda page_url: session.get(page_url, timeout=30),
+                                 lambda response: BeautifulSoup(response.content, 'html.parser'),
+                                 self.find_search_form)
+    
+    def _probe_in_own_session(self, url: str) -> Optional[tuple]:
+        """
+        Probe url in a fresh session, so concurrent probes never share one;
+        the session's cookies are passed on with the result
+        """
+        with requests.Session() as session:
+            session.headers.update(self.session.headers)
+            probed = self._probe_status_page(url, session)
+        if probed is None:
+            return None
+        rank, (location, soup) = probed
+        return rank, (location, soup, session.cookies)
+    
     def get_case_status_page(self) -> Optional[BeautifulSoup]:
         """Get the case status search page using multiple methods"""
         try:
-            # Try different possible URLs for case status
-            urls_to_try = [
-                f"{self.base_url}/case_status",
-                f"{self.base_url}/case-status",
-                f"{self.base_url}/case_status.asp",
-                f"{self.base_url}/case_status.php",
-                f"{self.base_url}/case_status.html",
-                f"{self.base_url}/search",
-                f"{self.base_url}/case-search",
-                f"{self.base_url}/status",
-                f"{self.base_url}/"
-            ]
-            
-            for url in urls_to_try:
+            location = self.form_cache.get(self.base_url)
+            if location is not None:
                 try:
-                    logging.info(f"Trying URL: {url}")
-                    response = self.session.get(url, timeout=30)
-                    if response.status_code == 200:
-                        soup = BeautifulSoup(response.content, 'html.parser')
-                        
-                        # Check if this page has a search form
-                        form_info = self.find_search_form(soup)
-                        if form_info:
-                            logging.info(f"Found search form at: {url}")
-                            return soup
-                        
-                        # Also check if it's a general court page that might have navigation
-                        if any(keyword in response.text.lower() for keyword in ['case', 'search', 'status', 'court']):
-                            logging.info(f"Found court-related page at: {url}")
-                            return soup
-                            
+                    probed = self._probe_status_page(location.page_url)
                 except Exception as e:
-                    logging.warning(f"Failed to access {url}: {e}")
-                    continue
+                    logging.warning(f"Failed to access {location.page_url}: {e}")
+                    probed = None
+                if probed is not None and probed[1][0] == location:
+                    return probed[1][1]
+                self.form_cache.invalidate(self.base_url)
+            
+            # Try the candidate URLs all at once, keeping the first that works
+            found = probe_concurrently(self._probe_in_own_session,
+                                       [f"{self.base_url.rstrip('/')}{path}" for path in CANDIDATE_PATHS],
+                                       timeout=35)
+            if found is not None:
+                location, soup, cookies = found
+                logging.info(f"Found case status page at: {location.page_url}")
+                # The search continues in the scraper's session from the page found
+                self.session.cookies.update(cookies)
+                self.form_cache.put(self.base_url, location)
+                return soup
             
             # If none of the specific URLs work, try the main page
             response = self.session.get(self.base_url, timeout=30)
@@ -467,6 +479,7 @@ class DelhiHighCourtScraper:
             # Fallback to requests-based approach
             form_info = self.find_search_form(soup)
             if not form_info:
+                self.form_cache.invalidate(self.base_url)
                 return {
                     'status': 'error',
                     'error_message': 'No search form found on the portal',
@@ -510,6 +523,8 @@ class DelhiHighCourtScraper:
                     'error_message': None
                 }
             else:
+                # The cached form may have moved; look for it again next time
+                self.form_cache.invalidate(self.base_url)
                 return {
                     'status': 'error',
                     'error_message': f'Search request failed with status code: {response.status_code}',
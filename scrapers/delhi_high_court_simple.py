@@ -1,4 +1,5 @@
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import re
 from bs4 import BeautifulSoup
@@ -14,6 +15,12 @@ import pytesseract
 import cv2
 import numpy as np
 import html
+import threading
+
+from utils.http_cache import HTTPValidatorCache, PortalResponse
+from utils.retry import RetryPolicy
+from utils.form_discovery import (CANDIDATE_PATHS, FormDiscoveryCache, FormLocation, probe_concurrently,
+                                  probe_status_page)
 
 # Configure Tesseract path for Windows
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
@@ -21,13 +28,42 @@ pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tessera
 class DelhiHighCourtSimpleScraper:
     """Simplified scraper for Delhi High Court case status portal with CAPTCHA handling"""
     
-    def __init__(self, base_url: str = "https://dhcmisc.nic.in"):
-        self.base_url = base_url
-        self.case_search_url = "https://dhcmisc.nic.in/pcase/guiCaseWise.php"
-        self.session = requests.Session()
-        self.setup_session()
+    def __init__(self, base_url: str = "https://dhcmisc.nic.in", pool_maxsize: int = 50,
+                 http_cache: Optional[HTTPValidatorCache] = None, form_cache_ttl: float = 3600,
+                 probe_timeout: float = 30, retry_policy: Optional[RetryPolicy] = None):
+        self.base_url = base_url.rstrip('/')
+        self.case_search_url = f"{self.base_url}/pcase/guiCaseWise.php"
+        self.case_history_url = f"{self.base_url}/pcase/case_history.php"
+        # Static portal pages are revalidated instead of downloaded again;
+        # without a cache file every GET is a plain one
+        self.http_cache = http_cache or HTTPValidatorCache(None)
+        self._parsed_pages: Dict[str, tuple] = {}  # url -> (body sha256, soup)
+        # Where the search form was found, so lookups skip the candidate walk;
+        # search_case() posts to the fixed pcase endpoints and does not use it
+        self.form_cache = FormDiscoveryCache(ttl=form_cache_ttl)
+        self.probe_timeout = probe_timeout
+        # Transient network errors are retried within one deadline per lookup
+        self.retry_policy = retry_policy or RetryPolicy()
+        
+        # One connection pool shared by every session; cookies stay per thread
+        # (per greenlet under gevent) so concurrent searches never share a
+        # portal session or CAPTCHA state.
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        self._local = threading.local()
+    
+    @property
+    def session(self) -> requests.Session:
+        """Session bound to the current thread or greenlet"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', self._adapter)
+            session.mount('https://', self._adapter)
+            self.setup_session(session)
+            self._local.session = session
+        return session
         
-    def setup_session(self):
+    def setup_session(self, session: requests.Session):
         """Setup session with proper headers and cookies"""
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -42,7 +78,27 @@ class DelhiHighCourtSimpleScraper:
             'Sec-Fetch-User': '?1',
             'Cache-Control': 'max-age=0',
         }
-        self.session.headers.update(headers)
+        session.headers.update(headers)
+    
+    def fetch_page(self, url: str, timeout: float = 30, max_age: Optional[float] = None) -> PortalResponse:
+        """
+        GET a page through the validator cache (conditional request, or served
+        locally within max_age). Not for CAPTCHA or search pages, whose
+        content belongs to this session.
+        """
+        return self.retry_policy.call(
+            lambda remaining: self.http_cache.fetch(self.session, url, timeout=remaining, max_age=max_age),
+            timeout=timeout, description=f'GET {url}')
+    
+    def _parse_page(self, response: PortalResponse) -> BeautifulSoup:
+        """Parse a fetched page, reusing the last tree when its body has not changed"""
+        parsed = self._parsed_pages.get(response.url)
+        if response.sha256 is not None and parsed is not None and parsed[0] == response.sha256:
+            return parsed[1]
+        soup = BeautifulSoup(response.content, 'html.parser')
+        if response.sha256 is not None:
+            self._parsed_pages[response.url] = (response.sha256, soup)
+        return soup
     
     def solve_captcha(self, captcha_image_data: bytes) -> str:
         """Solve CAPTCHA using Tesseract OCR with image preprocessing"""
@@ -97,7 +153,7 @@ class DelhiHighCourtSimpleScraper:
             logging.error(f"Error solving CAPTCHA: {e}")
             return ""
     
-    def get_captcha_image(self, soup: BeautifulSoup) -> Optional[bytes]:
+    def get_captcha_image(self, soup: BeautifulSoup, deadline: Optional[float] = None) -> Optional[bytes]:
         """Extract CAPTCHA image from the page"""
         try:
             # Look for CAPTCHA image with common patterns
@@ -124,7 +180,9 @@ class DelhiHighCourtSimpleScraper:
                             src = urljoin(self.base_url, src)
                         
                         # Download CAPTCHA image
-                        response = self.session.get(src, timeout=10)
+                        response = self.retry_policy.call(
+                            lambda timeout: self.session.get(src, timeout=timeout),
+                            timeout=10, deadline=deadline, description='CAPTCHA request')
                         if response.status_code == 200:
                             return response.content
             
@@ -176,46 +234,50 @@ class DelhiHighCourtSimpleScraper:
             logging.error(f"Error finding search form: {e}")
             return None
     
+    def _probe_status_page(self, url: str) -> Optional[tuple]:
+        """probe_status_page() through the validator cache, in this thread's session"""
+        return probe_status_page(url, lambda page_url: self.fetch_page(page_url, timeout=self.probe_timeout),
+                                 self._parse_page, self.find_search_form)
+    
+    def _discover_status_page(self) -> Optional[tuple]:
+        """(FormLocation, soup) of the case status page, from the form cache when possible"""
+        location = self.form_cache.get(self.base_url)
+        if location is not None:
+            try:
+                probed = self._probe_status_page(location.page_url)
+            except Exception as e:
+                logging.warning(f"Failed to access {location.page_url}: {e}")
+                probed = None
+            if probed is not None and probed[1][0] == location:
+                return probed[1]
+            logging.info(f"Search form at {location.page_url} changed or is gone, probing again")
+            self.form_cache.invalidate(self.base_url)
+        
+        # Cold cache: every candidate at once, so the worst case is one
+        # timeout rather than one per candidate
+        found = probe_concurrently(self._probe_status_page,
+                                   [f"{self.base_url}{path}" for path in CANDIDATE_PATHS],
+                                   timeout=self.probe_timeout + 5)
+        if found is not None:
+            location = found[0]
+            logging.info(f"Found {'search form' if location.action_url else 'court-related page'} "
+                         f"at: {location.page_url}")
+            self.form_cache.put(self.base_url, location)
+        return found
+    
+    def get_search_form(self) -> Optional[FormLocation]:
+        """Location, action URL and field names of the portal's search form (cached)"""
+        location = self.form_cache.get(self.base_url)
+        if location is None:
+            found = self._discover_status_page()
+            location = found[0] if found else None
+        return location
+    
     def get_case_status_page(self) -> Optional[BeautifulSoup]:
         """Get the case status search page"""
         try:
-            # Try different possible URLs for case status
-            urls_to_try = [
-                f"{self.base_url}/case_status",
-                f"{self.base_url}/case-status",
-                f"{self.base_url}/case_status.asp",
-                f"{self.base_url}/case_status.php",
-                f"{self.base_url}/case_status.html",
-                f"{self.base_url}/search",
-                f"{self.base_url}/case-search",
-                f"{self.base_url}/status",
-                f"{self.base_url}/"
-            ]
-            
-            for url in urls_to_try:
-                try:
-                    logging.info(f"Trying URL: {url}")
-                    response = self.session.get(url, timeout=30)
-                    if response.status_code == 200:
-                        soup = BeautifulSoup(response.content, 'html.parser')
-                        
-                        # Check if this page has a search form
-                        form_info = self.find_search_form(soup)
-                        if form_info:
-                            logging.info(f"Found search form at: {url}")
-                            return soup
-                        
-                        # Also check if it's a general court page that might have navigation
-                        if any(keyword in response.text.lower() for keyword in ['case', 'search', 'status', 'court']):
-                            logging.info(f"Found court-related page at: {url}")
-                            return soup
-                            
-                except Exception as e:
-                    logging.warning(f"Failed to access {url}: {e}")
-                    continue
-            
-            return None
-                
+            found = self._discover_status_page()
+            return found[1] if found else None
         except Exception as e:
             logging.error(f"Error getting case status page: {str(e)}")
         
@@ -228,9 +290,13 @@ class DelhiHighCourtSimpleScraper:
         """
         try:
             logging.info(f"Starting search for: {case_type} {case_number}/{filing_year}")
+            # Retries of every request below share one latency budget
+            deadline = self.retry_policy.new_deadline()
             
             # Get the case search page
-            response = self.session.get(self.case_search_url, timeout=15)
+            response = self.retry_policy.call(
+                lambda timeout: self.session.get(self.case_search_url, timeout=timeout),
+                timeout=15, deadline=deadline, description='Case search page')
             if response.status_code != 200:
                 logging.error(f"Failed to access case search page: {response.status_code}")
                 return {
@@ -244,7 +310,7 @@ class DelhiHighCourtSimpleScraper:
             
             # Find and solve CAPTCHA if present
             captcha_text = None
-            captcha_image = self.get_captcha_image(soup)
+            captcha_image = self.get_captcha_image(soup, deadline)
             if captcha_image:
                 logging.info("CAPTCHA found, attempting to solve...")
                 captcha_text = self.solve_captcha(captcha_image)
@@ -269,13 +335,17 @@ class DelhiHighCourtSimpleScraper:
             logging.info(f"Submitting search with data: {form_data}")
             
             # Submit the search form to the correct action URL
-            search_url = "https://dhcmisc.nic.in/pcase/case_history.php"
-            search_response = self.session.post(
-                search_url,
-                data=form_data,
-                timeout=20,
-                allow_redirects=True
-            )
+            search_url = self.case_history_url
+            # Not idempotent for the portal (the CAPTCHA is spent), so only
+            # retried when the request never got through
+            search_response = self.retry_policy.call(
+                lambda timeout: self.session.post(
+                    search_url,
+                    data=form_data,
+                    timeout=timeout,
+                    allow_redirects=True
+                ),
+                timeout=20, idempotent=False, deadline=deadline, description='Case search')
             
             if search_response and search_response.status_code == 200:
                 logging.info(f"Search response received, length: {len(search_response.text)}")
@@ -424,14 +494,13 @@ class DelhiHighCourtSimpleScraper:
             if case_data['njdg_link']:
                 try:
                     logging.info(f"Attempting to fetch detailed case information from NJDG...")
-                    njdg_response = self.session.get(case_data['njdg_link'], timeout=15)
+                    # Revalidated rather than downloaded again on later searches
+                    njdg_response = self.fetch_page(case_data['njdg_link'], timeout=15, max_age=0)
                     if njdg_response.status_code == 200:
-                        njdg_soup = BeautifulSoup(njdg_response.text, 'html.parser')
-                        
-                        # Extract more detailed information from NJDG
-                        # This would contain petitioner, respondent, case details, etc.
+                        # Nothing is extracted from NJDG yet, so the page is not parsed
                         case_data['njdg_data_available'] = True
-                        logging.info("Successfully fetched NJDG data")
+                        logging.info("Successfully fetched NJDG data" +
+                                     (" (not modified)" if njdg_response.unchanged else ""))
                     else:
                         logging.warning(f"NJDG request failed: {njdg_response.status_code}")
                 except Exception as e:
@@ -695,11 +764,14 @@ class DelhiHighCourtSimpleScraper:
     def get_portal_status(self) -> Dict[str, Any]:
         """Get portal status and information"""
         try:
-            response = self.session.get(self.base_url, timeout=10)
+            # Always asks the portal, but an unchanged home page costs a 304.
+            # Not retried: a status check should report failures, not hide them
+            response = self.http_cache.fetch(self.session, self.base_url, timeout=10, max_age=0)
             
             return {
                 'accessible': response.status_code == 200,
                 'status_code': response.status_code,
+                'not_modified': response.not_modified,
                 'response_time': response.elapsed.total_seconds(),
                 'last_checked': datetime.now().isoformat()
             }
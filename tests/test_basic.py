@@ -7,7 +7,7 @@ from flask import Flask
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import create_app
-from models.database import db, Query, Download
+from models.database import db, Query, Download, Case, upsert_case
 from utils.validators import validate_case_number, validate_filing_year, validate_case_type
 from utils.pdf_handler import PDFHandler
 
@@ -65,6 +65,162 @@ class TestBasicFunctionality:
         assert data['status'] == 'success'
         assert 'history' in data
 
+class TestSearchHistoryPagination:
+    """Test cursor-based search history pagination."""
+    
+    def _add_queries(self, count):
+        from datetime import datetime, timedelta
+        start = datetime(2024, 1, 1)
+        for i in range(count):
+            db.session.add(Query(case_type="WP(C)", case_number=str(100 + i), filing_year=2024,
+                                 status="success" if i % 2 else "error",
+                                 query_timestamp=start + timedelta(minutes=i)))
+        db.session.commit()
+    
+    def test_api_cursor_mode_walks_all_rows(self, app, client):
+        """Test that next cursors visit every row once, newest first."""
+        self._add_queries(25)
+        
+        seen, cursor = [], None
+        for _ in range(5):
+            params = {'mode': 'cursor', 'per_page': 10}
+            if cursor:
+                params['cursor'] = cursor
+            data = client.get('/api/search-history', query_string=params).get_json()
+            assert data['status'] == 'success'
+            seen.extend(entry['case_number'] for entry in data['history'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        
+        assert seen == [str(100 + i) for i in reversed(range(25))]
+    
+    def test_api_prev_cursor_returns_previous_page(self, app, client):
+        """Test that a prev cursor returns the page before."""
+        self._add_queries(25)
+        
+        first = client.get('/api/search-history?mode=cursor&per_page=10&include_total=approx').get_json()
+        second = client.get('/api/search-history', query_string={
+            'per_page': 10, 'cursor': first['next_cursor']}).get_json()
+        back = client.get('/api/search-history', query_string={
+            'per_page': 10, 'cursor': second['prev_cursor']}).get_json()
+        
+        assert first['prev_cursor'] is None
+        assert first['approx_total'] == 25
+        assert back['history'] == first['history']
+    
+    def test_api_invalid_cursor(self, client):
+        """Test that a tampered cursor is rejected."""
+        response = client.get('/api/search-history?cursor=not-a-cursor')
+        assert response.status_code == 400
+    
+    def test_history_page_cursor_links(self, app, client):
+        """Test that the HTML history page renders older/newer links."""
+        self._add_queries(25)
+        
+        response = client.get('/search-history')
+        assert response.status_code == 200
+        assert b'cursor=' in response.data
+        assert b'Older' in response.data
+        assert b'~25</h4>' in response.data
+
+class TestSearchHistoryExport:
+    """Test page-size limits and streaming history export."""
+    
+    def test_api_rejects_oversized_pages(self, app, client):
+        """Test that per_page above the configured cap is rejected."""
+        max_per_page = app.config['HISTORY_MAX_PER_PAGE']
+        
+        assert client.get(f'/api/search-history?per_page={max_per_page}').status_code == 200
+        assert client.get(f'/api/search-history?per_page={max_per_page + 1}').status_code == 400
+        assert client.get('/api/search-history?per_page=0&mode=cursor').status_code == 400
+    
+    def test_export_ndjson_and_csv(self, app, client):
+        """Test that both export formats stream every row."""
+        import csv, io, json
+        for i in range(3):
+            db.session.add(Query(case_type="LPA", case_number=f"{i}/2023", filing_year=2023, status="success"))
+        db.session.commit()
+        
+        response = client.get('/api/search-history/export')
+        assert response.mimetype == 'application/x-ndjson'
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [record['case_number'] for record in records] == ['0/2023', '1/2023', '2/2023']
+        
+        response = client.get('/api/search-history/export?format=csv')
+        assert 'attachment' in response.headers['Content-Disposition']
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        assert len(rows) == 3
+        assert rows[0]['case_type'] == 'LPA'
+    
+    def test_export_rejects_unknown_format(self, client):
+        """Test that unsupported export formats are rejected."""
+        assert client.get('/api/search-history/export?format=xml').status_code == 400
+
+class TestWriteBehind:
+    """Test background batching of audit writes."""
+    
+    def test_flush_commits_queued_inserts(self, app):
+        """Test that queued inserts are committed in batches on flush."""
+        from models.write_behind import WriteBehindQueue
+        
+        queue = WriteBehindQueue(app, batch_size=10).start()
+        for i in range(25):
+            queue.add(Query(case_type="CM", case_number=f"{i}/2024", filing_year=2024, status="error"))
+        assert queue.flush(timeout=10)
+        queue.stop()
+        
+        with app.app_context():
+            assert Query.query.filter_by(case_type="CM").count() == 25
+        assert queue.stats['written'] == 25
+        assert queue.stats['batches'] >= 3
+    
+    def test_full_queue_falls_back_to_sync_write(self, app):
+        """Test backpressure: a saturated queue writes in the caller."""
+        from models.write_behind import WriteBehindQueue
+        
+        queue = WriteBehindQueue(app, max_pending=1, enqueue_timeout=0.01)
+        queue._thread = object()  # pretend running, but nothing drains the queue
+        queue.add(Query(case_type="CM", case_number="1/2024", filing_year=2024))
+        queue.add(Query(case_type="CM", case_number="2/2024", filing_year=2024))
+        
+        with app.app_context():
+            assert Query.query.filter_by(case_type="CM").count() == 1
+        assert queue.stats['sync_fallbacks'] == 1
+    
+    def test_failed_search_recorded_in_background(self, app, client, monkeypatch):
+        """Test that a failed search is stored without a synchronous commit."""
+        monkeypatch.setattr('app.DelhiHighCourtScraper.search_case', lambda self, *args: {
+            'status': 'error', 'error_message': 'Portal down', 'case_data': None})
+        
+        response = client.post('/fetch-case', data={
+            'case_type': 'LPA', 'case_number': '123/2023', 'filing_year': '2023'})
+        assert response.status_code == 302
+        
+        app.extensions['write_behind'].flush(timeout=10)
+        with app.app_context():
+            query = Query.query.filter_by(case_type='LPA').one()
+            assert query.status == 'error'
+            assert query.error_message == 'Portal down'
+    
+    def test_successful_search_written_before_render(self, app, client, monkeypatch):
+        """Test that a successful search is committed so the page can show its id."""
+        monkeypatch.setattr('app.DelhiHighCourtScraper.search_case', lambda self, *args: {
+            'status': 'success', 'case_data': {'case_id': 'LPA/1/2023', 'orders': [],
+                                               'case_type': 'LPA', 'case_number': '1',
+                                               'filing_year': 2023,
+                                               'last_updated': '2024-01-01T10:00:00'}})
+        
+        response = client.post('/fetch-case', data={
+            'case_type': 'LPA', 'case_number': '1/2023', 'filing_year': '2023'})
+        assert response.status_code == 200
+        
+        with app.app_context():
+            query = Query.query.filter_by(case_type='LPA').one()
+            assert query.status == 'success'
+            assert query.case.case_key == 'LPA/1/2023'
+            assert f'Query ID:</strong> {query.id}'.encode() in response.data
+
 class TestValidation:
     """Test input validation functions."""
     
@@ -206,6 +362,391 @@ class TestDatabase:
             assert download.pdf_url == "https://example.com/document.pdf"
             assert download.file_size == 1024
 
+    def test_upgrade_schema_adds_missing_indexes(self, app):
+        """Test that indexes are built on tables created before they were declared."""
+        from sqlalchemy import inspect, text
+        from models.database import upgrade_schema
+        
+        with app.app_context():
+            db.session.execute(text('DROP INDEX ix_queries_query_timestamp'))
+            db.session.commit()
+            
+            upgrade_schema()
+            
+            index_names = {index['name'] for index in inspect(db.engine).get_indexes('queries')}
+            assert 'ix_queries_query_timestamp' in index_names
+            assert 'ix_queries_case' in index_names
+
+    def test_upgrade_schema_tolerates_concurrent_upgrade(self, app, monkeypatch):
+        """Test that a column or index another worker added first is not an error."""
+        from sqlalchemy import Index
+        from sqlalchemy.engine.reflection import Inspector
+        from models.database import upgrade_schema
+
+        # Stale view: this worker inspected the tables before another one upgraded them
+        get_columns = Inspector.get_columns
+        monkeypatch.setattr(Inspector, 'get_columns', lambda self, table, **kw: [
+            column for column in get_columns(self, table, **kw) if column['name'] != 'content_hash'])
+        create_index = Index.create
+        monkeypatch.setattr(Index, 'create', lambda index, bind, checkfirst=False: create_index(index, bind))
+        with app.app_context():
+            upgrade_schema()
+
+    def test_sqlite_pragma_profile(self):
+        """Test PRAGMA profile selection and overrides."""
+        from models.database import load_sqlite_pragmas
+        
+        pragmas = load_sqlite_pragmas({'SQLITE_BUSY_TIMEOUT': '10000'})
+        assert pragmas['journal_mode'] == 'WAL'
+        assert pragmas['busy_timeout'] == '10000'
+        assert load_sqlite_pragmas({'SQLITE_PRAGMA_PROFILE': 'legacy'}) == {}
+        with pytest.raises(ValueError):
+            load_sqlite_pragmas({'SQLITE_PRAGMA_PROFILE': 'fast'})
+    
+    def test_sqlite_pragmas_applied_on_connect(self, app):
+        """Test that the configured pragmas are set on new connections."""
+        from sqlalchemy import text
+        
+        with app.app_context():
+            busy_timeout = db.session.execute(text('PRAGMA busy_timeout')).scalar()
+            assert busy_timeout == int(app.config['SQLITE_PRAGMAS']['busy_timeout'])
+
+class TestRetention:
+    """Test archiving of old queries, downloads and files."""
+
+    def test_archives_old_rows_and_files(self, app, tmp_path):
+        """Test that expired queries move to monthly archives with their PDFs."""
+        from datetime import datetime
+        from models.retention import RetentionJob, read_archive
+
+        download_folder = tmp_path / 'downloads'
+        download_folder.mkdir()
+        old_pdf = download_folder / 'old.pdf'
+        old_pdf.write_bytes(b'%PDF-1.4')
+
+        old = Query(case_type="WP(C)", case_number="1", filing_year=2022, status='success',
+                    query_timestamp=datetime(2023, 1, 5))
+        old.set_response_data({'case_id': 'WP(C)-1/2022'})
+        recent = Query(case_type="WP(C)", case_number="2", filing_year=2024, status='success',
+                       query_timestamp=datetime(2024, 6, 1))
+        db.session.add_all([old, recent])
+        db.session.commit()
+        db.session.add_all([
+            Download(query_id=old.id, pdf_url='https://example/old.pdf', local_path=str(old_pdf),
+                     filename='old.pdf', status='success'),
+            Download(query_id=recent.id, pdf_url='https://example/gone.pdf',
+                     local_path=str(download_folder / 'gone.pdf'), filename='gone.pdf', status='success',
+                     download_timestamp=datetime(2024, 6, 1)),
+        ])
+        db.session.commit()
+
+        job = RetentionJob(app, str(tmp_path / 'archive'), str(download_folder),
+                           retention_days=365, batch_size=1, pause=0)
+        result = job.run_once(now=datetime(2024, 7, 1))
+
+        assert result == {'queries_archived': 1, 'downloads_archived': 2, 'files_deleted': 1}
+        assert not old_pdf.exists()
+        assert [query.case_number for query in Query.query.all()] == ['2']
+        assert db.session.query(Download).count() == 0
+
+        archived = list(read_archive(str(tmp_path / 'archive' / 'queries-2023-01.ndjson.gz')))
+        assert archived[0]['response_data'] == {'case_id': 'WP(C)-1/2022'}
+        assert archived[0]['downloads'][0]['filename'] == 'old.pdf'
+        assert len(list(read_archive(str(tmp_path / 'archive' / 'downloads-2024-06.ndjson.gz')))) == 1
+
+        # Nothing left to do on a second run
+        assert job.run_once(now=datetime(2024, 7, 1)) == {
+            'queries_archived': 0, 'downloads_archived': 0, 'files_deleted': 0}
+
+    def test_missing_file_scan_resumes_across_runs(self, app, tmp_path):
+        """Test that each run checks a bounded slice of downloads, continuing where the last stopped."""
+        from datetime import datetime
+        from models.retention import RetentionJob
+
+        download_folder = tmp_path / 'downloads'
+        download_folder.mkdir()
+        kept = download_folder / 'kept.pdf'
+        kept.write_bytes(b'%PDF-1.4')
+        query = Query(case_type="WP(C)", case_number="2", filing_year=2024, status='success',
+                      query_timestamp=datetime(2024, 6, 1))
+        db.session.add(query)
+        db.session.commit()
+        db.session.add_all([
+            Download(query_id=query.id, pdf_url='https://example/kept.pdf', local_path=str(kept),
+                     filename='kept.pdf', status='success'),
+            Download(query_id=query.id, pdf_url='https://example/gone.pdf',
+                     local_path=str(download_folder / 'gone.pdf'), filename='gone.pdf', status='success'),
+        ])
+        db.session.commit()
+
+        job = RetentionJob(app, str(tmp_path / 'archive'), str(download_folder),
+                           retention_days=365, batch_size=1, max_batches=1, pause=0)
+        assert job.run_once(now=datetime(2024, 7, 1))['downloads_archived'] == 0
+        assert job.run_once(now=datetime(2024, 7, 1))['downloads_archived'] == 1
+        assert [download.filename for download in db.session.query(Download).all()] == ['kept.pdf']
+
+    def test_deleted_blobs_leave_fulltext_index(self, app, tmp_path):
+        """Test that blobs deleted by retention are removed from the full-text index."""
+        from datetime import datetime
+        from models.database import PdfBlob, PdfSource
+        from models.fulltext import FullTextIndex
+        from models.retention import RetentionJob
+
+        download_folder = tmp_path / 'downloads'
+        download_folder.mkdir()
+        digest = 'a' * 64
+        blob = download_folder / f'{digest}.pdf'
+        blob.write_bytes(b'%PDF-1.4')
+        index = FullTextIndex(str(tmp_path / 'fulltext.db'))
+        index.add_document(digest, ['Bail granted'])
+
+        old = Query(case_type="WP(C)", case_number="1", filing_year=2022, status='success',
+                    query_timestamp=datetime(2023, 1, 5))
+        db.session.add_all([old, PdfBlob(digest=digest, file_size=8)])
+        db.session.commit()
+        db.session.add_all([
+            Download(query_id=old.id, pdf_url='https://example/old.pdf', local_path=str(blob),
+                     filename='old.pdf', status='success', digest=digest),
+            PdfSource(url='https://example/old.pdf', digest=digest, filename='old.pdf'),
+        ])
+        db.session.commit()
+
+        job = RetentionJob(app, str(tmp_path / 'archive'), str(download_folder),
+                           retention_days=365, pause=0, fulltext_index=index)
+        assert job.run_once(now=datetime(2024, 7, 1))['files_deleted'] == 1
+        assert index.indexed([digest]) == set()
+        assert index.search('bail') == []
+
+class TestCaseStorage:
+    """Test normalized case, party, order and hearing storage."""
+    
+    CASE_DATA = {
+        'case_id': 'WP(C)-623/2024',
+        'case_type': 'WP(C)',
+        'case_number': '623',
+        'filing_year': '2024',
+        'cnr_number': '',
+        'petitioners': ['Petitioner A'],
+        'respondents': ['State of Delhi', 'Union of India'],
+        'filing_date': '15/01/2024',
+        'next_hearing_date': '20/02/2024',
+        'case_status': 'PENDING',
+        'orders': [{'title': 'Order dated 15/01/2024', 'date': '15/01/2024', 'type': 'Order',
+                    'pdf_url': 'https://example.nic.in/order1.pdf', 'description': ''}],
+    }
+    
+    def test_upsert_deduplicates_and_accumulates_hearings(self, app):
+        """Test that repeat results update one case and keep hearing history."""
+        from datetime import date
+        
+        with app.app_context():
+            first = upsert_case(self.CASE_DATA)
+            db.session.commit()
+            
+            later = dict(self.CASE_DATA, next_hearing_date='05/03/2024', respondents=['State of Delhi'])
+            second = upsert_case(later)
+            db.session.commit()
+            
+            assert second.id == first.id
+            assert Case.query.count() == 1
+            assert second.next_hearing_on == date(2024, 3, 5)
+            assert second.to_dict()['respondents'] == ['State of Delhi']
+            assert [h.hearing_on for h in second.hearings] == [date(2024, 2, 20), date(2024, 3, 5)]
+            assert second.orders[0].pdf_url == 'https://example.nic.in/order1.pdf'
+    
+    def test_unchanged_results_are_not_rewritten(self, app):
+        """Test that only results whose content hash changed are stored and diffed."""
+        from models.database import CaseChange, apply_case_data
+        from utils.change_detection import content_hash
+        
+        assert content_hash(dict(self.CASE_DATA, last_updated='2024-01-01')) == \
+            content_hash(dict(self.CASE_DATA, case_status=' PENDING ', last_updated='2024-02-01'))
+        assert content_hash(dict(self.CASE_DATA, njdg_data_available=True)) == content_hash(self.CASE_DATA)
+        with app.app_context():
+            first = apply_case_data(dict(self.CASE_DATA, last_updated='2024-01-01T10:00:00'))
+            db.session.commit()
+            assert first.changed and first.changes == []
+            order_ids = [order.id for order in first.case.orders]
+            
+            same = apply_case_data(dict(self.CASE_DATA, last_updated='2024-01-02T10:00:00'))
+            assert not same.changed and not db.session.dirty and not db.session.new
+            
+            orders = self.CASE_DATA['orders'] + [{'title': 'Judgment', 'date': '01/03/2024'}]
+            update = apply_case_data(dict(self.CASE_DATA, case_status='DISPOSED', orders=orders))
+            db.session.commit()
+            assert sorted((change.field, change.old_value, change.new_value) for change in update.changes) == [
+                ('case_status', 'PENDING', 'DISPOSED'), ('order', None, 'Judgment 01/03/2024')]
+            assert CaseChange.query.filter_by(case_id=first.case.id, source='search').count() == 2
+            assert [order.id for order in update.case.orders] != order_ids
+    
+    def test_repeat_search_stores_no_payload(self, app, client, monkeypatch):
+        """Test that an unchanged repeat search keeps only the hash and is shown from another query."""
+        case_data = dict(self.CASE_DATA, last_updated='2024-01-01T10:00:00')
+        monkeypatch.setattr('app.DelhiHighCourtScraper.search_case', lambda scraper, *args: {
+            'status': 'success', 'case_data': dict(case_data)})
+        for _ in range(2):
+            assert client.post('/fetch-case', data={
+                'case_type': 'LPA', 'case_number': '1/2023', 'filing_year': '2023'}).status_code == 200
+        
+        with app.app_context():
+            first, repeat = Query.query.order_by(Query.id).all()
+            assert first.has_response_data and not repeat.has_response_data
+            assert repeat.content_hash == first.content_hash and repeat.payload_query_id == first.id
+            repeat_id = repeat.id
+        assert b'Order dated 15/01/2024' in client.get(f'/result/{repeat_id}').data
+    
+    def test_archiving_the_payload_query_hands_it_on(self, app, client, monkeypatch, tmp_path):
+        """Test that repeats keep the exact result after retention archives the query holding it."""
+        from datetime import datetime
+        from models.database import stored_result
+        from models.retention import RetentionJob
+        case_data = dict(self.CASE_DATA, case_id='WP(C)-623/2024', njdg_data_available=True,
+                         last_updated='2024-01-01T10:00:00')
+        monkeypatch.setattr('app.DelhiHighCourtScraper.search_case', lambda scraper, *args: {
+            'status': 'success', 'case_data': dict(case_data)})
+        for _ in range(3):
+            assert client.post('/fetch-case', data={
+                'case_type': 'LPA', 'case_number': '1/2023', 'filing_year': '2023'}).status_code == 200
+        
+        with app.app_context():
+            first, second, third = Query.query.order_by(Query.id).all()
+            first.query_timestamp = datetime(2020, 1, 1)
+            db.session.commit()
+            job = RetentionJob(app, str(tmp_path / 'archive'), str(tmp_path), pause=0)
+            assert job.run_once()['queries_archived'] == 1
+            
+        with app.app_context():
+            second, third = Query.query.order_by(Query.id).all()
+            assert third.has_response_data and second.payload_query_id == third.id
+            assert stored_result(third) == stored_result(second) == case_data
+    
+    def test_unchanged_search_still_prefetches_missing_orders(self, app, client, monkeypatch):
+        """Test that a repeat search queues orders again, so a failed prefetch is retried."""
+        case_data = dict(self.CASE_DATA)
+        monkeypatch.setattr('app.DelhiHighCourtScraper.search_case', lambda scraper, *args: {
+            'status': 'success', 'case_data': dict(case_data)})
+        queued = []
+        monkeypatch.setattr(app.extensions['pdf_prefetcher'], 'prefetch', queued.append)
+        app.config['PDF_PREFETCH_ENABLED'] = True
+        
+        for _ in range(2):
+            client.post('/fetch-case', data={'case_type': 'LPA', 'case_number': '1/2023', 'filing_year': '2023'})
+        assert queued == [case_data['orders'], case_data['orders']]
+    
+    def test_cnr_number_takes_precedence(self, app):
+        """Test that cases with a CNR number are keyed by it."""
+        with app.app_context():
+            case = upsert_case(dict(self.CASE_DATA, cnr_number='dlhc010012342024'))
+            assert case.case_key == 'DLHC010012342024'
+    
+    def test_api_hearings_by_date(self, app, client):
+        """Test listing cases by next hearing date through the index."""
+        with app.app_context():
+            upsert_case(self.CASE_DATA)
+            db.session.commit()
+        
+        data = client.get('/api/cases/hearings?date=2024-02-20').get_json()
+        assert [case['case_key'] for case in data['cases']] == ['WP(C)/623/2024']
+        assert client.get('/api/cases/hearings?date=2024-02-21').get_json()['cases'] == []
+        assert client.get('/api/cases/hearings?date=tomorrow').status_code == 400
+
+class TestSerialization:
+    """Test the pluggable JSON serializer."""
+    
+    @pytest.mark.parametrize('backend', ['json', 'orjson'])
+    def test_backends_round_trip(self, backend):
+        """Test that every backend encodes the same values the same way."""
+        from datetime import datetime
+        from utils import serialization
+        
+        if backend == 'orjson' and serialization.orjson is None:
+            pytest.skip('orjson not installed')
+        previous = serialization.get_backend()
+        serialization.set_backend(backend)
+        try:
+            data = {'case_id': 'WP(C)-1/2024', 'seen': datetime(2024, 1, 2, 3, 4, 5), 1: 'x'}
+            decoded = serialization.loads(serialization.dumps(data))
+            assert decoded == {'case_id': 'WP(C)-1/2024', 'seen': '2024-01-02T03:04:05', '1': 'x'}
+        finally:
+            serialization.set_backend(previous)
+    
+    def test_response_data_decoded_lazily_and_cached(self, app):
+        """Test that case_data decodes once and tracks new values."""
+        with app.app_context():
+            query = Query(case_type="LPA", case_number="1/2023", filing_year=2023)
+            query.set_response_data({'case_id': 'LPA/1/2023'})
+            
+            assert query.case_data is query.case_data
+            query.set_response_data({'case_id': 'LPA/2/2023'})
+            assert query.case_data['case_id'] == 'LPA/2/2023'
+            assert query.to_dict()['response_data'] == {'case_id': 'LPA/2/2023'}
+
+class TestCompression:
+    """Test compressed storage of search results."""
+
+    PAYLOAD = {'case_id': 'WP(C)-623/2024', 'orders': [{'title': 'Order dated 01/01/2024'}] * 20}
+
+    @pytest.fixture(autouse=True)
+    def reset_dictionaries(self):
+        from models import database
+        database._dictionary_cache.clear()
+        database._active_dictionary_cache.clear()
+
+    def test_codec_round_trip(self):
+        """Test zlib round trip with and without a preset dictionary."""
+        from utils import compression
+
+        text = 'Listed before the Hon\'ble Court. ' * 50
+        dictionary = compression.train_dictionary([text.encode('utf-8')], 'zlib')
+        plain = compression.compress(text, 'zlib')
+        primed = compression.compress(text, 'zlib', dictionary=dictionary, dict_id=7)
+
+        assert compression.read_header(primed) == ('zlib', 7)
+        assert len(primed) < len(plain) < len(text)
+        assert compression.decompress(plain) == text
+        assert compression.decompress(primed, dictionary) == text
+        with pytest.raises(ValueError):
+            compression.decompress(primed)
+        assert not compression.is_compressed(text)
+
+    def test_compressed_response_round_trip(self, app):
+        """Test that results are stored compressed and read back transparently."""
+        app.config['RESPONSE_COMPRESSION'] = 'zlib'
+        with app.app_context():
+            query = Query(case_type="WP(C)", case_number="623", filing_year=2024, status='success')
+            query.set_response_data(self.PAYLOAD)
+            db.session.add(query)
+            db.session.commit()
+            query_id = query.id
+            db.session.expunge_all()
+
+            stored = db.session.get(Query, query_id)
+            assert stored.response_data is None
+            assert stored.response_blob.startswith(b'\xcd')
+            assert stored.case_data == self.PAYLOAD
+
+    def test_recompress_existing_rows(self, app):
+        """Test converting plain rows with a trained dictionary."""
+        from models.database import train_compression_dictionary, recompress_responses
+
+        with app.app_context():
+            for number in range(5):
+                query = Query(case_type="WP(C)", case_number=str(number), filing_year=2024, status='success')
+                query.set_response_data(dict(self.PAYLOAD, case_number=str(number)))
+                db.session.add(query)
+            db.session.commit()
+
+            app.config['RESPONSE_COMPRESSION'] = 'zlib'
+            dictionary_id = train_compression_dictionary('zlib').id
+            stats = recompress_responses(batch_size=2)
+
+            assert stats['scanned'] == stats['rewritten'] == 5
+            assert stats['bytes_after'] < stats['bytes_before']
+            assert Query.query.filter(Query.response_data.isnot(None)).count() == 0
+            query = Query.query.filter_by(case_number='3').one()
+            assert query.case_data['case_number'] == '3'
+            assert int.from_bytes(query.response_blob[2:6], 'big') == dictionary_id
+
 class TestPDFHandler:
     """Test PDF handler functionality."""
     
@@ -239,5 +780,1063 @@ class TestPDFHandler:
         
         assert not handler.is_valid_pdf(str(txt_file))
 
+class FakePDFResponse:
+    """Minimal streamed response for tests that download PDFs."""
+    
+    headers = {'content-type': 'application/pdf'}
+    
+    def __init__(self, body):
+        self.body = body
+    
+    def raise_for_status(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def iter_content(self, chunk_size=8192):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+class TestPDFStore:
+    """Test the content-addressed PDF store."""
+    
+    BODY = b'%PDF-1.4\n' + b'judgment text ' * 2000
+    
+    @pytest.fixture
+    def store_app(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('UPLOAD_FOLDER', str(tmp_path))
+        monkeypatch.setenv('WRITE_BEHIND_ENABLED', 'false')
+        app = create_app()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+    
+    def test_identical_pdfs_stored_once(self, tmp_path, monkeypatch):
+        """Test that two URLs with the same content share one sharded blob."""
+        import hashlib
+        body = self.BODY
+        monkeypatch.setattr('requests.Session.get', lambda session, url, **kwargs: FakePDFResponse(body))
+        handler = PDFHandler(str(tmp_path))
+        
+        first = handler.download_pdf('https://portal.example/orders/a.pdf')
+        second = handler.download_pdf('https://portal.example/orders/b.pdf')
+        
+        digest = hashlib.sha256(self.BODY).hexdigest()
+        assert first['digest'] == second['digest'] == digest
+        assert first['local_path'] == second['local_path'] == str(tmp_path / digest[:2] / digest[2:4] / f'{digest}.pdf')
+        assert (first['deduplicated'], second['deduplicated']) == (False, True)
+        assert first['filename'] == 'a.pdf'
+        assert not list(tmp_path.glob('*.part'))
+    
+    def test_download_route_serves_known_url_offline(self, store_app, monkeypatch):
+        """Test that a URL already in the index is served without the network."""
+        from models.database import PdfSource
+        calls = []
+        def fake_get(session, url, **kwargs):
+            calls.append(url)
+            return FakePDFResponse(self.BODY)
+        monkeypatch.setattr('requests.Session.get', fake_get)
+        client = store_app.test_client()
+        
+        url = 'https://portal.example/orders/judgment.pdf'
+        assert client.get(f'/download/{url}').data == self.BODY
+        assert db.session.get(PdfSource, url).filename == 'judgment.pdf'
+        
+        response = client.get(f'/download/{url}')
+        assert response.data == self.BODY
+        assert 'judgment.pdf' in response.headers['Content-Disposition']
+        assert calls == [url]
+    
+    def test_conditional_and_range_requests(self, store_app, monkeypatch):
+        """Test ETag revalidation and byte ranges on stored PDFs."""
+        monkeypatch.setattr('requests.Session.get', lambda session, url, **kwargs: FakePDFResponse(self.BODY))
+        client = store_app.test_client()
+        url = '/download/https://portal.example/orders/judgment.pdf'
+        client.get(url).get_data()  # first fetch streams from the portal into the store
+        
+        etag = client.get(url).headers['ETag']
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+        
+        response = client.get(url, headers={'Range': 'bytes=0-7'})
+        assert response.status_code == 206
+        assert response.data == b'%PDF-1.4'
+    
+    def test_x_accel_mode_hands_off_to_nginx(self, store_app, monkeypatch):
+        """Test that x-accel mode returns a redirect header instead of the body."""
+        import hashlib
+        monkeypatch.setattr('requests.Session.get', lambda session, url, **kwargs: FakePDFResponse(self.BODY))
+        store_app.config['PDF_SERVE_MODE'] = 'x-accel'
+        client = store_app.test_client()
+        client.get('/download/https://portal.example/orders/judgment.pdf').get_data()
+        
+        response = client.get('/download/https://portal.example/orders/judgment.pdf')
+        digest = hashlib.sha256(self.BODY).hexdigest()
+        assert response.data == b''
+        assert response.headers['X-Accel-Redirect'] == f'/protected-downloads/{digest[:2]}/{digest[2:4]}/{digest}.pdf'
+        assert 'judgment.pdf' in response.headers['Content-Disposition']
+
+    def test_first_download_streams_and_caches(self, store_app, monkeypatch):
+        """Test tee-streaming: bytes reach the client and the store together."""
+        from models.database import PdfSource
+        monkeypatch.setattr('requests.Session.get', lambda session, url, **kwargs: FakePDFResponse(self.BODY))
+        url = 'https://portal.example/orders/judgment.pdf'
+        
+        response = store_app.test_client().get(f'/download/{url}')
+        assert response.is_streamed
+        assert response.data == self.BODY
+        assert 'ETag' not in response.headers
+        assert os.path.getsize(PDFHandler(store_app.config['UPLOAD_FOLDER']).blob_path(
+            db.session.get(PdfSource, url).digest)) == len(self.BODY)
+    
+    def test_aborted_stream_discards_partial_file(self, tmp_path):
+        """Test that a client abort deletes the partial file and closes upstream."""
+        handler = PDFHandler(str(tmp_path))
+        upstream = FakePDFResponse(self.BODY)
+        completed = []
+        
+        chunks = handler.stream_pdf({'response': upstream, 'filename': 'a.pdf'}, on_complete=completed.append)
+        next(chunks)
+        chunks.close()
+        
+        assert upstream.closed
+        assert completed == []
+        assert list(tmp_path.rglob('*')) == []
+
+class FakeRangeSession:
+    """Serves one PDF with Range/If-Range support, optionally dropping the first transfer."""
+    
+    def __init__(self, body, drop_after=None):
+        self.body = body
+        self.drop_after = drop_after
+        self.requests = []
+    
+    def get(self, url, headers=None, **kwargs):
+        import requests
+        headers = headers or {}
+        self.requests.append(headers)
+        response = FakePDFResponse(self.body)
+        response.headers = {'content-type': 'application/pdf', 'accept-ranges': 'bytes',
+                            'etag': '"v1"', 'content-length': str(len(self.body))}
+        response.status_code = 200
+        if 'Range' in headers and headers.get('If-Range') == '"v1"':
+            start, end = headers['Range'][len('bytes='):].split('-')
+            if int(start) >= len(self.body):
+                response.body, response.status_code = b'', 416
+                response.headers['content-range'] = f'bytes */{len(self.body)}'
+                return response
+            end = int(end) if end else len(self.body) - 1
+            response.body = self.body[int(start):end + 1]
+            response.headers['content-length'] = str(len(response.body))
+            response.status_code = 206
+        elif self.drop_after is not None:
+            body, self.drop_after = self.body[:self.drop_after], None
+            def dropped(chunk_size=8192):
+                yield body
+                raise requests.exceptions.ChunkedEncodingError('connection reset')
+            response.iter_content = dropped
+        return response
+
+class TestResumableDownloads:
+    """Test resuming and parallel range downloads."""
+    
+    BODY = bytes(range(256)) * 1000
+    
+    def test_resumes_after_dropped_connection(self, tmp_path):
+        """Test that a retry continues from the bytes already on disk."""
+        session = FakeRangeSession(self.BODY, drop_after=100000)
+        handler = PDFHandler(str(tmp_path), backoff=0)
+        
+        result = handler.download_pdf('https://portal.example/orders/big.pdf', session=session)
+        
+        assert result['status'] == 'success'
+        with open(result['local_path'], 'rb') as f:
+            assert f.read() == self.BODY
+        assert session.requests[-1]['Range'] == 'bytes=100000-'
+        assert session.requests[-1]['If-Range'] == '"v1"'
+        assert [name for name in os.listdir(tmp_path / '.partial') if not name.endswith('.lock')] == []
+    
+    def test_failed_request_retried_by_one_loop(self, tmp_path):
+        """Test that a failed first request is retried once, with timeouts cut to the deadline."""
+        import requests
+        session = FakeRangeSession(self.BODY)
+        fake_get = session.get
+        calls = []
+        def get(url, headers=None, timeout=None, **kwargs):
+            calls.append(timeout)
+            if len(calls) == 1:
+                raise requests.ConnectionError('reset')
+            return fake_get(url, headers=headers, **kwargs)
+        session.get = get
+        handler = PDFHandler(str(tmp_path), backoff=0, timeout=(10, 600))
+        
+        result = handler.download_pdf('https://portal.example/orders/big.pdf', session=session)
+        
+        assert result['status'] == 'success'
+        assert len(calls) == 2
+        assert handler.retry_policy.stats['calls'] == 1 and handler.retry_policy.stats['retries'] == 1
+        assert all(timeout[0] == 10 and timeout[1] <= handler.retry_policy.deadline for timeout in calls)
+
+    def test_resumes_and_ranges_stay_within_deadline(self, tmp_path):
+        """Test that range and resume requests get timeouts cut to the download's deadline."""
+        from utils.retry import RetryPolicy
+        timeouts = []
+        for kwargs in ({'parallel_chunks': 4, 'parallel_min_bytes': 1024}, {}):
+            session = FakeRangeSession(self.BODY, drop_after=None if kwargs else 100000)
+            fake_get = session.get
+            def get(url, headers=None, timeout=None, fake_get=fake_get, **rest):
+                if headers and 'Range' in headers:
+                    timeouts.append(timeout)
+                return fake_get(url, headers=headers, **rest)
+            session.get = get
+            handler = PDFHandler(str(tmp_path / str(len(timeouts))), timeout=(10, 600),
+                                 retry_policy=RetryPolicy(backoff=0, deadline=5), **kwargs)
+            assert handler.download_pdf('https://portal.example/orders/big.pdf', session=session)['status'] == 'success'
+
+        assert len(timeouts) == 5
+        assert all(connect <= 5 and read <= 5 for connect, read in timeouts)
+
+    def test_stream_dropped_after_last_byte_completes(self, tmp_path):
+        """Test that a resume answered with 416 (nothing left) finishes the streamed download."""
+        session = FakeRangeSession(self.BODY, drop_after=len(self.BODY))
+        handler = PDFHandler(str(tmp_path), backoff=0)
+        opened = handler.open_pdf('https://portal.example/orders/big.pdf', session=session)
+        completed = []
+
+        assert b''.join(handler.stream_pdf(opened, on_complete=completed.append)) == self.BODY
+        assert session.requests[-1]['Range'] == f'bytes={len(self.BODY)}-'
+        assert completed[0]['status'] == 'success' and completed[0]['file_size'] == len(self.BODY)
+
+    def test_partial_locks_are_per_url_and_released(self, tmp_path):
+        """Test that URLs never share a partial lock, and that finished downloads leave none behind."""
+        handler = PDFHandler(str(tmp_path), backoff=0)
+        os.makedirs(handler.partial_folder)
+        with handler._partial_lock('ab' + '1' * 62) as first, handler._partial_lock('ab' + '2' * 62) as second:
+            with handler._partial_lock('ab' + '1' * 62) as again:
+                assert first and second and not again
+
+        for number in range(20):
+            handler.download_pdf(f'https://portal.example/orders/{number}.pdf',
+                                 session=FakeRangeSession(b'%PDF-1.4'))
+        assert handler._partial_locks == {}
+        assert os.listdir(handler.partial_folder) == []
+
+    def test_parallel_range_chunks(self, tmp_path):
+        """Test that big files are fetched as parallel ranges and reassembled."""
+        session = FakeRangeSession(self.BODY)
+        handler = PDFHandler(str(tmp_path), parallel_chunks=4, parallel_min_bytes=1024)
+        
+        result = handler.download_pdf('https://portal.example/orders/big.pdf', session=session)
+        
+        with open(result['local_path'], 'rb') as f:
+            assert f.read() == self.BODY
+        assert sorted(headers['Range'] for headers in session.requests[1:]) == [
+            'bytes=0-63999', 'bytes=128000-191999', 'bytes=192000-255999', 'bytes=64000-127999']
+
+def make_text_pdf(page_texts, title='Judgment'):
+    """Build a small PDF with one line of text per page."""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None,
+               '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+               f'<< /Title ({title}) >>']
+    kids = []
+    for text in page_texts:
+        stream = f'BT /F1 12 Tf 20 100 Td ({text}) Tj ET'
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 300 200] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>')
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'
+    
+    body, offsets = b'%PDF-1.4\n', []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f'{number} 0 obj\n{obj}\nendobj\n'.encode()
+    xref = len(body)
+    body += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    body += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode()
+    body += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R /Info 4 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return body
+
+class TestPDFMetadata:
+    """Test lazy PDF metadata and page-by-page text extraction."""
+    
+    def test_cheap_metadata_and_page_text(self, tmp_path):
+        """Test metadata without page parsing and lazily generated page text."""
+        from utils.pdf_metadata import read_pdf_metadata, iter_page_text
+        
+        path = tmp_path / 'judgment.pdf'
+        path.write_bytes(make_text_pdf(['First page', 'Second page', 'Third page']))
+        
+        metadata = read_pdf_metadata(str(path))
+        assert (metadata['num_pages'], metadata['title'], metadata['pdf_version']) == (3, 'Judgment', '1.4')
+        
+        pages = iter_page_text(str(path), start=1)
+        assert next(pages) == (1, 'Second page')
+        assert [number for number, _ in pages] == [2]
+    
+    def test_metadata_cached_by_digest(self, tmp_path):
+        """Test that blob metadata is read once per digest."""
+        import hashlib
+        body = make_text_pdf(['Only page'])
+        digest = hashlib.sha256(body).hexdigest()
+        handler = PDFHandler(str(tmp_path))
+        path = handler.blob_path(digest)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(body)
+        
+        assert handler.get_blob_metadata(digest)['num_pages'] == 1
+        assert handler.get_blob_metadata(digest)['num_pages'] == 1
+        assert handler.metadata_cache.stats == {'hits': 1, 'misses': 1}
+        with pytest.raises(FileNotFoundError):
+            handler.get_blob_metadata('../' * 20)
+    
+    def test_pdf_api_endpoints(self, tmp_path, monkeypatch):
+        """Test the metadata and page text API for stored PDFs."""
+        import hashlib
+        body = make_text_pdf(['Order one', 'Order two'])
+        monkeypatch.setenv('UPLOAD_FOLDER', str(tmp_path))
+        monkeypatch.setattr('requests.Session.get', lambda session, url, **kwargs: FakePDFResponse(body))
+        app = create_app()
+        client = app.test_client()
+        digest = hashlib.sha256(body).hexdigest()
+        PDFHandler(str(tmp_path)).download_pdf('https://portal.example/orders/o.pdf')
+        
+        response = client.get(f'/api/pdf/{digest}/metadata')
+        assert response.get_json()['metadata']['num_pages'] == 2
+        assert 'immutable' in response.headers['Cache-Control']
+        
+        data = client.get(f'/api/pdf/{digest}/text?start=1&limit=5').get_json()
+        assert data['pages'] == [{'page': 2, 'text': 'Order two'}]
+        assert client.get(f'/api/pdf/{"0" * 64}/metadata').status_code == 404
+        assert client.get(f'/api/pdf/{digest}/text?limit=0').status_code == 400
+
+    def test_preview_built_once_per_digest(self, tmp_path, monkeypatch):
+        """Test that previews are stored next to the blob and served cacheable."""
+        import hashlib
+        body = make_text_pdf(['IN THE HIGH COURT OF DELHI   Bail application', 'Page two'])
+        monkeypatch.setenv('UPLOAD_FOLDER', str(tmp_path))
+        monkeypatch.setattr('requests.Session.get', lambda session, url, **kwargs: FakePDFResponse(body))
+        app = create_app()
+        client = app.test_client()
+        digest = hashlib.sha256(body).hexdigest()
+        handler = PDFHandler(str(tmp_path))
+        handler.download_pdf('https://portal.example/orders/o.pdf')
+        
+        response = client.get(f'/api/pdf/{digest}/preview')
+        preview = response.get_json()['preview']
+        assert (preview['text'], preview['num_pages']) == ('IN THE HIGH COURT OF DELHI Bail application', 2)
+        assert 'immutable' in response.headers['Cache-Control']
+        
+        # Later requests read the stored preview instead of parsing the PDF
+        monkeypatch.setattr('utils.pdf_handler.build_preview', lambda path: pytest.fail('parsed again'))
+        assert client.get(f'/api/pdf/{digest}/preview').get_json()['preview']['num_pages'] == 2
+        thumbnail = client.get(preview['thumbnail_url'])
+        assert thumbnail.data.startswith(b'\x89PNG') and thumbnail.mimetype == 'image/png'
+        assert preview['thumbnail_url'].endswith(f"/thumbnail-{app.config['PDF_THUMBNAIL_WIDTH']}.png")
+        assert client.get(f'/api/pdf/{"0" * 64}/thumbnail-240.png').status_code == 404
+        # A link to another width (cached from before the setting changed) is sent to the current one
+        stale = client.get(f'/api/pdf/{digest}/thumbnail-999.png')
+        assert stale.status_code == 302 and stale.headers['Location'].endswith('/thumbnail-240.png')
+        
+        # Each width is its own sidecar, and all of them go with the blob
+        small = handler.get_blob_thumbnail(digest, width=120)
+        assert small != handler.get_blob_thumbnail(digest, width=app.config['PDF_THUMBNAIL_WIDTH'])
+        assert small.endswith('.thumb-120.png')
+        assert handler.delete_blob(digest)
+        assert os.listdir(os.path.dirname(handler.blob_path(digest))) == []
+
+class TestPDFPrefetch:
+    """Test order PDF prefetching and the streamed ZIP download."""
+    
+    ORDERS = [
+        {'date': '01/02/2024', 'pdf_url': 'https://portal.example/orders/a.pdf'},
+        {'date': '02/02/2024', 'pdf_url': 'https://portal.example/orders/b.pdf'},
+        {'date': '03/02/2024', 'pdf_url': 'https://portal.example/orders/a.pdf'},
+        {'date': '04/02/2024', 'pdf_url': ''},
+    ]
+    
+    def test_host_rate_limiter(self):
+        """Test that requests beyond the burst wait for tokens, per host."""
+        import time
+        from utils.rate_limiter import HostRateLimiter
+        
+        limiter = HostRateLimiter(rate=20, burst=2)
+        started = time.monotonic()
+        for _ in range(4):
+            assert limiter.acquire('https://portal.example/a.pdf')
+        assert time.monotonic() - started >= 0.09
+        assert limiter.acquire('https://other.example/a.pdf', timeout=0)
+        assert not limiter.acquire('https://portal.example/a.pdf', timeout=0)
+    
+    def test_prefetch_fetches_each_order_once(self, tmp_path, monkeypatch):
+        """Test that prefetch downloads distinct order URLs into the store."""
+        from models.database import PdfSource
+        from models.pdf_prefetch import PdfPrefetcher
+        from models.write_behind import WriteBehindQueue
+        monkeypatch.setenv('UPLOAD_FOLDER', str(tmp_path))
+        monkeypatch.setenv('WRITE_BEHIND_ENABLED', 'false')
+        calls = []
+        def fake_get(session, url, **kwargs):
+            calls.append(url)
+            return FakePDFResponse(b'%PDF-1.4 ' + url.encode())
+        monkeypatch.setattr('requests.Session.get', fake_get)
+        
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            try:
+                prefetcher = PdfPrefetcher(PDFHandler(str(tmp_path)), WriteBehindQueue(app), host_rate=100)
+                assert prefetcher.prefetch(self.ORDERS) == 2
+                prefetcher.shutdown(wait=True)
+                
+                assert sorted(calls) == ['https://portal.example/orders/a.pdf', 'https://portal.example/orders/b.pdf']
+                assert PdfSource.query.count() == 2
+                assert prefetcher.prefetch(self.ORDERS) == 0
+            finally:
+                db.drop_all()
+    
+    def test_orders_zip_streams_every_pdf(self, tmp_path, monkeypatch):
+        """Test the ZIP endpoint builds an archive of all distinct order PDFs."""
+        import io, zipfile
+        monkeypatch.setenv('UPLOAD_FOLDER', str(tmp_path))
+        monkeypatch.setenv('WRITE_BEHIND_ENABLED', 'false')
+        monkeypatch.setattr('requests.Session.get',
+                            lambda session, url, **kwargs: FakePDFResponse(b'%PDF-1.4 ' + url.encode()))
+        
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            try:
+                query = Query(case_type="WP(C)", case_number="623", filing_year=2024, status='success')
+                query.set_response_data({'case_id': 'WP(C)-623/2024', 'orders': self.ORDERS})
+                db.session.add(query)
+                db.session.commit()
+                
+                response = app.test_client().get(f'/result/{query.id}/orders.zip')
+                assert response.is_streamed
+                archive = zipfile.ZipFile(io.BytesIO(response.get_data()))
+                assert archive.namelist() == ['01_01_02_2024_a.pdf', '02_02_02_2024_b.pdf']
+                assert archive.read('02_02_02_2024_b.pdf') == b'%PDF-1.4 https://portal.example/orders/b.pdf'
+            finally:
+                db.drop_all()
+
+class TestFullTextSearch:
+    """Test the background full-text index of stored PDFs."""
+    
+    @pytest.fixture
+    def fulltext_app(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('UPLOAD_FOLDER', str(tmp_path / 'downloads'))
+        monkeypatch.setenv('FULLTEXT_INDEX_PATH', str(tmp_path / 'fulltext.db'))
+        monkeypatch.setenv('WRITE_BEHIND_ENABLED', 'false')
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+    
+    def store(self, app, monkeypatch, url, body):
+        """Put a PDF in the store and index its URL like a download does."""
+        from models.database import record_pdf_source
+        monkeypatch.setattr('requests.Session.get', lambda session, url, **kwargs: FakePDFResponse(body))
+        result = PDFHandler(app.config['UPLOAD_FOLDER']).download_pdf(url)
+        record_pdf_source(db.session, url, result['digest'], result['file_size'], result['filename'])
+        db.session.commit()
+        return result['digest']
+    
+    def test_incremental_indexing(self, fulltext_app, monkeypatch):
+        """Test that each run only extracts blobs added since the last one."""
+        from datetime import datetime, timedelta
+        indexer = fulltext_app.extensions['fulltext']
+        indexer.workers = 0
+        later = datetime.utcnow() + timedelta(minutes=5)
+        
+        bail = self.store(fulltext_app, monkeypatch, 'https://portal.example/orders/a.pdf', make_text_pdf(['Bail granted', 'Costs']))
+        assert indexer.run_once(now=later) == {'indexed': 1, 'failed': 0}
+        assert indexer.run_once(now=later) == {'indexed': 0, 'failed': 0}
+        
+        self.store(fulltext_app, monkeypatch, 'https://portal.example/orders/b.pdf', make_text_pdf(['Petition dismissed']))
+        # Too recent: the watermark waits for write-behind commits to settle
+        assert indexer.run_once() == {'indexed': 0, 'failed': 0}
+        assert indexer.run_once(now=later) == {'indexed': 1, 'failed': 0}
+        
+        hits = indexer.index.search('granting bail')
+        assert [(hit['digest'], hit['page']) for hit in hits] == [(bail, 1)]
+        assert hits[0]['snippet'] == '<mark>Bail</mark> <mark>granted</mark>'
+        assert indexer.index.search('" OR *') == []
+    
+    def test_extracts_in_process_pool(self, fulltext_app, monkeypatch):
+        """Test extraction in worker processes and recording of unreadable PDFs."""
+        from datetime import datetime, timedelta
+        indexer = fulltext_app.extensions['fulltext']
+        indexer.workers = 1
+        self.store(fulltext_app, monkeypatch, 'https://portal.example/orders/a.pdf', make_text_pdf(['Interim stay']))
+        self.store(fulltext_app, monkeypatch, 'https://portal.example/orders/broken.pdf', b'%PDF-1.4 broken')
+        
+        assert indexer.run_once(now=datetime.utcnow() + timedelta(minutes=5)) == {'indexed': 1, 'failed': 1}
+        assert indexer.index.stats() == {'indexed': 1, 'failed': 1}
+    
+    def test_fulltext_search_api(self, fulltext_app, monkeypatch):
+        """Test ranked results joined to their source URL, and input validation."""
+        from datetime import datetime, timedelta
+        indexer = fulltext_app.extensions['fulltext']
+        indexer.workers = 0
+        digest = self.store(fulltext_app, monkeypatch, 'https://portal.example/orders/a.pdf',
+                            make_text_pdf(['Notice issued', 'Writ petition allowed']))
+        indexer.run_once(now=datetime.utcnow() + timedelta(minutes=5))
+        client = fulltext_app.test_client()
+        
+        data = client.get('/api/search/fulltext?q=petition').get_json()
+        assert [(hit['digest'], hit['page'], hit['url'], hit['filename']) for hit in data['results']] == [
+            (digest, 2, 'https://portal.example/orders/a.pdf', 'a.pdf')]
+        assert client.get('/api/search/fulltext?q=%20').status_code == 400
+        assert client.get('/api/search/fulltext?q=writ&limit=0').status_code == 400
+
+    def test_connections_are_shared_across_threads(self, tmp_path, monkeypatch):
+        """Test that the index connects and runs its schema once, not per thread."""
+        import sqlite3
+        import threading
+        from models.fulltext import FullTextIndex
+        index = FullTextIndex(str(tmp_path / 'nested' / 'fulltext.db'))
+        connects = []
+        connect = sqlite3.connect
+        monkeypatch.setattr(sqlite3, 'connect', lambda *args, **kwargs: connects.append(args) or connect(*args, **kwargs))
+
+        index.set_state('watermark', '1')
+        for _ in range(3):
+            thread = threading.Thread(target=index.stats)
+            thread.start()
+            thread.join()
+        assert index.get_state('watermark') == '1'
+        assert len(connects) == 1
+        assert len(index.pool._idle) == 1
+
+class TestPDFStoreCleanup:
+    """Test index-driven LRU eviction from the PDF store."""
+    
+    @pytest.fixture
+    def cleanup_app(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('UPLOAD_FOLDER', str(tmp_path))
+        monkeypatch.setenv('WRITE_BEHIND_ENABLED', 'false')
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.drop_all()
+    
+    def store(self, app, name, last_accessed_at, size=1000):
+        """Store a PDF of `size` bytes, indexed and downloaded once."""
+        import hashlib
+        from models.database import PdfBlob, record_pdf_source
+        handler = app.extensions['pdf_cleanup'].pdf_handler
+        body = b'%PDF-1.4 ' + name.encode().ljust(size - 9, b'.')
+        digest = hashlib.sha256(body).hexdigest()
+        path = handler.blob_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(body)
+        url = f'https://portal.example/orders/{name}.pdf'
+        record_pdf_source(db.session, url, digest, size, f'{name}.pdf')
+        query = Query(case_type="W.P.(C)", case_number="1", filing_year=2024, status='success')
+        db.session.add(query)
+        db.session.flush()
+        db.session.add(Download(query_id=query.id, pdf_url=url, local_path=path, filename=f'{name}.pdf',
+                                digest=digest, file_size=size, status='success'))
+        db.session.commit()
+        db.session.get(PdfBlob, digest).last_accessed_at = last_accessed_at
+        db.session.commit()
+        return digest
+    
+    def test_evicts_least_recently_used_to_budget(self, cleanup_app):
+        """Test that the oldest-accessed blobs go first until the store fits."""
+        from datetime import datetime, timedelta
+        from models.database import PdfBlob, PdfSource
+        now = datetime.utcnow()
+        cleanup = cleanup_app.extensions['pdf_cleanup']
+        old = self.store(cleanup_app, 'old', now - timedelta(days=10))
+        older = self.store(cleanup_app, 'older', now - timedelta(days=20))
+        recent = self.store(cleanup_app, 'recent', now)
+        
+        cleanup.max_bytes, cleanup.pause = 2000, 0
+        assert cleanup.run_once(now=now) == {'files_evicted': 1, 'bytes_freed': 1000, 'partials_removed': 0}
+        assert not cleanup.pdf_handler.has_blob(older)
+        assert cleanup.pdf_handler.has_blob(old) and cleanup.pdf_handler.has_blob(recent)
+        assert db.session.get(PdfSource, 'https://portal.example/orders/older.pdf') is None
+        assert db.session.query(Download).filter_by(digest=older).one().status == 'evicted'
+        
+        cleanup.max_bytes, cleanup.max_age_days = 0, 5
+        assert cleanup.run_once(now=now)['files_evicted'] == 1
+        assert [blob.digest for blob in PdfBlob.query.all()] == [recent]
+    
+    def test_access_tracking_and_partial_files(self, cleanup_app, tmp_path, monkeypatch):
+        """Test throttled access recording and removal of stale temp files."""
+        import time
+        from datetime import datetime, timedelta
+        from models.database import PdfBlob
+        cleanup = cleanup_app.extensions['pdf_cleanup']
+        writes = []
+        monkeypatch.setattr(cleanup.write_behind, 'submit', lambda operation: writes.append(operation) or operation(db.session))
+        digest = self.store(cleanup_app, 'judgment', datetime.utcnow() - timedelta(days=30))
+        
+        cleanup.record_access(digest)
+        cleanup.record_access(digest)
+        assert len(writes) == 1
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(PdfBlob, digest).last_accessed_at > datetime.utcnow() - timedelta(minutes=1)
+        
+        stale, fresh = tmp_path / 'stale.part', tmp_path / 'fresh.part'
+        stale.write_bytes(b'x')
+        fresh.write_bytes(b'x')
+        os.utime(stale, (time.time() - 30 * 24 * 3600,) * 2)
+        assert cleanup.pdf_handler.cleanup_partial_files(max_age_days=7) == 1
+        assert fresh.exists() and not stale.exists()
+
+class TestWatchlist:
+    """Test the background watchlist refresh."""
+    
+    class FakeScraper:
+        base_url = 'https://portal.example'
+        
+        def __init__(self):
+            self.results = []
+            self.calls = []
+        
+        def search_case(self, case_type, case_number, filing_year):
+            self.calls.append((case_type, case_number, filing_year))
+            return self.results.pop(0)
+    
+    @staticmethod
+    def found(hearing, status='Pending', orders=()):
+        return {'status': 'success', 'case_data': {
+            'case_type': 'LPA', 'case_number': '12/2024', 'filing_year': 2024,
+            'case_status': status, 'next_hearing_date': hearing,
+            'orders': [{'title': title, 'date': date, 'pdf_url': f'https://portal.example/{title}.pdf'}
+                       for title, date in orders]}}
+    
+    def test_refresh_interval_follows_next_hearing(self):
+        """Test that hearings soon are refreshed more often and closed cases rarely."""
+        from datetime import date, timedelta
+        from models.watchlist import refresh_interval
+        base, today = timedelta(hours=24), date(2024, 3, 1)
+        
+        assert refresh_interval(None, today, base) == base
+        assert refresh_interval(Case(next_hearing_on=date(2024, 3, 2)), today, base) == timedelta(hours=1)
+        assert refresh_interval(Case(next_hearing_on=date(2024, 3, 10)), today, base) == timedelta(hours=12)
+        assert refresh_interval(Case(next_hearing_on=date(2024, 2, 1)), today, base) == base
+        assert refresh_interval(Case(case_status='DISPOSED OFF'), today, base) == base * 7
+    
+    def test_refresh_records_changes(self, app):
+        """Test that refreshes diff against the stored case and reschedule."""
+        from datetime import datetime, timedelta
+        from models.database import CaseChange, WatchedCase
+        from models.watchlist import WatchlistScheduler
+        scraper = self.FakeScraper()
+        scheduler = WatchlistScheduler(app, scraper, rate=1000, jitter=0)
+        
+        client = app.test_client()
+        response = client.post('/api/watchlist', json={
+            'case_type': 'LPA', 'case_number': '12/2024', 'filing_year': 2024, 'label': 'Client A'})
+        assert response.status_code == 201
+        watch_id = response.get_json()['watch']['id']
+        assert client.post('/api/watchlist', json={
+            'case_type': 'LPA', 'case_number': '12/2024', 'filing_year': '2024'}).status_code == 200
+        assert client.post('/api/watchlist', json={'case_type': 'LPA'}).status_code == 400
+        
+        now = datetime.utcnow()
+        scraper.results = [self.found('01/01/2099', orders=[('Order 1', '01/02/2024')]),
+                           self.found('15/01/2099', orders=[('Order 1', '01/02/2024'), ('Order 2', '05/02/2024')]),
+                           {'status': 'error', 'error_message': 'Portal down'}]
+        assert scheduler.run_once(now) == {'refreshed': 1, 'failed': 0, 'changes': 0}
+        assert scheduler.run_once(now) == {'refreshed': 0, 'failed': 0, 'changes': 0}
+        
+        later = now + timedelta(days=1)
+        assert scheduler.run_once(later) == {'refreshed': 1, 'failed': 0, 'changes': 2}
+        changes = client.get(f'/api/watchlist/{watch_id}/changes').get_json()['changes']
+        assert sorted((change['field'], change['old_value'], change['new_value']) for change in changes) == [
+            ('next_hearing_date', '01/01/2099', '15/01/2099'), ('order', None, 'Order 2 05/02/2024')]
+        
+        assert scheduler.run_once(later + timedelta(days=1))['failed'] == 1
+        with app.app_context():
+            watch = db.session.get(WatchedCase, watch_id)
+            assert (watch.last_status, watch.consecutive_failures) == ('error', 1)
+            assert watch.next_refresh_at == later + timedelta(days=1, minutes=15)
+            assert watch.case.next_hearing_date == '15/01/2099'
+            assert CaseChange.query.count() == 2
+        
+        assert client.delete(f'/api/watchlist/{watch_id}').status_code == 200
+        assert client.get('/api/watchlist').get_json()['watchlist'] == []
+        assert len(scraper.calls) == 3
+
+class TestScraperConcurrency:
+    """Test scraper state isolation between concurrent requests."""
+    
+    def test_session_per_thread(self):
+        """Each thread gets its own session over a shared connection pool."""
+        import threading
+        from scrapers.delhi_high_court_simple import DelhiHighCourtSimpleScraper
+        
+        scraper = DelhiHighCourtSimpleScraper("http://portal.example")
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(scraper.session))
+        thread.start()
+        thread.join()
+        
+        assert scraper.session is scraper.session
+        assert sessions[0] is not scraper.session
+        assert sessions[0].get_adapter('http://portal.example') is scraper.session.get_adapter('http://portal.example')
+        assert scraper.case_history_url == "http://portal.example/pcase/case_history.php"
+
+class FakePageSession:
+    """Serves one HTML page, answering conditional requests when it has validators."""
+    
+    def __init__(self, body, etag=None):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+    
+    def get(self, url, headers=None, **kwargs):
+        import requests
+        from datetime import timedelta
+        headers = headers or {}
+        self.requests.append(headers)
+        response = requests.Response()
+        response.url = url
+        response.encoding = 'utf-8'
+        response.elapsed = timedelta(milliseconds=5)
+        if self.etag:
+            response.headers['ETag'] = self.etag
+        if self.etag and headers.get('If-None-Match') == self.etag:
+            response.status_code = 304
+            response._content = b''
+        else:
+            response.status_code = 200
+            response._content = self.body
+        return response
+
+class TestPortalHTTPCache:
+    """Test conditional requests and body fingerprinting of portal pages."""
+    
+    def test_etag_revalidation(self, tmp_path):
+        """A page with an ETag is revalidated and served from the cache on 304."""
+        from utils.http_cache import HTTPValidatorCache
+        
+        cache = HTTPValidatorCache(str(tmp_path / 'http.db'))
+        session = FakePageSession(b'<form>case status</form>', etag='"abc"')
+        first = cache.fetch(session, 'http://portal.example/case_status')
+        second = cache.fetch(session, 'http://portal.example/case_status')
+        
+        assert not first.not_modified and first.text == '<form>case status</form>'
+        assert session.requests[1]['If-None-Match'] == '"abc"'
+        assert second.status_code == 200 and second.not_modified and second.unchanged
+        assert second.content == b'<form>case status</form>'
+        assert cache.stats['not_modified'] == 1
+    
+    def test_body_hash_without_validators(self, tmp_path):
+        """Without validators an identical body is flagged unchanged and a new one is stored."""
+        from utils.http_cache import HTTPValidatorCache
+        
+        cache = HTTPValidatorCache(str(tmp_path / 'http.db'))
+        session = FakePageSession(b'<p>v1</p>')
+        cache.fetch(session, 'http://portal.example/')
+        assert cache.fetch(session, 'http://portal.example/').unchanged
+        assert session.requests[1] == {}
+        
+        session.body = b'<p>v2</p>'
+        changed = cache.fetch(session, 'http://portal.example/')
+        assert not changed.unchanged
+        assert cache.get('http://portal.example/')['body'] == b'<p>v2</p>'
+    
+    def test_served_locally_within_max_age(self, tmp_path):
+        """Within max_age no request is sent; max_age=0 always asks the portal."""
+        from utils.http_cache import HTTPValidatorCache
+        
+        cache = HTTPValidatorCache(str(tmp_path / 'http.db'), max_age=300)
+        session = FakePageSession(b'<p>static</p>')
+        cache.fetch(session, 'http://portal.example/search')
+        local = cache.fetch(session, 'http://portal.example/search')
+        assert local.from_cache and local.text == '<p>static</p>'
+        assert len(session.requests) == 1
+        
+        cache.fetch(session, 'http://portal.example/search', max_age=0)
+        assert len(session.requests) == 2
+    
+    def test_scraper_reuses_parsed_status_page(self, tmp_path, monkeypatch):
+        """An unchanged status page is not parsed again."""
+        from scrapers.delhi_high_court_simple import DelhiHighCourtSimpleScraper
+        from utils.http_cache import HTTPValidatorCache
+        
+        scraper = DelhiHighCourtSimpleScraper("http://portal.example",
+                                              http_cache=HTTPValidatorCache(str(tmp_path / 'http.db')))
+        session = FakePageSession(b'<html><body>Case status search</body></html>', etag='"p1"')
+        monkeypatch.setattr(DelhiHighCourtSimpleScraper, 'session', session)
+        
+        first = scraper.get_case_status_page()
+        second = scraper.get_case_status_page()
+        assert first is not None and second is first
+        assert session.requests[-1]['If-None-Match'] == '"p1"'
+
+class TestFormDiscovery:
+    """Test concurrent probing and caching of the portal's search form."""
+    
+    def test_probe_keeps_candidate_order(self):
+        """A form on an earlier candidate wins even when a later one answers first."""
+        import time
+        from utils.form_discovery import probe_concurrently, HAS_FORM, COURT_PAGE
+        
+        def probe(url):
+            if url == 'a':
+                time.sleep(0.2)
+                return HAS_FORM, 'a'
+            if url == 'b':
+                return HAS_FORM, 'b'
+            if url == 'c':
+                raise ConnectionError('refused')
+            return COURT_PAGE, url
+        
+        started = time.monotonic()
+        assert probe_concurrently(probe, ['c', 'a', 'b', 'd']) == 'a'
+        assert time.monotonic() - started < 1
+        assert probe_concurrently(probe, ['c', 'd', 'e']) == 'd'
+        assert probe_concurrently(lambda url: None, ['x', 'y']) is None
+    
+    def test_form_location_cached_and_invalidated(self, monkeypatch):
+        """The found form is reused, and probed again once its page changes."""
+        from scrapers.delhi_high_court_simple import DelhiHighCourtSimpleScraper
+        
+        pages = {'http://portal.example/search':
+                 b'<form action="find.php" id="search"><input name="ctype"><input name="regno"></form>'}
+        session = FakePageSession(b'')
+        requested = []
+        def get(url, headers=None, **kwargs):
+            requested.append(url)
+            session.body = pages.get(url, b'')
+            response = FakePageSession.get(session, url, headers)
+            response.status_code = 200 if url in pages else 404
+            return response
+        session.get = get
+        monkeypatch.setattr(DelhiHighCourtSimpleScraper, 'session', session)
+        scraper = DelhiHighCourtSimpleScraper("http://portal.example")
+        
+        location = scraper.get_search_form()
+        assert location.page_url == 'http://portal.example/search'
+        assert location.action_url == 'http://portal.example/find.php'
+        assert location.field_names == ('ctype', 'regno')
+        
+        requested.clear()
+        assert scraper.get_case_status_page() is not None
+        assert requested == ['http://portal.example/search']
+        
+        pages = {'http://portal.example/status': b'<form id="case-search"><input name="year"></form>'}
+        assert scraper.get_case_status_page() is not None
+        assert scraper.get_search_form().page_url == 'http://portal.example/status'
+        assert scraper.form_cache.stats['invalidations'] == 1
+
+    def test_full_scraper_probes_in_separate_sessions(self, monkeypatch):
+        """Each concurrent probe gets its own session; the winner's cookies carry over."""
+        import requests
+        from scrapers.delhi_high_court import DelhiHighCourtScraper
+
+        sessions = {}
+        def get(session, url, **kwargs):
+            sessions[url] = session
+            response = requests.Response()
+            response.status_code = 200 if url.endswith('/search') else 404
+            response._content = b'<form id="search"><input name="case_number"></form>'
+            if response.status_code == 200:
+                session.cookies.set('PHPSESSID', 'probe')
+            return response
+        monkeypatch.setattr('requests.Session.get', get)
+        scraper = DelhiHighCourtScraper("http://portal.example", use_selenium=False)
+
+        assert scraper.get_case_status_page() is not None
+        assert len({id(session) for session in sessions.values()}) == len(sessions) > 1
+        assert scraper.session not in sessions.values()
+        assert scraper.session.cookies.get('PHPSESSID') == 'probe'
+        assert scraper.form_cache.get("http://portal.example").page_url == 'http://portal.example/search'
+
+class FakeProbeSession:
+    """Answers health probes with a scripted sequence of status codes or exceptions."""
+    
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+    
+    def get(self, url, **kwargs):
+        import io
+        import requests
+        from datetime import timedelta
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        status_code, seconds = outcome
+        response = requests.Response()
+        response.status_code = status_code
+        response.elapsed = timedelta(seconds=seconds)
+        response.raw = io.BytesIO(b'')
+        return response
+
+class TestPortalHealth:
+    """Test the background portal prober, circuit breaker and health endpoints."""
+    
+    def test_window_breaker_and_rate_limits(self):
+        """Probes build the rolling window, open the circuit and slow the rate limiter."""
+        import requests
+        from models.portal_health import PortalHealthProber
+        from utils.circuit_breaker import HostCircuitBreaker
+        from utils.rate_limiter import HostRateLimiter
+        
+        breaker = HostCircuitBreaker(failure_threshold=2, reset_timeout=60)
+        limiter = HostRateLimiter(rate=2.0)
+        prober = PortalHealthProber(['http://portal.example'], breaker, limiters=[limiter])
+        prober.session = FakeProbeSession([(200, 0.1), (200, 0.3), (200, 0.2),
+                                           requests.ConnectionError('refused'), (503, 0.05)])
+        
+        for _ in range(3):
+            prober.run_once()
+        status = prober.status('http://portal.example')
+        assert status['accessible'] and status['p50'] == 0.2 and status['p95'] == 0.3
+        assert status['error_rate'] == 0 and status['circuit']['state'] == 'closed'
+        assert 'portal.example' not in limiter._factors
+        
+        prober.run_once()
+        assert breaker.allow('http://portal.example/pcase/case_history.php')
+        prober.run_once()
+        status = prober.status('http://portal.example')
+        assert not status['accessible'] and status['status_code'] == 503
+        assert status['error_rate'] == 0.4 and status['circuit']['state'] == 'open'
+        assert not breaker.allow('http://portal.example/pcase/case_history.php')
+        assert limiter._factors['portal.example'] == 0.5
+    
+    def test_portal_status_served_from_memory(self, app, client, monkeypatch):
+        """With the prober enabled the status endpoint never calls the portal."""
+        monkeypatch.setattr('app.DelhiHighCourtScraper.get_portal_status', lambda self: 1 / 0)
+        app.config['PORTAL_HEALTH_ENABLED'] = True
+        prober = app.extensions['portal_health']
+        prober.hosts[app.config['PORTAL_HEALTH_URLS'][0]].record(200, 0.4)
+        
+        data = client.get('/api/portal-status').get_json()
+        assert data['portal_status']['accessible'] is True
+        assert data['portal_status']['p50'] == 0.4
+        assert client.get('/api/health').get_json()['status'] == 'success'
+    
+    def test_empty_url_list_probes_the_portal(self, monkeypatch):
+        """An empty PORTAL_HEALTH_URLS falls back to the portal instead of breaking the status endpoint."""
+        monkeypatch.setenv('PORTAL_HEALTH_URLS', ' , ')
+        monkeypatch.setenv('PORTAL_HEALTH_ENABLED', 'false')
+        app = create_app()
+        assert app.config['PORTAL_HEALTH_URLS'] == [app.config['PORTAL_BASE_URL']]
+        app.config['PORTAL_HEALTH_ENABLED'] = True
+        assert app.test_client().get('/api/portal-status').get_json()['status'] == 'success'
+    
+    def test_open_circuit_fails_search_fast(self, app, client, monkeypatch):
+        """A search is refused without calling the portal while the circuit is open."""
+        monkeypatch.setattr('app.DelhiHighCourtScraper.search_case', lambda self, *args: 1 / 0)
+        breaker = app.extensions['portal_health'].breaker
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure(app.config['PORTAL_BASE_URL'])
+        
+        response = client.post('/fetch-case', data={
+            'case_type': 'LPA', 'case_number': '7/2023', 'filing_year': '2023'})
+        assert response.status_code == 302
+        with client.session_transaction() as session:
+            assert 'not responding' in str(session.get('_flashes'))
+
+class TestRetryPolicy:
+    """Test the retry layer used by the scraper and PDF handler."""
+    
+    def test_transient_errors_retried(self):
+        """Connection errors and 503s are retried until a call succeeds."""
+        import requests
+        from utils.retry import RetryPolicy
+        
+        policy = RetryPolicy(max_attempts=3, backoff=0)
+        outcomes = [requests.ConnectionError('reset'), FakePDFResponse(b'busy'), 'ok']
+        outcomes[1].status_code = 503
+        def request(timeout):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        
+        assert policy.call(request) == 'ok'
+        assert policy.stats['retries'] == 2 and policy.stats['recovered'] == 1
+        
+        with pytest.raises(ValueError):
+            policy.call(lambda timeout: int('not a number'))
+        assert policy.stats['retries'] == 2
+    
+    def test_non_idempotent_only_retried_when_not_sent(self):
+        """A POST is retried after a connect timeout but not after a read timeout."""
+        import requests
+        from utils.retry import RetryPolicy
+        
+        policy = RetryPolicy(max_attempts=3, backoff=0)
+        attempts = []
+        def read_timeout(timeout):
+            attempts.append(timeout)
+            raise requests.exceptions.ReadTimeout('slow')
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            policy.call(read_timeout, idempotent=False)
+        assert len(attempts) == 1
+        
+        outcomes = [requests.exceptions.ConnectTimeout('no route'), 'sent']
+        def connect_timeout(timeout):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        assert policy.call(connect_timeout, idempotent=False) == 'sent'
+    
+    def test_deadline_and_budget_bound_retries(self):
+        """Attempt timeouts shrink to the deadline, and the budget stops retry storms."""
+        import time
+        import requests
+        from utils.retry import RetryBudget, RetryPolicy
+        
+        policy = RetryPolicy(max_attempts=5, backoff=0)
+        timeouts = []
+        def failing(timeout):
+            timeouts.append(timeout)
+            raise requests.ConnectionError('refused')
+        with pytest.raises(requests.ConnectionError):
+            policy.call(failing, timeout=30, deadline=time.monotonic() + 5)
+        assert all(timeout <= 5 for timeout in timeouts)
+        
+        budget = RetryBudget(ratio=0, min_retries=1)
+        policy = RetryPolicy(max_attempts=5, backoff=0, budget=budget)
+        for _ in range(3):
+            with pytest.raises(requests.ConnectionError):
+                policy.call(failing)
+        assert policy.stats['retries'] == 1
+        assert policy.stats['budget_exhausted'] == 3
+    
+    def test_search_page_retried_by_scraper(self, tmp_path, monkeypatch):
+        """A dropped connection while loading the search page is retried."""
+        import requests
+        from scrapers.delhi_high_court_simple import DelhiHighCourtSimpleScraper
+        from utils.retry import RetryPolicy
+        
+        session = FakePageSession(b'<html><body>no captcha</body></html>')
+        page_get = session.get
+        failures = [requests.ConnectionError('reset')]
+        def get(url, **kwargs):
+            if failures:
+                raise failures.pop()
+            return page_get(url, kwargs.get('headers'))
+        session.get = get
+        session.post = lambda url, **kwargs: page_get(url)
+        monkeypatch.setattr(DelhiHighCourtSimpleScraper, 'session', session)
+        monkeypatch.setattr(DelhiHighCourtSimpleScraper, 'extract_case_details_from_html',
+                            lambda self, html_content: {'case_id': 'X'})
+        monkeypatch.chdir(tmp_path)  # search_case saves the response for debugging
+        scraper = DelhiHighCourtSimpleScraper("http://portal.example",
+                                              retry_policy=RetryPolicy(backoff=0))
+        
+        result = scraper.search_case('W.P.(C)', '1', 2024)
+        assert result['status'] == 'success'
+        assert scraper.retry_policy.stats['retries'] == 1
+
 if __name__ == '__main__':
     pytest.main([__file__]) 
\ No newline at end of file
@@ -0,0 +1,58 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Keys that change between scrapes without the case changing: the scrape
+# time, and whether the NJDG lookup happened to succeed this time
+VOLATILE_FIELDS = ('last_updated', 'njdg_data_available')
+
+# Case fields reported when they change; new orders are reported separately
+DIFF_FIELDS = ('case_status', 'next_hearing_date', 'judge', 'bench', 'court')
+
+def normalize_case_data(value: Any) -> Any:
+    """
+    Canonical form of a scraped case for hashing: volatile keys and empty
+    values dropped, whitespace collapsed, numbers as text
+    """
+    if isinstance(value, dict):
+        normalized = {}
+        for key, item in value.items():
+            if key in VOLATILE_FIELDS:
+                continue
+            item = normalize_case_data(item)
+            if item not in (None, '', [], {}):
+                normalized[str(key)] = item
+        return normalized
+    if isinstance(value, (list, tuple)):
+        return [normalize_case_data(item) for item in value]
+    if isinstance(value, str):
+        return ' '.join(value.split())
+    if isinstance(value, bool) or value is None:
+        return value
+    return str(value)
+
+def content_hash(case_data: Dict[str, Any]) -> str:
+    """SHA-256 of the normalized case; equal for results that differ only in volatile fields"""
+    canonical = json.dumps(normalize_case_data(case_data), sort_keys=True,
+                           separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def _order_identity(order: Dict[str, Any]) -> Tuple[str, str]:
+    return (order.get('pdf_url') or order.get('title') or '', order.get('date') or '')
+
+def diff_case(before: Dict[str, Any], case_data: Dict[str, Any]) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Changes between a stored snapshot and a freshly scraped case
+    Returns: list of (field, old value, new value); new orders as ('order', None, description)
+    """
+    changes = []
+    for field in DIFF_FIELDS:
+        old, new = before.get(field) or None, case_data.get(field) or None
+        if old != new:
+            changes.append((field, old, new))
+    known = {_order_identity(order) for order in before.get('orders') or []}
+    for order in case_data.get('orders') or []:
+        if _order_identity(order) not in known:
+            description = ' '.join(filter(None, (order.get('title'), order.get('date'))))
+            changes.append(('order', None, description or order.get('pdf_url')))
+    return changes
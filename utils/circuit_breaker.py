@@ -0,0 +1,55 @@
+import threading
+import time
+from typing import Any, Dict
+from urllib.parse import urlparse
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+class HostCircuitBreaker:
+    """
+    Circuit breaker per host. After `failure_threshold` consecutive failures
+    the host's circuit opens and allow() refuses requests for `reset_timeout`
+    seconds, so callers fail fast instead of waiting out timeouts against a
+    portal that is down. Then it is half open: requests go through again and
+    the next success closes it, the next failure reopens it.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._hosts: Dict[str, list] = {}  # host -> [consecutive failures, opened at or None]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlparse(url).netloc or url
+
+    def allow(self, url: str) -> bool:
+        return self.state(url) != OPEN
+
+    def state(self, url: str) -> str:
+        with self._lock:
+            failures, opened_at = self._hosts.get(self._host(url), (0, None))
+        if opened_at is None:
+            return CLOSED
+        return OPEN if time.monotonic() - opened_at < self.reset_timeout else HALF_OPEN
+
+    def record_success(self, url: str):
+        with self._lock:
+            self._hosts[self._host(url)] = [0, None]
+
+    def record_failure(self, url: str):
+        with self._lock:
+            host = self._host(url)
+            failures, opened_at = self._hosts.get(host, (0, None))
+            failures += 1
+            if failures >= self.failure_threshold:
+                # A failure while half open restarts the wait
+                opened_at = time.monotonic()
+            self._hosts[host] = [failures, opened_at]
+
+    def snapshot(self, url: str) -> Dict[str, Any]:
+        state = self.state(url)
+        with self._lock:
+            failures = self._hosts.get(self._host(url), (0, None))[0]
+        return {'state': state, 'consecutive_failures': failures}
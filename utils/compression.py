@@ -0,0 +1,116 @@
+import struct
+import zlib
+from typing import List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib (with a preset dictionary) is used without it
+    zstandard = None
+
+# Blob layout: MAGIC, codec id (1 byte), dictionary id (4 bytes, 0 = none), payload
+MAGIC = b'\xcd'
+HEADER = struct.Struct('>cBI')
+CODECS = {'zlib': 1, 'zstd': 2}
+CODEC_NAMES = {value: name for name, value in CODECS.items()}
+
+# zlib only looks back 32KB, so a larger preset dictionary is wasted
+ZLIB_MAX_DICTIONARY = 32 * 1024
+
+def available_algorithms() -> List[str]:
+    """Algorithms usable in this environment"""
+    return ['zstd', 'zlib'] if zstandard is not None else ['zlib']
+
+def resolve_algorithm(name: str) -> Optional[str]:
+    """
+    Map a RESPONSE_COMPRESSION setting to an algorithm
+    Returns: 'zstd', 'zlib' or None when compression is off
+    """
+    name = (name or 'off').lower()
+    if name in ('off', 'none', 'false', ''):
+        return None
+    if name == 'auto':
+        return available_algorithms()[0]
+    if name not in CODECS:
+        raise ValueError(f"Unknown compression algorithm '{name}'")
+    if name == 'zstd' and zstandard is None:
+        raise ValueError("Compression 'zstd' requested but zstandard is not installed")
+    return name
+
+def is_compressed(blob: Optional[bytes]) -> bool:
+    return bool(blob) and len(blob) >= HEADER.size and blob[:1] == MAGIC
+
+def read_header(blob: bytes) -> Tuple[str, int]:
+    """
+    Returns: (algorithm, dictionary id) of a compressed blob
+    """
+    magic, codec, dict_id = HEADER.unpack_from(blob)
+    if magic != MAGIC or codec not in CODEC_NAMES:
+        raise ValueError('Not a compressed response blob')
+    return CODEC_NAMES[codec], dict_id
+
+def compress(text: str, algorithm: str, level: int = 6,
+             dictionary: Optional[bytes] = None, dict_id: int = 0) -> bytes:
+    """Compress text, optionally with a shared trained dictionary"""
+    data = text.encode('utf-8')
+    if not dictionary:
+        dict_id = 0
+
+    if algorithm == 'zstd':
+        zstd_dict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        payload = zstandard.ZstdCompressor(level=level, dict_data=zstd_dict).compress(data)
+    elif algorithm == 'zlib':
+        if dictionary:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 15, 9, zlib.Z_DEFAULT_STRATEGY,
+                                          dictionary[-ZLIB_MAX_DICTIONARY:])
+        else:
+            compressor = zlib.compressobj(level)
+        payload = compressor.compress(data) + compressor.flush()
+    else:
+        raise ValueError(f"Unknown compression algorithm '{algorithm}'")
+
+    return HEADER.pack(MAGIC, CODECS[algorithm], dict_id) + payload
+
+def decompress(blob: bytes, dictionary: Optional[bytes] = None) -> str:
+    """Decompress a blob produced by compress(); pass the dictionary it names"""
+    algorithm, dict_id = read_header(blob)
+    payload = memoryview(blob)[HEADER.size:]
+    if dict_id and not dictionary:
+        raise ValueError(f'Compression dictionary {dict_id} is required')
+
+    if algorithm == 'zstd':
+        if zstandard is None:
+            raise ValueError('zstandard is required to read this response')
+        zstd_dict = zstandard.ZstdCompressionDict(dictionary) if dict_id else None
+        data = zstandard.ZstdDecompressor(dict_data=zstd_dict).decompressobj().decompress(payload)
+    else:
+        if dict_id:
+            decompressor = zlib.decompressobj(zdict=dictionary[-ZLIB_MAX_DICTIONARY:])
+        else:
+            decompressor = zlib.decompressobj()
+        data = decompressor.decompress(payload) + decompressor.flush()
+    return data.decode('utf-8')
+
+def train_dictionary(samples: List[bytes], algorithm: str, size: int = 64 * 1024) -> Optional[bytes]:
+    """
+    Build a shared dictionary from sample payloads. Returns None when there
+    are too few samples to train on.
+    """
+    samples = [sample for sample in samples if sample]
+    if not samples:
+        return None
+
+    if algorithm == 'zstd':
+        try:
+            return zstandard.train_dictionary(size, samples).as_bytes()
+        except zstandard.ZstdError:
+            return None
+
+    # zlib has no trainer: a preset dictionary is just bytes the compressor
+    # may reference, most cheaply near its end. Pack recent samples.
+    dictionary = b''
+    limit = min(size, ZLIB_MAX_DICTIONARY)
+    for sample in samples:
+        dictionary = (sample + dictionary)[-limit:]
+        if len(dictionary) >= limit:
+            break
+    return dictionary
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import urljoin
+
+logger = logging.getLogger(__name__)
+
+# Where court portals keep their case search, most likely first
+CANDIDATE_PATHS = (
+    '/case_status',
+    '/case-status',
+    '/case_status.asp',
+    '/case_status.php',
+    '/case_status.html',
+    '/search',
+    '/case-search',
+    '/status',
+    '/',
+)
+# A page without a search form is still a fallback if it mentions these
+COURT_KEYWORDS = ('case', 'search', 'status', 'court')
+
+# Probe ranks: lower wins, ties go to the earlier candidate
+HAS_FORM, COURT_PAGE = 0, 1
+
+class FormLocation(NamedTuple):
+    """Where a portal's case search lives and what its form submits"""
+    page_url: str
+    action_url: Optional[str]  # None when the page has no search form
+    method: str
+    field_names: Tuple[str, ...]
+
+def describe_form(page_url: str, form_info: Optional[Dict[str, Any]]) -> FormLocation:
+    """FormLocation of a find_search_form() result found on page_url"""
+    if not form_info:
+        return FormLocation(page_url, None, 'get', ())
+    form = form_info['form']
+    names = [field.get('name') for field in form.find_all(['input', 'select', 'textarea'])]
+    return FormLocation(page_url, urljoin(page_url, form_info.get('action') or ''),
+                        (form_info.get('method') or 'post').lower(),
+                        tuple(dict.fromkeys(name for name in names if name)))
+
+def probe_status_page(url: str, fetch: Callable[[str], Any], parse: Callable[[Any], Any],
+                      find_search_form: Callable[[Any], Optional[Dict[str, Any]]]) -> Optional[Tuple[int, tuple]]:
+    """
+    Rank a candidate status page for probe_concurrently: (HAS_FORM or
+    COURT_PAGE, (FormLocation, soup)), or None for an unusable page.
+    fetch(url) returns the response, parse(response) its soup.
+    """
+    logger.info(f"Trying URL: {url}")
+    response = fetch(url)
+    if response.status_code != 200:
+        return None
+    soup = parse(response)
+
+    # A page with a search form wins; a court page without one may still link to it
+    form_info = find_search_form(soup)
+    if form_info:
+        return HAS_FORM, (describe_form(url, form_info), soup)
+    if any(keyword in response.text.lower() for keyword in COURT_KEYWORDS):
+        return COURT_PAGE, (describe_form(url, None), soup)
+    return None
+
+class FormDiscoveryCache:
+    """
+    Discovered search form per portal, for `ttl` seconds, so searches do not
+    walk the candidate URLs every time. Callers invalidate an entry when the
+    cached page or form stops working.
+    """
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[FormLocation, float]] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, key: str) -> Optional[FormLocation]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self.stats['hits'] += 1
+                return entry[0]
+            self._entries.pop(key, None)
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key: str, location: FormLocation):
+        with self._lock:
+            self._entries[key] = (location, time.monotonic() + self.ttl)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.stats['invalidations'] += 1
+
+_PENDING = object()
+
+def probe_concurrently(probe: Callable[[str], Optional[Tuple[int, Any]]], urls: Sequence[str],
+                       max_workers: Optional[int] = None, timeout: Optional[float] = None) -> Optional[Any]:
+    """
+    Run probe(url) for all urls at once and return the payload of the best
+    result: lowest rank, then earliest url, i.e. what trying them one by one
+    would have found. Returns as soon as the winner is certain, or with the
+    best result so far after `timeout` seconds; stragglers are abandoned.
+    probe returns (rank, payload), or None for an unusable page.
+    """
+    results: List[Any] = [_PENDING] * len(urls)
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(urls) or 1,
+                                  thread_name_prefix='form-probe')
+    futures = {executor.submit(probe, url): index for index, url in enumerate(urls)}
+    pending = set(futures)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        while pending:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                logger.warning(f"Probing gave up after {timeout}s with {len(pending)} URLs unanswered")
+                break
+            for future in done:
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    logger.warning(f"Failed to access {urls[index]}: {e}")
+                    results[index] = None
+            # A form on a candidate wins once every earlier one has answered
+            for result in results:
+                if result is _PENDING:
+                    break
+                if result is not None and result[0] == HAS_FORM:
+                    return result[1]
+        answered = [(result[0], index, result[1]) for index, result in enumerate(results)
+                    if result is not _PENDING and result is not None]
+        return min(answered, key=lambda item: item[:2])[2] if answered else None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
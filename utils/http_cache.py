@@ -0,0 +1,142 @@
+import hashlib
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, NamedTuple, Optional
+
+import requests
+
+from utils.sqlite_pool import SQLiteConnectionPool
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS http_cache ("
+    "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, sha256 TEXT NOT NULL, "
+    "encoding TEXT, body BLOB NOT NULL, fetched_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_http_cache_fetched_at ON http_cache (fetched_at)",
+)
+
+class PortalResponse(NamedTuple):
+    """
+    Body of a portal GET, from the network or the cache. A 304 is reported
+    as a 200 with not_modified set, so callers can treat both alike.
+    """
+    url: str
+    status_code: int
+    content: bytes
+    encoding: Optional[str]
+    elapsed: timedelta
+    sha256: Optional[str] = None
+    not_modified: bool = False  # the portal answered 304 to a conditional request
+    from_cache: bool = False    # served locally, no request was sent
+    unchanged: bool = False     # same body as the previous fetch of this URL
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+class HTTPValidatorCache:
+    """
+    Last body and validators (ETag, Last-Modified, SHA-256 of the body) of
+    each portal URL, in a small SQLite file of its own.
+
+    fetch() revalidates with If-None-Match / If-Modified-Since, so a page
+    the portal has not changed costs a 304. Pages the portal sends without
+    validators are still downloaded, but an identical body is recognised by
+    its hash, not rewritten, and flagged `unchanged` so callers can skip
+    parsing it. Within `max_age` seconds of the last fetch a page is served
+    locally without asking. At most `max_entries` URLs are kept, least
+    recently fetched dropped first. With no path nothing is stored and
+    fetch() is a plain GET.
+    """
+
+    def __init__(self, path: Optional[str], max_age: float = 0, max_entries: int = 2000):
+        self.path = path
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.pool = SQLiteConnectionPool(path, SCHEMA) if path is not None else None
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'not_modified': 0, 'unchanged': 0, 'served_locally': 0}
+
+    def connect(self):
+        """A pooled connection, as a context manager"""
+        return self.pool.connection()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self.connect() as connection:
+            row = connection.execute(
+                'SELECT etag, last_modified, sha256, encoding, body, fetched_at FROM http_cache WHERE url = ?',
+                (url,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('etag', 'last_modified', 'sha256', 'encoding', 'body', 'fetched_at'), row))
+
+    def fetch(self, session: requests.Session, url: str, timeout: float = 30,
+              max_age: Optional[float] = None) -> PortalResponse:
+        """
+        GET url, conditionally when a previous body is cached
+        max_age: seconds a cached body is served without a request (default: the cache's)
+        """
+        self._count('requests')
+        if self.path is None:
+            response = session.get(url, timeout=timeout)
+            return PortalResponse(url, response.status_code, response.content,
+                                  response.encoding, response.elapsed)
+
+        max_age = self.max_age if max_age is None else max_age
+        entry = self.get(url)
+        if entry is not None and max_age and time.time() - entry['fetched_at'] < max_age:
+            self._count('served_locally')
+            return PortalResponse(url, 200, entry['body'], entry['encoding'], timedelta(0),
+                                  entry['sha256'], from_cache=True, unchanged=True)
+
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        response = session.get(url, timeout=timeout, headers=headers)
+
+        if response.status_code == 304 and entry is not None:
+            self._count('not_modified')
+            self._touch(url, response)
+            return PortalResponse(url, 200, entry['body'], entry['encoding'], response.elapsed,
+                                  entry['sha256'], not_modified=True, unchanged=True)
+        if response.status_code != 200:
+            return PortalResponse(url, response.status_code, response.content,
+                                  response.encoding, response.elapsed)
+
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        encoding = response.encoding or response.apparent_encoding
+        if entry is not None and entry['sha256'] == digest:
+            self._count('unchanged')
+            self._touch(url, response)
+            return PortalResponse(url, 200, content, encoding, response.elapsed, digest, unchanged=True)
+
+        self._store(url, response, digest, encoding, content)
+        return PortalResponse(url, 200, content, encoding, response.elapsed, digest)
+
+    def _touch(self, url: str, response: requests.Response):
+        """Restart the entry's age, taking any new validators the portal sent"""
+        with self.connect() as connection, connection:
+            connection.execute(
+                'UPDATE http_cache SET fetched_at = ?, etag = COALESCE(?, etag), '
+                'last_modified = COALESCE(?, last_modified) WHERE url = ?',
+                (time.time(), response.headers.get('ETag'), response.headers.get('Last-Modified'), url))
+
+    def _store(self, url: str, response: requests.Response, digest: str,
+               encoding: Optional[str], content: bytes):
+        with self.connect() as connection, connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO http_cache (url, etag, last_modified, sha256, encoding, body, fetched_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                 digest, encoding, content, time.time()))
+            connection.execute(
+                'DELETE FROM http_cache WHERE url NOT IN '
+                '(SELECT url FROM http_cache ORDER BY fetched_at DESC LIMIT ?)', (self.max_entries,))
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
@@ -0,0 +1,99 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import func, tuple_
+
+# Cursor directions: 'next' walks towards older rows, 'prev' towards newer ones
+NEXT = 'next'
+PREV = 'prev'
+
+class KeysetPage:
+    """One page of a keyset (cursor) paginated, newest-first listing"""
+
+    def __init__(self, items: List[Any], next_cursor: Optional[str], prev_cursor: Optional[str]):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+def encode_cursor(timestamp: datetime, row_id: int, direction: str = NEXT) -> str:
+    """
+    Encode a keyset position as an opaque, URL-safe cursor
+    """
+    payload = json.dumps([direction, timestamp.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, datetime, int]:
+    """
+    Decode a cursor produced by encode_cursor
+    Returns: (direction, timestamp, row_id); raises ValueError if malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in (NEXT, PREV) or not isinstance(row_id, int):
+            raise ValueError('bad cursor fields')
+        return direction, datetime.fromisoformat(timestamp), row_id
+    except Exception as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
+
+def keyset_paginate(query, timestamp_column, id_column, per_page: int,
+                    cursor: Optional[str] = None) -> KeysetPage:
+    """
+    Paginate query newest-first on (timestamp_column, id_column).
+    Each page is an index range scan from the cursor position, so the cost
+    does not grow with the page number or the size of the table, and no
+    COUNT(*) is issued.
+    """
+    key = tuple_(timestamp_column, id_column)
+    direction, position = NEXT, None
+    if cursor:
+        direction, timestamp, row_id = decode_cursor(cursor)
+        position = (timestamp, row_id)
+
+    if direction == NEXT:
+        if position is not None:
+            query = query.filter(key < position)
+        query = query.order_by(timestamp_column.desc(), id_column.desc())
+    else:
+        query = query.filter(key > position).order_by(timestamp_column.asc(), id_column.asc())
+
+    # Fetch one extra row to learn whether another page exists
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == PREV:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage([], None, None)
+
+    first, last = rows[0], rows[-1]
+    older_exists = has_more if direction == NEXT else True
+    newer_exists = position is not None if direction == NEXT else has_more
+
+    def key_of(row):
+        return getattr(row, timestamp_column.key), getattr(row, id_column.key)
+
+    next_cursor = encode_cursor(*key_of(last), NEXT) if older_exists else None
+    prev_cursor = encode_cursor(*key_of(first), PREV) if newer_exists else None
+    return KeysetPage(rows, next_cursor, prev_cursor)
+
+def approximate_row_count(session, id_column) -> int:
+    """
+    Cheap row-count estimate from the primary key span (two index lookups
+    instead of a full COUNT(*) scan). Exact until rows are deleted.
+    """
+    low, high = session.query(func.min(id_column), func.max(id_column)).one()
+    if low is None:
+        return 0
+    return high - low + 1
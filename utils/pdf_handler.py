@@ -1,17 +1,59 @@
 import os
 import requests
-import PyPDF2
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 import hashlib
+import json
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, urljoin
 import logging
 
+from utils.retry import RETRYABLE_ERRORS, RetryPolicy, clip_timeout
+from utils.pdf_metadata import PdfMetadataCache, read_pdf_metadata, iter_page_text, first_page_text
+from utils.pdf_preview import (PREVIEW_CHARS, PREVIEW_SUFFIX, build_preview, render_thumbnail,
+                               sidecar_paths, thumbnail_path, write_atomically)
+
+try:
+    import fcntl
+except ImportError:  # Windows: partial downloads are only locked per process
+    fcntl = None
+
+DIGEST_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+def is_digest(value: Optional[str]) -> bool:
+    """True for a lowercase hex SHA-256, the only names the store uses"""
+    return bool(value) and DIGEST_PATTERN.fullmatch(value) is not None
+
+class _RangeNotHonoured(Exception):
+    """The server answered a Range request with the whole (possibly changed) file"""
+
 class PDFHandler:
     """Handler for downloading and processing PDF files"""
     
-    def __init__(self, download_folder: str = "static/downloads"):
+    def __init__(self, download_folder: str = "static/downloads", max_retries: int = 3,
+                 backoff: float = 1.0, parallel_chunks: int = 1,
+                 parallel_min_bytes: int = 8 * 1024 * 1024, timeout=(10, 30),
+                 retry_policy: Optional[RetryPolicy] = None):
         self.download_folder = download_folder
+        # Interrupted downloads are kept here with their validators and resumed
+        self.partial_folder = os.path.join(download_folder, '.partial')
+        self.max_retries = max_retries
+        # Downloads take long, so their deadline is generous; it bounds the
+        # retries, not a transfer that is making progress
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries + 1, backoff=backoff,
+                                                        deadline=300)
+        self.parallel_chunks = parallel_chunks
+        self.parallel_min_bytes = parallel_min_bytes
+        self.timeout = timeout
+        self._locks: Dict[str, threading.Lock] = {}
+        self._partial_locks: Dict[str, list] = {}  # key -> [lock, users]
+        self._locks_guard = threading.Lock()
+        self.metadata_cache = PdfMetadataCache()
         self.ensure_download_folder()
         
     def ensure_download_folder(self):
@@ -19,121 +61,496 @@ class PDFHandler:
         if not os.path.exists(self.download_folder):
             os.makedirs(self.download_folder, exist_ok=True)
     
-    def download_pdf(self, url: str, session: requests.Session = None) -> Dict[str, Any]:
+    def blob_path(self, digest: str) -> str:
+        """Path of the blob for a SHA-256 digest, sharded as ab/cd/abcd...pdf"""
+        return os.path.join(self.download_folder, digest[:2], digest[2:4], f"{digest}.pdf")
+    
+    def has_blob(self, digest: str) -> bool:
+        return is_digest(digest) and os.path.isfile(self.blob_path(digest))
+    
+    def store_blob(self, temp_path: str, digest: str):
+        """
+        Move a fully written temp file into the store under its digest
+        Returns: (blob path, True if an identical blob was already stored)
+        """
+        local_path = self.blob_path(digest)
+        if os.path.exists(local_path):
+            os.remove(temp_path)
+            return local_path, True
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        os.replace(temp_path, local_path)
+        return local_path, False
+    
+    def delete_blob(self, digest: str) -> bool:
+        """Remove a blob (and its previews) from the store; returns False if it was not there"""
+        if not is_digest(digest):
+            return False
+        for path in sidecar_paths(self.blob_path(digest)):
+            if os.path.exists(path):
+                os.remove(path)
+        try:
+            os.remove(self.blob_path(digest))
+            return True
+        except FileNotFoundError:
+            return False
+    
+    def _request_headers(self, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        # Set headers to mimic browser. PDFs are already compressed, and byte
+        # ranges only line up with an identity-encoded body.
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept': 'application/pdf,application/octet-stream,*/*',
+            'Accept-Language': 'en-US,en;q=0.9',
+            'Accept-Encoding': 'identity',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+        }
+        headers.update(extra or {})
+        return headers
+    
+    def _filename_for(self, url: str) -> str:
+        """The portal's filename for the user; the file itself is stored by digest"""
+        filename = os.path.basename(urlparse(url).path)
+        if not filename or not filename.lower().endswith('.pdf'):
+            filename = 'document.pdf'
+        return filename
+    
+    def _validators(self, response) -> Dict[str, Any]:
+        """What a resumed request needs to know it continues the same file"""
+        length = None
+        if response.headers.get('content-encoding', 'identity').lower() == 'identity':
+            try:
+                length = int(response.headers['content-length'])
+            except (KeyError, ValueError):
+                pass
+        return {
+            'etag': response.headers.get('etag'),
+            'last_modified': response.headers.get('last-modified'),
+            'length': length,
+            'accept_ranges': response.headers.get('accept-ranges', '').lower() == 'bytes',
+        }
+    
+    def _timeout_until(self, deadline: float):
+        """self.timeout cut to what is left of a download's deadline"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.exceptions.Timeout('Download ran out of time')
+        return clip_timeout(self.timeout, remaining)
+    
+    def _request_range(self, session, url: str, start: int, end: Optional[int],
+                       validators: Dict[str, Any], deadline: float):
+        """
+        GET bytes start..end, but only if the file is unchanged (If-Range),
+        with a timeout cut to the download's deadline
+        Returns: the 206 response, or None when the file ends at start
+        Raises _RangeNotHonoured when the server sends the whole file instead
         """
-        Download PDF from URL
-        Returns: Dict with status, local_path, filename, file_size, error_message
+        extra = {'Range': f"bytes={start}-{'' if end is None else end}"}
+        # Weak ETags cannot be used with If-Range
+        if validators.get('etag') and not validators['etag'].startswith('W/'):
+            extra['If-Range'] = validators['etag']
+        elif validators.get('last_modified'):
+            extra['If-Range'] = validators['last_modified']
+        response = session.get(url, headers=self._request_headers(extra), stream=True,
+                               timeout=self._timeout_until(deadline))
+        if response.status_code == 416 and end is None and \
+                response.headers.get('content-range', '') == f'bytes */{start}':
+            # Nothing after start: the earlier attempt already had every byte
+            response.close()
+            return None
+        response.raise_for_status()
+        if response.status_code != 206:
+            response.close()
+            raise _RangeNotHonoured()
+        return response
+    
+    def open_pdf(self, url: str, session: requests.Session = None) -> Dict[str, Any]:
+        """
+        Request a PDF and check the response without reading the body;
+        transient failures are retried
+        Returns: Dict with status, response, filename, content_length, error_message
         """
         try:
             # Use provided session or create new one
             if session is None:
                 session = requests.Session()
             
-            # Set headers to mimic browser
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'application/pdf,application/octet-stream,*/*',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-            }
-            
-            # Download the PDF
-            response = session.get(url, headers=headers, stream=True, timeout=30)
-            response.raise_for_status()
+            # Resumes in stream_pdf stay within the same deadline
+            deadline = self.retry_policy.new_deadline()
+            opened = self.retry_policy.call(lambda timeout: self._open(url, session, timeout),
+                                            timeout=self.timeout, deadline=deadline,
+                                            description=f'Request for {url}')
+            if opened['status'] == 'success':
+                opened['deadline'] = deadline
+            return opened
             
-            # Check if response is actually a PDF
-            content_type = response.headers.get('content-type', '').lower()
-            if 'pdf' not in content_type and not url.lower().endswith('.pdf'):
-                return {
-                    'status': 'error',
-                    'error_message': 'URL does not point to a PDF file',
-                    'local_path': None,
-                    'filename': None,
-                    'file_size': None
-                }
-            
-            # Generate filename from URL and timestamp
-            parsed_url = urlparse(url)
-            original_filename = os.path.basename(parsed_url.path)
-            if not original_filename or not original_filename.lower().endswith('.pdf'):
-                original_filename = 'document.pdf'
-            
-            # Create unique filename
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename_hash = hashlib.md5(url.encode()).hexdigest()[:8]
-            filename = f"{timestamp}_{filename_hash}_{original_filename}"
+        except requests.exceptions.RequestException as e:
+            return self._download_error(f'Download failed: {str(e)}')
+        except Exception as e:
+            return self._download_error(f'Unexpected error: {str(e)}')
+    
+    def _open(self, url: str, session, timeout) -> Dict[str, Any]:
+        """One attempt at open_pdf; raises on request errors so the caller's retry loop sees them"""
+        response = session.get(url, headers=self._request_headers(), stream=True, timeout=timeout)
+        response.raise_for_status()
+        
+        # Check if response is actually a PDF
+        content_type = response.headers.get('content-type', '').lower()
+        if 'pdf' not in content_type and not url.lower().endswith('.pdf'):
+            response.close()
+            return self._download_error('URL does not point to a PDF file')
+        
+        validators = self._validators(response)
+        return {
+            'status': 'success',
+            'url': url,
+            'session': session,
+            'response': response,
+            'validators': validators,
+            'filename': self._filename_for(url),
+            'content_length': validators['length'],
+            'error_message': None
+        }
+    
+    def stream_pdf(self, opened: Dict[str, Any],
+                   on_complete: Optional[Callable[[Dict[str, Any]], None]] = None) -> Iterator[bytes]:
+        """
+        Yield the body of a response from open_pdf() chunk by chunk while
+        hashing it into a temp file, so a caller can forward bytes as they
+        arrive. If the connection drops mid-body and the server supports
+        ranges, the rest is requested from where it stopped. Once the body
+        is complete the file is moved into the store and on_complete gets
+        the same result dict download_pdf() returns.
+        If the consumer stops early (client abort) the partial file is
+        deleted and the upstream connection closed.
+        """
+        response = opened['response']
+        validators = opened.get('validators') or {}
+        deadline = opened.get('deadline') or self.retry_policy.new_deadline()
+        digest = hashlib.sha256()
+        received = 0
+        resumes = 0
+        # A private temp file per download, so concurrent downloads of the
+        # same URL never interleave writes
+        fd, temp_path = tempfile.mkstemp(suffix='.part', dir=self.download_folder)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    try:
+                        for chunk in response.iter_content(chunk_size=8192):
+                            digest.update(chunk)
+                            f.write(chunk)
+                            received += len(chunk)
+                            yield chunk
+                        break
+                    except RETRYABLE_ERRORS as e:
+                        if not validators.get('accept_ranges'):
+                            raise
+                        delay = self.retry_policy.allow_retry(resumes, deadline)
+                        if delay is None:
+                            raise
+                        response.close()
+                        time.sleep(delay)
+                        resumes += 1
+                        logging.warning(f"Resuming {opened['url']} at byte {received} after: {str(e)}")
+                        rest = self._request_range(opened['session'], opened['url'], received,
+                                                   None, validators, deadline)
+                        if rest is None:
+                            # Nothing after `received`: the body was already complete
+                            break
+                        response = rest
+            if validators.get('length') is not None and received != validators['length']:
+                raise requests.exceptions.ChunkedEncodingError(
+                    f"Expected {validators['length']} bytes, received {received}")
+            local_path, deduplicated = self.store_blob(temp_path, digest.hexdigest())
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            response.close()
+        
+        if on_complete is not None:
+            on_complete({
+                'status': 'success',
+                'local_path': local_path,
+                'filename': opened['filename'],
+                'file_size': os.path.getsize(local_path),
+                'digest': digest.hexdigest(),
+                'deduplicated': deduplicated,
+                'error_message': None
+            })
+    
+    def download_pdf(self, url: str, session: requests.Session = None) -> Dict[str, Any]:
+        """
+        Download PDF from URL into the content-addressed store. Interrupted
+        transfers are retried with backoff and resume from the bytes already
+        on disk (HTTP Range + If-Range); big files may be fetched as
+        parallel ranges.
+        Returns: Dict with status, local_path, filename, file_size, digest,
+        deduplicated, error_message
+        """
+        if session is None:
+            session = requests.Session()
+        
+        try:
+            # Each attempt resumes from what the previous ones left on disk;
+            # all their requests, resumes and parallel ranges included, share
+            # one deadline
+            deadline = self.retry_policy.new_deadline()
+            return self.retry_policy.call(lambda timeout: self._download_resumable(url, session, deadline),
+                                          timeout=self.timeout, deadline=deadline,
+                                          description=f'Download of {url}')
+        except requests.exceptions.RequestException as e:
+            return self._download_error(f'Download failed: {str(e)}')
+        except Exception as e:
+            return self._download_error(f'Unexpected error: {str(e)}')
+    
+    @contextmanager
+    def _partial_lock(self, key: str):
+        """
+        Hold the partial download for key, or yield False if another download
+        of the same URL has it. The in-process lock is dropped once nobody
+        uses it, and the lock file once the partial download is gone.
+        """
+        with self._locks_guard:
+            entry = self._partial_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        acquired = entry[0].acquire(blocking=False)
+        handle = None
+        try:
+            if not acquired:
+                yield False
+                return
+            if fcntl is not None:
+                lock_path = os.path.join(self.partial_folder, f"{key}.lock")
+                handle = open(lock_path, 'a')
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    # The previous holder may have removed the file after we opened it
+                    if os.stat(lock_path).st_ino != os.fstat(handle.fileno()).st_ino:
+                        raise FileNotFoundError(lock_path)
+                except OSError:
+                    handle.close()
+                    handle = None
+                    yield False
+                    return
+            yield True
+        finally:
+            if handle is not None:
+                if not os.path.exists(os.path.join(self.partial_folder, f"{key}.json")):
+                    os.remove(handle.name)
+                handle.close()
+            if acquired:
+                entry[0].release()
+            with self._locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    self._partial_locks.pop(key, None)
+    
+    def _download_resumable(self, url: str, session, deadline: float) -> Dict[str, Any]:
+        """
+        One attempt at download_pdf; leaves the partial file behind on failure.
+        Request errors are raised, not retried here: download_pdf's retry
+        loop is the only one, and every request's timeout is cut to `deadline`.
+        """
+        os.makedirs(self.partial_folder, exist_ok=True)
+        key = hashlib.sha256(url.encode()).hexdigest()
+        part_path = os.path.join(self.partial_folder, f"{key}.part")
+        state_path = os.path.join(self.partial_folder, f"{key}.json")
+        
+        with self._partial_lock(key) as locked:
+            if not locked:
+                # Someone else is resuming this URL; download privately instead
+                opened = self._open(url, session, self._timeout_until(deadline))
+                if opened['status'] != 'success':
+                    return opened
+                opened['deadline'] = deadline
+                result = {}
+                for _ in self.stream_pdf(opened, on_complete=result.update):
+                    pass
+                return result
             
-            local_path = os.path.join(self.download_folder, filename)
+            state = self._load_state(state_path, part_path, url)
+            resumed = state is not None
+            if not resumed:
+                opened = self._open(url, session, self._timeout_until(deadline))
+                if opened['status'] != 'success':
+                    return opened
+                state = self._start_download(opened, part_path, state_path)
             
-            # Save the PDF
-            with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            try:
+                if state['ranges'] is not None:
+                    self._fetch_ranges(session, state, part_path, state_path, deadline)
+                elif resumed:
+                    self._resume_sequential(session, state, part_path, deadline)
+            except _RangeNotHonoured:
+                # The file changed (or ranges stopped working): start over
+                self._discard_partial(part_path, state_path)
+                raise requests.exceptions.ConnectionError(f'{url} changed during download, restarting')
             
-            file_size = os.path.getsize(local_path)
+            if state['length'] is not None and os.path.getsize(part_path) != state['length']:
+                raise requests.exceptions.ChunkedEncodingError(
+                    f"Expected {state['length']} bytes, have {os.path.getsize(part_path)}")
             
+            digest = self._hash_file(part_path)
+            local_path, deduplicated = self.store_blob(part_path, digest)
+            os.remove(state_path)
             return {
                 'status': 'success',
                 'local_path': local_path,
-                'filename': filename,
-                'file_size': file_size,
+                'filename': state['filename'],
+                'file_size': os.path.getsize(local_path),
+                'digest': digest,
+                'deduplicated': deduplicated,
                 'error_message': None
             }
-            
-        except requests.exceptions.RequestException as e:
-            return {
-                'status': 'error',
-                'error_message': f'Download failed: {str(e)}',
-                'local_path': None,
-                'filename': None,
-                'file_size': None
-            }
-        except Exception as e:
-            return {
-                'status': 'error',
-                'error_message': f'Unexpected error: {str(e)}',
-                'local_path': None,
-                'filename': None,
-                'file_size': None
-            }
     
-    def extract_pdf_metadata(self, file_path: str) -> Dict[str, Any]:
+    def _start_download(self, opened: Dict[str, Any], part_path: str, state_path: str) -> Dict[str, Any]:
+        """Record validators for a fresh download and start writing it"""
+        validators = opened['validators']
+        response = opened['response']
+        state = dict(validators, url=opened['url'], filename=opened['filename'], ranges=None)
+        length = validators['length']
+        
+        if (self.parallel_chunks > 1 and validators['accept_ranges'] and length
+                and length >= self.parallel_min_bytes):
+            # Big file: fetch it as parallel ranges into a preallocated file
+            response.close()
+            chunk = -(-length // self.parallel_chunks)
+            state['ranges'] = [[start, min(start + chunk, length) - 1, 0]
+                               for start in range(0, length, chunk)]
+            with open(part_path, 'wb') as f:
+                f.truncate(length)
+            self._save_state(state_path, state)
+            return state
+        
+        with open(part_path, 'wb'):
+            pass
+        self._save_state(state_path, state)
+        self._append_body(response, part_path)
+        return state
+    
+    def _append_body(self, response, part_path: str):
+        try:
+            with open(part_path, 'ab') as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+        finally:
+            response.close()
+    
+    def _resume_sequential(self, session, state: Dict[str, Any], part_path: str, deadline: float):
+        """Fetch whatever is missing after the bytes already in the partial file"""
+        received = os.path.getsize(part_path)
+        if state['length'] is not None and received >= state['length']:
+            return
+        if not received:
+            self._append_body(self._request_range(session, state['url'], 0, None, state, deadline), part_path)
+            return
+        if not state['accept_ranges']:
+            raise _RangeNotHonoured()
+        response = self._request_range(session, state['url'], received, None, state, deadline)
+        if response is not None:
+            self._append_body(response, part_path)
+    
+    def _fetch_ranges(self, session, state: Dict[str, Any], part_path: str, state_path: str, deadline: float):
+        """Fetch the unfinished ranges concurrently, checkpointing progress"""
+        pending = [byte_range for byte_range in state['ranges'] if byte_range[0] + byte_range[2] <= byte_range[1]]
+        if not pending:
+            return
+        state_lock = threading.Lock()
+        
+        def fetch(byte_range: List[int]):
+            start, end, done = byte_range
+            response = self._request_range(session, state['url'], start + done, end, state, deadline)
+            since_checkpoint = 0
+            try:
+                with open(part_path, 'r+b') as f:
+                    f.seek(start + done)
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        f.write(chunk)
+                        since_checkpoint += len(chunk)
+                        if since_checkpoint >= 1024 * 1024:
+                            # Only count bytes that reached the file
+                            f.flush()
+                            with state_lock:
+                                byte_range[2] += since_checkpoint
+                                self._save_state(state_path, state)
+                            since_checkpoint = 0
+                    f.flush()
+                with state_lock:
+                    byte_range[2] += since_checkpoint
+            finally:
+                response.close()
+                with state_lock:
+                    self._save_state(state_path, state)
+            if byte_range[0] + byte_range[2] != end + 1:
+                raise requests.exceptions.ChunkedEncodingError(f'Range {start}-{end} ended early')
+        
+        with ThreadPoolExecutor(max_workers=min(self.parallel_chunks, len(pending))) as pool:
+            for future in [pool.submit(fetch, byte_range) for byte_range in pending]:
+                future.result()
+    
+    def _load_state(self, state_path: str, part_path: str, url: str) -> Optional[Dict[str, Any]]:
+        """Validators and progress of an earlier attempt at url, if any"""
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('url') != url or not os.path.exists(part_path):
+            self._discard_partial(part_path, state_path)
+            return None
+        return state
+    
+    def _save_state(self, state_path: str, state: Dict[str, Any]):
+        temp_path = f"{state_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, state_path)
+    
+    def _discard_partial(self, part_path: str, state_path: str):
+        for path in (part_path, state_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def _hash_file(self, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _download_error(self, message: str) -> Dict[str, Any]:
+        return {
+            'status': 'error',
+            'error_message': message,
+            'local_path': None,
+            'filename': None,
+            'file_size': None
+        }
+    
+    def extract_pdf_metadata(self, file_path: str, include_preview: bool = True) -> Dict[str, Any]:
         """
-        Extract metadata from PDF file
+        Extract metadata from PDF file. Only the trailer, xref and document
+        info are read; page text is extracted (first page only) when
+        include_preview is set.
         Returns: Dict with metadata or error information
         """
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                # Get basic info
-                info = pdf_reader.metadata
-                num_pages = len(pdf_reader.pages)
-                
-                # Extract text from first page for preview
-                first_page_text = ""
-                if num_pages > 0:
-                    try:
-                        first_page = pdf_reader.pages[0]
-                        first_page_text = first_page.extract_text()[:500]  # First 500 chars
-                    except:
-                        first_page_text = "Text extraction failed"
-                
-                return {
-                    'status': 'success',
-                    'num_pages': num_pages,
-                    'title': info.get('/Title', 'Unknown'),
-                    'author': info.get('/Author', 'Unknown'),
-                    'subject': info.get('/Subject', ''),
-                    'creator': info.get('/Creator', ''),
-                    'producer': info.get('/Producer', ''),
-                    'creation_date': info.get('/CreationDate', ''),
-                    'modification_date': info.get('/ModDate', ''),
-                    'first_page_preview': first_page_text,
-                    'error_message': None
-                }
+            metadata = read_pdf_metadata(file_path)
+            metadata['title'] = metadata['title'] or 'Unknown'
+            metadata['author'] = metadata['author'] or 'Unknown'
+            
+            preview = ""
+            if include_preview and metadata['num_pages']:
+                try:
+                    preview = first_page_text(file_path, PREVIEW_CHARS)
+                except Exception:
+                    preview = "Text extraction failed"
+            
+            metadata.update(status='success', first_page_preview=preview, error_message=None)
+            return metadata
                 
         except Exception as e:
             return {
@@ -150,6 +567,59 @@ class PDFHandler:
                 'first_page_preview': '',
             }
     
+    def get_blob_metadata(self, digest: str) -> Dict[str, Any]:
+        """
+        Cheap metadata of a stored blob, cached by digest
+        Returns: Dict of fields; raises FileNotFoundError for unknown digests
+        """
+        if not self.has_blob(digest):
+            raise FileNotFoundError(digest)
+        return self.metadata_cache.get(digest, self.blob_path(digest))
+    
+    def get_blob_preview(self, digest: str) -> Dict[str, Any]:
+        """
+        Title, page count and first-page text of a stored blob. Built once
+        per digest and kept next to the blob, so later calls only read a
+        small JSON file.
+        Returns: Dict of fields; raises FileNotFoundError for unknown digests
+        """
+        if not self.has_blob(digest):
+            raise FileNotFoundError(digest)
+        path = self.blob_path(digest)[:-4] + PREVIEW_SUFFIX
+        with self._preview_lock(digest):
+            try:
+                with open(path) as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+            preview = build_preview(self.blob_path(digest))
+            write_atomically(path, json.dumps(preview).encode())
+            return preview
+    
+    def get_blob_thumbnail(self, digest: str, width: int = 240) -> str:
+        """
+        Path of a first-page PNG thumbnail of a stored blob, `width` pixels
+        wide, rendered on first use and kept next to the blob
+        Raises: FileNotFoundError for unknown digests
+        """
+        preview = self.get_blob_preview(digest)
+        path = thumbnail_path(self.blob_path(digest), width)
+        with self._preview_lock(digest):
+            if not os.path.exists(path):
+                write_atomically(path, render_thumbnail(self.blob_path(digest), preview, width))
+        return path
+    
+    def _preview_lock(self, digest: str) -> threading.Lock:
+        """Striped by digest prefix, so a PDF's preview is built once per process"""
+        with self._locks_guard:
+            return self._locks.setdefault(f'preview:{digest[:2]}', threading.Lock())
+    
+    def iter_blob_text(self, digest: str, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """Text of a stored blob, page by page, parsing only pages consumed"""
+        if not self.has_blob(digest):
+            raise FileNotFoundError(digest)
+        return iter_page_text(self.blob_path(digest), start, stop)
+    
     def get_file_info(self, file_path: str) -> Dict[str, Any]:
         """
         Get basic file information
@@ -170,22 +640,30 @@ class PDFHandler:
                 'exists': False
             }
     
-    def cleanup_old_files(self, max_age_days: int = 30):
+    def cleanup_partial_files(self, max_age_days: int = 7) -> int:
         """
-        Clean up old PDF files
+        Remove temp files of aborted downloads and resume state nobody came
+        back for. Only the top of the download folder and .partial are
+        listed; stored PDFs are evicted from the index by PdfStoreCleanup.
+        Returns: number of files removed
         """
-        try:
-            current_time = datetime.now()
-            for filename in os.listdir(self.download_folder):
-                if filename.lower().endswith('.pdf'):
-                    file_path = os.path.join(self.download_folder, filename)
-                    file_time = datetime.fromtimestamp(os.path.getctime(file_path))
-                    
-                    if (current_time - file_time).days > max_age_days:
-                        os.remove(file_path)
-                        logging.info(f"Cleaned up old file: {filename}")
-        except Exception as e:
-            logging.error(f"Error during cleanup: {str(e)}")
+        removed = 0
+        cutoff = time.time() - max_age_days * 24 * 3600
+        for folder in (self.download_folder, self.partial_folder):
+            try:
+                entries = list(os.scandir(folder))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if not entry.name.endswith(('.part', '.json', '.tmp')) or not entry.is_file():
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError as e:
+                    logging.warning(f"Could not remove {entry.path}: {str(e)}")
+        return removed
     
     def format_file_size(self, size_bytes: int) -> str:
         """
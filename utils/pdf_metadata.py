@@ -0,0 +1,111 @@
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import PyPDF2
+
+# Document info keys reported by read_pdf_metadata
+INFO_FIELDS = {
+    'title': '/Title',
+    'author': '/Author',
+    'subject': '/Subject',
+    'creator': '/Creator',
+    'producer': '/Producer',
+    'creation_date': '/CreationDate',
+    'modification_date': '/ModDate',
+}
+
+@contextmanager
+def open_pdf_reader(file_path: str):
+    """
+    PdfReader over a memory-mapped file. PyPDF2 only reads the trailer and
+    xref table up front; objects are parsed when first accessed, so with
+    mmap only the pages of the file that are touched are read from disk.
+    """
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise ValueError('Empty file')
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield PyPDF2.PdfReader(mapped, strict=False)
+
+def _page_count(reader) -> int:
+    """Page count from the page tree root, without walking every page"""
+    try:
+        count = reader.trailer['/Root'].get_object()['/Pages'].get_object()['/Count']
+        return int(count)
+    except (KeyError, TypeError, ValueError):
+        return len(reader.pages)
+
+def read_pdf_metadata(file_path: str) -> Dict[str, Any]:
+    """
+    Cheap PDF facts: page count, document info and version, without parsing
+    any page content
+    Returns: Dict of fields; raises on unreadable files
+    """
+    with open_pdf_reader(file_path) as reader:
+        encrypted = reader.is_encrypted
+        info = {}
+        if not encrypted:
+            info = reader.metadata or {}
+        metadata = {field: str(info.get(key, '') or '') for field, key in INFO_FIELDS.items()}
+        metadata.update({
+            'num_pages': _page_count(reader) if not encrypted else None,
+            'pdf_version': reader.pdf_header.replace('%PDF-', '') if reader.pdf_header else '',
+            'encrypted': encrypted,
+            'file_size': os.path.getsize(file_path),
+        })
+        return metadata
+
+def iter_page_text(file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page number, text) for pages start..stop-1, one page at a time;
+    pages after the last one consumed are never parsed
+    """
+    with open_pdf_reader(file_path) as reader:
+        stop = _page_count(reader) if stop is None else min(stop, _page_count(reader))
+        for number in range(start, stop):
+            try:
+                text = reader.pages[number].extract_text() or ''
+            except Exception:
+                text = ''
+            yield number, text
+
+def first_page_text(file_path: str, max_chars: int = 500) -> str:
+    """Text of the first page, truncated; the rest of the file is not parsed"""
+    for _, text in iter_page_text(file_path, 0, 1):
+        return text[:max_chars]
+    return ''
+
+class PdfMetadataCache:
+    """
+    LRU of read_pdf_metadata results keyed by content digest. Blobs never
+    change under a digest, so entries never need invalidating.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, digest: str, file_path: str) -> Dict[str, Any]:
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                self.stats['hits'] += 1
+                return dict(self._entries[digest])
+            self.stats['misses'] += 1
+
+        metadata = read_pdf_metadata(file_path)
+        with self._lock:
+            self._entries[digest] = metadata
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return dict(metadata)
+
+def extract_all_text(file_path: str) -> List[str]:
+    """Text of every page, in order; module-level so process pools can run it"""
+    return [text for _, text in iter_page_text(file_path)]
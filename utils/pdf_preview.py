@@ -0,0 +1,97 @@
+import glob
+import io
+import os
+import tempfile
+import textwrap
+from typing import Any, Dict, List
+
+from utils.pdf_metadata import first_page_text, read_pdf_metadata
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # optional: thumbnails are drawn from the first-page text without it
+    fitz = None
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+# Previews are stored next to the blob they describe: ab/cd/<digest>.preview.json,
+# and one thumbnail per width: ab/cd/<digest>.thumb-240.png
+PREVIEW_SUFFIX = '.preview.json'
+THUMBNAIL_SUFFIX = '.thumb-{width}.png'
+PREVIEW_CHARS = 500
+
+def _sidecar_base(blob_path: str) -> str:
+    return blob_path[:-4] if blob_path.lower().endswith('.pdf') else blob_path
+
+def thumbnail_path(blob_path: str, width: int) -> str:
+    return _sidecar_base(blob_path) + THUMBNAIL_SUFFIX.format(width=width)
+
+def sidecar_paths(blob_path: str) -> List[str]:
+    """Preview files that belong to a stored PDF, to delete along with it"""
+    base = _sidecar_base(blob_path)
+    return [base + PREVIEW_SUFFIX] + sorted(glob.glob(glob.escape(base) + THUMBNAIL_SUFFIX.format(width='*')))
+
+def build_preview(file_path: str, max_chars: int = PREVIEW_CHARS) -> Dict[str, Any]:
+    """
+    Title, page count and first-page text of a PDF; only the first page is
+    parsed
+    """
+    metadata = read_pdf_metadata(file_path)
+    text = ''
+    if metadata['num_pages']:
+        try:
+            text = ' '.join(first_page_text(file_path, max_chars * 2).split())[:max_chars]
+        except Exception:
+            text = ''
+    return {'title': metadata['title'], 'num_pages': metadata['num_pages'], 'text': text}
+
+def thumbnails_available() -> bool:
+    return fitz is not None or Image is not None
+
+def render_thumbnail(file_path: str, preview: Dict[str, Any], width: int = 240) -> bytes:
+    """
+    PNG of the first page, `width` pixels wide. Rasterized with PyMuPDF when
+    installed; otherwise a page-shaped card of the preview text is drawn.
+    """
+    if fitz is not None:
+        with fitz.open(file_path) as document:
+            page = document[0]
+            zoom = width / page.rect.width
+            return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes('png')
+    if Image is None:
+        raise RuntimeError('Thumbnails need Pillow or PyMuPDF')
+
+    height = int(width * 1.414)  # A4 proportions
+    margin = max(8, width // 16)
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    draw.rectangle([0, 0, width - 1, height - 1], outline=(200, 200, 200))
+
+    line_height = 12
+    columns = max(10, (width - 2 * margin) // 6)
+    y = margin
+    for line in textwrap.wrap(preview.get('text') or preview.get('title') or '', columns):
+        if y + line_height > height - margin:
+            break
+        draw.text((margin, y), line, fill=(60, 60, 60), font=font)
+        y += line_height
+
+    output = io.BytesIO()
+    image.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+def write_atomically(path: str, data: bytes):
+    """Write a file so readers never see it half written"""
+    fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
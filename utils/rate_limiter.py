@@ -0,0 +1,50 @@
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+class HostRateLimiter:
+    """
+    Token bucket per host: on average at most `rate` requests per second to
+    any one host, with bursts of up to `burst`. Thread (and greenlet) safe;
+    callers sleep outside the lock.
+    """
+
+    def __init__(self, rate: float = 2.0, burst: int = 2):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, list] = {}  # host -> [tokens, last refill]
+        self._factors: Dict[str, float] = {}  # host -> share of `rate` currently allowed
+        self._lock = threading.Lock()
+
+    def set_rate_factor(self, url: str, factor: float):
+        """Scale the rate for the host of url, e.g. 0.5 while it is degraded"""
+        host = urlparse(url).netloc or url
+        with self._lock:
+            if factor >= 1:
+                self._factors.pop(host, None)
+            else:
+                self._factors[host] = max(factor, 0.05)
+
+    def acquire(self, url: str, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a request slot on the host of url
+        Returns: False if no slot was free within timeout
+        """
+        host = urlparse(url).netloc or url
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                rate = self.rate * self._factors.get(host, 1)
+                tokens, last = self._buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * rate)
+                if tokens >= 1:
+                    self._buckets[host] = [tokens - 1, now]
+                    return True
+                self._buckets[host] = [tokens, now]
+                wait = (1 - tokens) / rate
+
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
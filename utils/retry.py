@@ -0,0 +1,180 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional, Tuple, Union
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Failures worth retrying: the connection dropped or stalled, or the portal
+# is briefly overloaded
+RETRYABLE_ERRORS = (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError)
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+# A requests timeout: seconds, or (connect, read) seconds
+TimeoutValue = Union[float, Tuple[float, float]]
+
+def clip_timeout(timeout: TimeoutValue, remaining: float) -> TimeoutValue:
+    """Cut a timeout (or each part of a connect/read pair) to the time remaining"""
+    if isinstance(timeout, tuple):
+        return tuple(min(part, remaining) for part in timeout)
+    return min(timeout, remaining)
+
+class RetryError(requests.exceptions.RequestException):
+    """A retryable status was still returned when the policy gave up"""
+
+def request_not_sent(error: Exception) -> bool:
+    """
+    True when the request certainly never reached the server (no connection
+    was made), so even a non-idempotent request is safe to send again
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError) or not error.args:
+        return False
+    # urllib3 wraps connect failures (refused, DNS) as MaxRetryError(reason=NewConnectionError)
+    reason = getattr(error.args[0], 'reason', error.args[0])
+    return type(reason).__name__ in ('NewConnectionError', 'NameResolutionError')
+
+class RetryBudget:
+    """
+    Caps retries at `ratio` of the calls made in the last `window` seconds
+    (plus `min_retries` so a quiet process can still retry), so that while
+    the portal is down retries cannot multiply the load on it.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 5, window: float = 10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._calls = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        for events in (self._calls, self._retries):
+            while events and events[0] <= now - self.window:
+                events.popleft()
+
+    def record_call(self):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            self._calls.append(now)
+
+    def try_retry(self) -> bool:
+        """Spend one retry from the budget; False when it is used up"""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._calls):
+                return False
+            self._retries.append(now)
+            return True
+
+class RetryPolicy:
+    """
+    Retries a request on transient failures with jittered exponential
+    backoff, within a deadline covering all attempts and the waits between
+    them. Non-idempotent requests (form POSTs) are only retried when they
+    were never sent. Retries are drawn from a shared RetryBudget, and
+    `stats` counts retries spent and why calls gave up.
+    """
+
+    def __init__(self, max_attempts: int = 3, backoff: float = 1.0, max_backoff: float = 30,
+                 deadline: float = 60, budget: Optional[RetryBudget] = None):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.budget = budget or RetryBudget()
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'retries': 0, 'recovered': 0, 'exhausted': 0,
+                      'budget_exhausted': 0, 'deadline_exceeded': 0, 'retry_wait_seconds': 0.0}
+
+    def new_deadline(self, seconds: Optional[float] = None) -> float:
+        """Monotonic deadline for a group of calls that share one latency budget"""
+        return time.monotonic() + (self.deadline if seconds is None else seconds)
+
+    def delay(self, attempt: int) -> float:
+        """Backoff before retry number attempt + 1: exponential, capped, +/-50% jitter"""
+        return min(self.backoff * (2 ** attempt), self.max_backoff) * random.uniform(0.5, 1.5)
+
+    def is_retryable(self, error: Exception, idempotent: bool = True) -> bool:
+        if not idempotent:
+            return request_not_sent(error)
+        if isinstance(error, (RETRYABLE_ERRORS, RetryError)):
+            return True
+        response = getattr(error, 'response', None)
+        return isinstance(error, requests.exceptions.HTTPError) and response is not None \
+            and response.status_code in RETRYABLE_STATUS
+
+    def allow_retry(self, attempt: int, deadline: Optional[float] = None) -> Optional[float]:
+        """
+        Whether retry number attempt + 1 may go ahead, for callers that run
+        their own loop; the wait is counted as spent
+        Returns: seconds to wait first, or None to give up
+        """
+        delay = self.delay(attempt)
+        if attempt + 1 >= self.max_attempts:
+            self._count('exhausted')
+            return None
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            self._count('deadline_exceeded')
+            return None
+        if not self.budget.try_retry():
+            self._count('budget_exhausted')
+            return None
+        self._count('retries')
+        self._count('retry_wait_seconds', delay)
+        return delay
+
+    def call(self, request: Callable[[TimeoutValue], Any], timeout: TimeoutValue = 30, idempotent: bool = True,
+             deadline: Optional[float] = None, description: str = 'request') -> Any:
+        """
+        Run request(timeout), retrying transient failures. Each attempt's
+        timeout is cut to what is left before the deadline. A response with
+        a retryable status (429, 5xx) is retried like an error; if it is
+        still returned when the policy gives up, it is handed back as is.
+        """
+        deadline = deadline or self.new_deadline()
+        self._count('calls')
+        self.budget.record_call()
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count('deadline_exceeded')
+                raise requests.exceptions.Timeout(f'{description} ran out of time')
+            try:
+                response = request(clip_timeout(timeout, remaining))
+                status_code = getattr(response, 'status_code', None)
+                if not idempotent or status_code not in RETRYABLE_STATUS:
+                    if attempt:
+                        self._count('recovered')
+                    return response
+                error = RetryError(f'HTTP {status_code}', response=response)
+            except Exception as e:
+                if not self.is_retryable(e, idempotent):
+                    raise
+                error, response = e, None
+
+            delay = self.allow_retry(attempt, deadline)
+            if delay is None:
+                if response is not None:
+                    return response
+                raise error
+            if response is not None and hasattr(response, 'close'):
+                response.close()
+            logger.warning(f"{description} failed ({str(error)}), retry {attempt + 1} in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def _count(self, key: str, value: float = 1):
+        with self._lock:
+            self.stats[key] += value
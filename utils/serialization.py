@@ -0,0 +1,78 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Union
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used when orjson is not installed
+    orjson = None
+
+# Serializer backend: 'orjson' when installed, otherwise 'json'
+_backend = 'orjson' if orjson is not None else 'json'
+
+def _default(obj: Any) -> Any:
+    """Fallback for types neither backend encodes natively"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+def set_backend(name: str) -> str:
+    """
+    Select the serializer backend: 'orjson', 'json' or 'auto'
+    Returns: the backend now in use
+    """
+    global _backend
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'json'
+    if name not in ('orjson', 'json'):
+        raise ValueError(f"Unknown JSON backend '{name}'")
+    if name == 'orjson' and orjson is None:
+        raise ValueError("JSON backend 'orjson' requested but orjson is not installed")
+    _backend = name
+    return _backend
+
+def get_backend() -> str:
+    return _backend
+
+def dumps_bytes(obj: Any, sort_keys: bool = False, indent: bool = False) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes"""
+    if _backend == 'orjson':
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    return dumps(obj, sort_keys=sort_keys, indent=indent).encode('utf-8')
+
+def dumps(obj: Any, sort_keys: bool = False, indent: bool = False) -> str:
+    """Serialize obj to a JSON string"""
+    if _backend == 'orjson':
+        return dumps_bytes(obj, sort_keys=sort_keys, indent=indent).decode('utf-8')
+    return json.dumps(obj, default=_default, ensure_ascii=False, sort_keys=sort_keys,
+                      indent=2 if indent else None, separators=None if indent else (',', ':'))
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """Deserialize JSON text or bytes"""
+    if _backend == 'orjson':
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by utils.serialization (orjson when available)"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys),
+                     indent=bool(kwargs.get('indent')))
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        return loads(s)
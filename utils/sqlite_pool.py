@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List
+
+class SQLiteConnectionPool:
+    """
+    Connections to one SQLite file, shared by every thread and greenlet of
+    the process. A connection is used by one caller at a time and handed
+    back afterwards, so under gevent a request reuses an open connection
+    instead of connecting (and running the schema) again. The file, WAL
+    mode and `schema` are set up once, on first use. At most `max_idle`
+    connections are kept open between uses.
+    """
+
+    def __init__(self, path: str, schema: Iterable[str] = (), max_idle: int = 8):
+        self.path = path
+        self.schema = tuple(schema)
+        self.max_idle = max_idle
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _open(self) -> sqlite3.Connection:
+        with self._lock:
+            ready = self._ready
+        if not ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Handed between threads, but only ever used by one at a time
+        connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        if not ready:
+            connection.execute('PRAGMA journal_mode=WAL')
+            for statement in self.schema:
+                connection.execute(statement)
+            connection.commit()
+            with self._lock:
+                self._ready = True
+        return connection
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            connection = self._open()
+        try:
+            yield connection
+        except BaseException:
+            connection.rollback()
+            raise
+        finally:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(connection)
+                    connection = None
+            if connection is not None:
+                connection.close()